@@ -2,59 +2,132 @@ import csmessage
 from csmessage import REQS
 import cspdu
 import ast
+import time
+import random
+import socket
+import logging
+from client_cache import StateCache
+
+
+class Result:
+    """
+    What a SmartHomeProtocol call returns. Nothing is printed; tcp_client_demo.py shows results.
+
+    ok:       the server accepted the request (also truthiness of the result)
+    status:   parsed payload, e.g. the device status of a query; None if there is none
+    error:    why not ok: the server's error message, or why there was no response
+    response: the server's CSmessage (None if answered from the cache or none came)
+    cached:   answered from the client's cache, without a round trip
+    """
+    __slots__ = ("ok", "status", "error", "response", "cached")
+
+    def __init__(self, ok, status=None, error=None, response=None, cached=False):
+        self.ok = ok
+        self.status = status
+        self.error = error
+        self.response = response
+        self.cached = cached
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"Result(ok={self.ok}, status={self.status!r}, error={self.error!r}, cached={self.cached})"
+
 
 class SmartHomeProtocol:
-    def __init__(self, socket_conn):
+    def __init__(self, socket_conn, cache_ttl=1.0, timeout=10.0, retries=3, backoff=0.1, max_backoff=2.0,
+                 connect=None):
         """
         Create a SmartHomeProtocol with an established socket connection.
         :param socket_conn: A socket connected to the Smart Home Server.
+        :param cache_ttl: Seconds a query result may be answered from the client's cache (0: always ask the server).
+        :param timeout: Deadline in seconds for each request, reconnects and retries included (None: wait forever).
+        :param retries: How often a request may reconnect and try again after the connection failed.
+        :param backoff: Base of the jittered exponential backoff between attempts, in seconds.
+        :param max_backoff: Longest wait between two attempts.
+        :param connect: (Optional) connect(timeout) -> new socket; by default the client reconnects
+                        to the address socket_conn is connected to.
         """
+        self.sock = socket_conn
         self.pdu = cspdu.CSpdu(socket_conn)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._connect = connect or _reconnector(socket_conn)
+        self._broken = False  # the connection failed; reopen it before the next request
+        self._credentials = None  # (username, password, house_id) to log in again after reconnecting
+        self.reconnects = 0
         self.logged_in = False  # Track login state
         self.last_response = None  # Track last server response
+        self.last_error = None  # Why the last request got no response
         self.device_ids_by_type = {}  # Store discovered device IDs by type
         self.device_types_by_id = {}  # Reverse lookup
         self.room_names = {}  # Store room names by ID
         self.room_ids_by_name = {}  # Reverse lookup for room IDs by name
+        self.topology_version = None  # Topology version the mappings above were built from
+        self.house_id = None  # House the server bound this session to
+        self.cache = StateCache(cache_ttl)  # Query results, dropped when the house's state version changes
 
-    def send_login(self, username, password):
+    def send_login(self, username, password, house_id=None, topology=False):
         """
         Send a LGIN request (login) to the server, then receive/handle response.
-        Prints "Login successful!" or "Login failed!" accordingly.
+        :param house_id: (Optional) House to work on; the server picks the user's first house if omitted.
+        :param topology: Ask for the house's rooms and devices with the login response, so room names
+                         and device IDs are known without another round trip. If the server can't
+                         send it with the login (too big for one frame), it is queried right after.
+        :return: Result; its status is the house topology, if asked for (None if it could not be had)
         """
-        msg = csmessage.CSmessage()
-        msg.setType(REQS.LGIN)
-        msg.addValue("username", username)
-        msg.addValue("password", password)
-        self.pdu.sendMessage(msg)
-
-        self.last_response = self.receive_response()
-        if self.last_response is not None:
-            # Check server's response
-            if self.last_response.getType() == REQS.LGIN and self.last_response.getValue("status") == "success":
-                self.logged_in = True
-                print("Login successful!")
-                # No longer calling discover_device_ids() automatically after login
-            else:
-                print("Login failed!")
+        msg = _login_message(username, password, house_id, topology)
+        self.last_response = self._request(msg)
+        result = self._result(self.last_response)
+        if result.ok and self.last_response.getType() == REQS.LGIN:
+            self.logged_in = True
+            self.house_id = self.last_response.getValue("house_id")
+            # Log in to the same house again after a reconnect
+            self._credentials = (username, password, self.house_id)
+            if topology:
+                result.status = self._login_topology(self.last_response)
+        elif result.ok:
+            result.ok = False
+            result.error = "unexpected response"
+        return result
+
+    def _login_topology(self, response):
+        """
+        Apply the topology that came with a login response; query it if it didn't
+        come or didn't parse. :return: The topology, or None if the query failed too
+        """
+        text = response.getValue("topology")
+        if text is not None:
+            try:
+                topology = ast.literal_eval(text)
+                self._apply_topology(topology)
+                return topology
+            except (ValueError, SyntaxError) as e:
+                logging.info(f"[CLIENT] Unreadable topology in the login response ({e}), querying it")
+        fetched = self._fetch_room_info()
+        return fetched.status if fetched.ok else None
 
     def send_logout(self):
         """
         Send a LOUT request (logout) to the server, then receive/handle response.
         Requires that you're already logged in.
+        :return: Result (ok even if the connection was already gone: the session is over either way)
         """
         if not self.logged_in:
             raise PermissionError("Must be logged in to log out.")
 
         msg = csmessage.CSmessage()
         msg.setType(REQS.LOUT)
-        self.pdu.sendMessage(msg)
-
-        self.last_response = self.receive_response()
+        # No point reconnecting just to log out
+        self.last_response = self._request(msg, idempotent=False) if not self._broken else None
+        self._credentials = None
         # Typically the server will close the session,
         # but if we get a response, it might be something like REQS.LOUT with no status.
         self.logged_in = False
-        print("Logged out successfully.")
+        return Result(True, response=self.last_response)
 
     def send_device_control(self, device_id, action, level=None, color=None, code=None):
         """
@@ -65,7 +138,8 @@ class SmartHomeProtocol:
                     "color", "arm", "disarm", "trigger_alarm", "stop_alarm".
         :param level: (Optional) Brightness level (0-100) for "dim".
         :param color: (Optional) Color value for "color".
-        :param code: (Optional) Unlock code for "unlock".
+        :param code: (Optional) Code for "unlock" or "enter_code".
+        :return: Result
         """
         if not self.logged_in:
             raise PermissionError("You must be logged in to control devices.")
@@ -82,24 +156,67 @@ class SmartHomeProtocol:
         if action == "color" and color is not None:
             msg.addValue("color", str(color))
 
-        if action == "unlock" and code is not None:
+        if action in ("unlock", "enter_code") and code is not None:
             msg.addValue("code", str(code))
 
-        self.pdu.sendMessage(msg)
+        self.last_response = self._request(msg, idempotent=False)
+        result = self._result(self.last_response)
+        if result.ok:
+            self.cache.invalidate()
+        return result
+
+    def schedule_control(self, target, action, delay=None, at=None, every=None, **fields):
+        """
+        Ask the server to run a control later, e.g. schedule_control("room:101", "dim", at="22:00", level=20)
+        or schedule_control(10, "lock", delay=30). List pending timers with request_device_status("timers").
+
+        :param target: A device ID, or "room:<id>" / "group:<name>" for every device in it.
+        :param delay: (Optional) Seconds from now.
+        :param at: (Optional) Local time "HH:MM"; the control then repeats daily.
+        :param every: (Optional) Repeat a delayed control every this many seconds.
+        :param fields: level/color/code, as for send_device_control.
+        :return: Result; its status is {"timer_id": <id>} if the server took it.
+        """
+        if not self.logged_in:
+            raise PermissionError("You must be logged in to control devices.")
+
+        msg = csmessage.CSmessage()
+        msg.setType(REQS.CTRL)
+        if isinstance(target, str) and ":" in target:
+            msg.addValue("target", target)
+        else:
+            msg.addValue("device_id", str(target))
+        msg.addValue("action", action)
+        for key, value in dict(fields, delay=delay, at=at, every=every).items():
+            if value is not None:
+                msg.addValue(key, str(value))
+        self.last_response = self._request(msg, idempotent=False)
+        result = self._result(self.last_response)
+        if result.ok:
+            self.cache.invalidate()  # a delay=0 timer may already have run
+            result.status = {"timer_id": int(self.last_response.getValue("timer_id"))}
+        return result
+
+    def cancel_timer(self, timer_id):
+        """Cancel a pending timer. :return: Result (ok if it was cancelled)"""
+        if not self.logged_in:
+            raise PermissionError("You must be logged in to control devices.")
 
-        self.last_response = self.receive_response()
-        if self.last_response is not None:
-            status = self.last_response.getValue("status")
-            if status == "success":
-                print(f"📡 Device {device_id} action '{action}': success")
-            else:
-                print(f"📡 Device {device_id} action '{action}': {status}")
+        msg = csmessage.CSmessage()
+        msg.setType(REQS.CTRL)
+        msg.addValue("device_id", "0")
+        msg.addValue("action", "cancel_timer")
+        msg.addValue("timer_id", str(timer_id))
+        self.last_response = self._request(msg, idempotent=False)
+        return self._result(self.last_response)
 
-    def request_device_status(self, query_type, query_value=None):
+    def request_device_status(self, query_type, query_value=None, **fields):
         """
         Send a QERY request to query the status of devices.
-        :param query_type: One of "all", "room", "group", or "device".
+        :param query_type: One of "all", "room", "group", "device", "history", "topology", "timers", "rules" or "stats".
         :param query_value: Room ID, Room Name, Group Name, or Device ID (not required for "all").
+        :param fields: Extra request fields, e.g. since/until/action/limit for "history" (None values are left out)
+        :return: Result; its status is the parsed device status
         """
         if not self.logged_in:
             raise PermissionError("You must be logged in to query device status.")
@@ -110,109 +227,97 @@ class SmartHomeProtocol:
             msg.addValue("query_type", query_type)
 
             # Convert room name to room ID if needed
-            if query_type == "room" and query_value is not None:
-                # Try to interpret query_value as a room name if it's not a number
-                if isinstance(query_value, str) and not query_value.isdigit():
-                    room_name = query_value.lower()
-                    if room_name in self.room_ids_by_name:
-                        query_value = self.room_ids_by_name[room_name]
-                        print(f"Looking up room '{query_value}' by name")
-                    else:
-                        # If we haven't queried all rooms yet, do it to get room names
-                        if not self.room_ids_by_name:
-                            print("No room information available. Fetching room information first...")
-                            self._fetch_room_info(quiet=True)
-                            # Try again after fetching room info
-                            if room_name in self.room_ids_by_name:
-                                query_value = self.room_ids_by_name[room_name]
-                                print(f"Found room '{room_name}' with ID {query_value}")
-                            else:
-                                print(f"Warning: Room name '{room_name}' not found.")
+            if query_type == "room" and isinstance(query_value, str) and not query_value.isdigit():
+                room_name = query_value.lower()
+                if not self.room_ids_by_name:
+                    # No topology from the login: fetch it to get room names
+                    self._fetch_room_info()
+                if room_name not in self.room_ids_by_name:
+                    return Result(False, error=f"Room name '{query_value}' not found.")
+                query_value = self.room_ids_by_name[room_name]
+
+            # Served from the cache when possible: no round trip
+            cache_key = (query_type, str(query_value) if query_type != "all" and query_value is not None else None)
+            cached = self.cache.get(cache_key) if not fields else None
+            if cached is not None:
+                if query_type == "all":
+                    self._update_device_info(cached)
+                return Result(True, status=cached, cached=True)
 
             if query_type != "all" and query_value is not None:  # Only add query_value for room, group, and device queries
                 msg.addValue("query_value", str(query_value))
+            for key, value in fields.items():
+                if value is not None:
+                    msg.addValue(key, str(value))
 
-            self.pdu.sendMessage(msg)
-
-            self.last_response = self.receive_response()
-            if self.last_response is not None:
-                status = self.last_response.getValue("status")
-                device_status = self.last_response.getValue("device_status")
-                
-                if status == "success" and device_status:
-                    display_value = query_value
-                    if query_type == "room" and query_value in self.room_names:
-                        display_value = f"{query_value} ({self.room_names[query_value]})"
-                    
-                    print(f"Query result ({query_type}" + (f" - {display_value}" if query_value else "") + f"): {device_status}")
-                    
-                    # Update device type information if this was an "all" query
-                    if query_type == "all":
-                        self._update_device_info(device_status)
-                elif status == "error":
-                    error_msg = self.last_response.getValue("error_message")
-                    print(f"Query failed: {error_msg}")
-                else:
-                    print(f"Query returned no data or unexpected format. Raw: {self.last_response}")
+            self.last_response = self._request(msg)
+            result = self._result(self.last_response)
+            device_status = self.last_response.getValue("device_status") if result.ok else None
+            if device_status:
+                result.status = ast.literal_eval(device_status)
+                if not fields:
+                    self.cache.put(cache_key, result.status, self.last_response.getValue("version"))
+                # Update device type information if this was an "all" query
+                if query_type == "all":
+                    self._update_device_info(result.status)
+            elif result.ok:
+                result.ok = False
+                result.error = "Query returned no data."
+            return result
         except Exception as e:
-            print(f"Error in device status request: {e}")
+            return Result(False, error=f"Error in device status request: {e}")
+
+    def request_history(self, target, since=None, until=None, action=None, limit=None):
+        """
+        Ask for recent changes, e.g. request_history("device:9", action="unlock", limit=1)
+        for "when was lock 9 last unlocked?" (wrong codes are recorded as "unlock_failed").
+        :param target: "device:<id>", "room:<id>" or "group:<name>"
+        :param since: Unix time of the oldest change wanted
+        :param until: Unix time of the newest change wanted
+        :return: Result; its status is {"history": [change, ...]}
+        """
+        return self.request_device_status("history", target, since=since, until=until, action=action, limit=limit)
 
-    def _fetch_room_info(self, quiet=False):
+    def _fetch_room_info(self):
         """
-        Request information about rooms to build the room name mappings.
+        Request the house topology (room names, device IDs and types) to build the
+        room name and device type mappings. Only needed if the login didn't bring it.
         This is a private helper method.
-        
-        :param quiet: If True, suppresses output messages for cleaner UI
+        :return: Result; its status is the topology
         """
         if not self.logged_in:
-            if not quiet:
-                print("Warning: Cannot fetch room info before login.")
-            return
-            
-        try:
-            # Send a message to request room information
-            msg = csmessage.CSmessage()
-            msg.setType(REQS.QERY)
-            msg.addValue("query_type", "all")  # Query all to get all room data
-            
-            self.pdu.sendMessage(msg)
-            
-            response = self.receive_response()
-            if response is not None and response.getValue("status") == "success":
-                device_status = response.getValue("device_status")
-                if device_status:
-                    self._update_room_info(device_status)
-                    self._update_device_info(device_status, quiet=quiet)
-        except Exception as e:
-            if not quiet:
-                print(f"Error fetching room information: {e}")
+            return Result(False, error="Cannot fetch room info before login.")
+
+        msg = csmessage.CSmessage()
+        msg.setType(REQS.QERY)
+        msg.addValue("query_type", "topology")
+        response = self._request(msg)
+        result = self._result(response)
+        if result.ok:
+            try:
+                result.status = ast.literal_eval(response.getValue("device_status"))
+                self._apply_topology(result.status)
+            except Exception as e:
+                result.ok = False
+                result.error = f"Error fetching room information: {e}"
+        return result
 
     def discover_device_ids(self):
         """
-        Query all devices and build a mapping of device types to their IDs.
-        Call this after login to set up the device ID mappings.
+        Build the mapping of device types to their IDs. Logging in already does
+        this; call it again to pick up rooms or devices added since.
+        :return: Result; its status is the topology
         """
-        if not self.logged_in:
-            print("Warning: Cannot discover devices before login.")
-            return
-            
-        # Query all devices to build the device type mapping
-        self.request_device_status("all")
+        return self._fetch_room_info()
 
     def list_rooms(self):
         """
-        List all available rooms.
+        All available rooms, fetched if the login didn't bring them.
+        :return: { room_id: room name }
         """
-        if not self.room_names:
-            # Fetch room info silently
-            self._fetch_room_info(quiet=True)
-            
-        if self.room_names:
-            print("\nAvailable rooms:")
-            for room_id, room_name in sorted(self.room_names.items()):
-                print(f"  Room {room_id}: {room_name}")
-        else:
-            print("No room information available. Try 'query all' first.")
+        if not self.room_names and self.logged_in:
+            self._fetch_room_info()
+        return dict(self.room_names)
 
     def get_device_by_type(self, device_type, index=0):
         """
@@ -234,101 +339,170 @@ class SmartHomeProtocol:
         """
         return self.device_types_by_id.get(str(device_id))
 
-    def _update_device_info(self, status_str, quiet=False):
+    def _update_device_info(self, status_dict):
         """
-        Parse device status response and update internal device type mappings.
-        :param status_str: String representation of device status
-        :param quiet: If True, suppresses output messages for cleaner UI
+        Update the device type mappings from the status of an "all" query.
+        :param status_dict: { room_id: { device_id: device status } }
         """
-        try:
-            # Convert the string representation to a Python dictionary
-            status_dict = ast.literal_eval(status_str)
-            
-            # Reset device mappings
-            self.device_ids_by_type = {}
-            self.device_types_by_id = {}
-            
-            # Process all rooms and devices
-            for room_id, room_devices in status_dict.items():
-                for device_id, device_info in room_devices.items():
-                    # Skip non-numeric keys like 'blinds' or 'ceiling_light' that are references
-                    if isinstance(device_id, str) and not device_id.isdigit():
-                        # If it's a ceiling_light, extract its info
-                        if device_id == "ceiling_light" and device_info:
-                            ceiling_light_id = device_info.get('device_id')
-                            if ceiling_light_id and 'type' in device_info:
-                                device_type = device_info['type']
-                                # Add to type->id mapping
-                                if device_type not in self.device_ids_by_type:
-                                    self.device_ids_by_type[device_type] = []
-                                self.device_ids_by_type[device_type].append(ceiling_light_id)
-                                # Add to id->type mapping
-                                self.device_types_by_id[str(ceiling_light_id)] = device_type
-                        continue
-                        
-                    if 'type' in device_info:
-                        device_type = device_info['type']
-                        # Add to type->id mapping
-                        if device_type not in self.device_ids_by_type:
-                            self.device_ids_by_type[device_type] = []
-                        self.device_ids_by_type[device_type].append(int(device_id))
-                        
-                        # Add to id->type mapping
-                        self.device_types_by_id[str(device_id)] = device_type
-            
-            if self.device_ids_by_type and not quiet:
-                print(f"Discovered devices by type: {self.device_ids_by_type}")
-                
-        except Exception as e:
-            if not quiet:
-                print(f"Error updating device information: {e}")
+        self.device_ids_by_type = {}
+        self.device_types_by_id = {}
+        for room_devices in status_dict.values():
+            for device_id, device_info in room_devices.items():
+                if 'type' in device_info:
+                    device_type = device_info['type']
+                    self.device_ids_by_type.setdefault(device_type, []).append(int(device_id))
+                    self.device_types_by_id[str(device_id)] = device_type
+
+    def _apply_topology(self, topology):
+        """
+        Take room names and device types from the server's topology
+        ({"version": ..., "rooms": {room_id: {"name": ..., "devices": {device_id: type}}}}).
+        """
+        self.topology_version = topology["version"]
+        self.room_names = {}
+        self.room_ids_by_name = {}
+        self.device_ids_by_type = {}
+        self.device_types_by_id = {}
+        for room_id, room in topology["rooms"].items():
+            self.room_names[room_id] = room["name"]
+            self.room_ids_by_name[room["name"].lower()] = room_id
+            for device_id, device_type in room["devices"].items():
+                self.device_ids_by_type.setdefault(device_type, []).append(device_id)
+                self.device_types_by_id[str(device_id)] = device_type
+
+    def _result(self, response, status=None):
+        """Result for a server response (None: there was none, see last_error)."""
+        if response is None:
+            return Result(False, error=self.last_error)
+        if response.getValue("status") == "success":
+            return Result(True, status=status, response=response)
+        return Result(False, error=response.getValue("error_message", response.getValue("status")), response=response)
 
-    def _update_room_info(self, status_str):
+    def receive_response(self):
         """
-        Parse device status response to extract room information.
-        :param status_str: String representation of device status
+        Block until the next response arrives from the server (at most `timeout` seconds).
+        Returns a CSmessage or None on error (the reason is in last_error).
         """
         try:
-            # Convert the string representation to a Python dictionary
-            status_dict = ast.literal_eval(status_str)
-            
-            # Update room mappings based on room IDs
-            for room_id in status_dict.keys():
-                # We don't have room names in the standard response, so we'll use placeholder names
-                # The server's SmartHomeServer has room names, but they're not included in the response
-                # We can use default names based on the IDs, which will be:
-                # 101: Living Room, 102: Kitchen, 103: Bedroom
-                room_name = "Unknown Room"
-                if room_id == 101:
-                    room_name = "Living Room"
-                elif room_id == 102:
-                    room_name = "Kitchen"
-                elif room_id == 103:
-                    room_name = "Bedroom"
-                
-                self.room_names[room_id] = room_name
-                self.room_ids_by_name[room_name.lower()] = room_id
-                
+            return self._receive(None if self.timeout is None else time.monotonic() + self.timeout)
         except Exception as e:
-            print(f"Error updating room information: {e}")
+            self.last_error = f"Error receiving response: {e}"
+            self._broken = True
+            return None
 
-    def receive_response(self):
+    def _receive(self, end=None):
+        """
+        Receive one response; raises ConnectionError if the connection fails or times out.
+        :param end: time.monotonic() deadline for the whole response (None: wait as long as it takes)
+        """
+        response = self.pdu.recvMessage(end)
+        self.cache.note_version(response.getValue("version"))  # someone changed the house: drop what we cached
+        return response
+
+    def _request(self, msg, idempotent=True):
         """
-        Block until the next response arrives from the server.
-        Returns a CSmessage or None on error.
-        Also does some basic printing for known error cases.
+        Send a request and return its response, or None if there was none before the deadline
+        (the reason is in last_error).
+
+        If the connection fails, it is reopened (after a jittered exponential backoff) and the
+        session logged in again. The request itself is only sent again if it is idempotent:
+        a control may have reached the server before the connection dropped, and running it
+        twice could undo it (think "toggle"), so it is reported as failed instead.
         """
+        end = None if self.timeout is None else time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            sent = False
+            try:
+                if self._broken:
+                    self._reconnect(end)
+                self._set_deadline(end)
+                sent = True
+                self.pdu.sendMessage(msg)
+                return self._receive(end)
+            except PermissionError as e:
+                self.last_error = f"Reconnected, but could not log in again: {e}"
+                logging.warning(f"[CLIENT] {self.last_error}")
+                return None
+            except (ConnectionError, OSError) as e:
+                # A timed out request may still be answered later; only a new connection is safe to use
+                self._broken = True
+                if (sent and not idempotent) or attempt >= self.retries or self._connect is None:
+                    self.last_error = f"Request failed: {e}"
+                    logging.info(f"[CLIENT] {self.last_error}")
+                    return None
+            attempt += 1
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+            if end is not None and time.monotonic() + delay >= end:
+                self.last_error = "Request failed: deadline passed while reconnecting"
+                logging.info(f"[CLIENT] {self.last_error}")
+                return None
+            time.sleep(delay)
+
+    def _set_deadline(self, end):
+        if end is None:
+            self.sock.settimeout(None)
+            return
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("deadline passed")
+        self.sock.settimeout(remaining)
+
+    def _reconnect(self, end):
+        """Replace the failed connection and log in again as before (raises PermissionError if refused)."""
         try:
-            response = self.pdu.recvMessage()
+            self.sock.close()
+        except OSError:
+            pass
+        remaining = None if end is None else max(end - time.monotonic(), 0.001)
+        sock = self._connect(remaining)
+        self.sock = sock
+        self.pdu = cspdu.CSpdu(sock)
+        self._broken = False
+        self.reconnects += 1
+        self.cache.invalidate()  # changes made while we were away carry no version we saw
+        logging.info(f"[CLIENT] Reconnected to the server (reconnect #{self.reconnects})")
+        if not self.logged_in or self._credentials is None:
+            return
 
-            # Optional: Additional checks for specific error messages:
-            if response.getType() == REQS.LGIN and response.getValue("status") == "failure":
-                print("Login failed: Incorrect credentials")
-            elif response.getType() == REQS.CTRL and response.getValue("status") == "error":
-                print(f"Device control failed: {response.getValue('error_message')}")
+        # Refresh the topology if we had one; one too big for the login response is kept as it was
+        self._set_deadline(end)
+        self.pdu.sendMessage(_login_message(*self._credentials, topology=self.topology_version is not None))
+        response = self._receive(end)
+        if response.getValue("status") != "success":
+            self.logged_in = False
+            self._credentials = None
+            raise PermissionError(response.getValue("error_message", "login refused"))
+        if response.getValue("topology"):
+            try:
+                self._apply_topology(ast.literal_eval(response.getValue("topology")))
+            except (ValueError, SyntaxError) as e:
+                logging.info(f"[CLIENT] Unreadable topology after reconnecting ({e}), keeping the old one")
 
-            return response
 
-        except Exception as e:
-            print(f"Error receiving response: {e}")
-            return None
\ No newline at end of file
+def _login_message(username, password, house_id=None, topology=False):
+    msg = csmessage.CSmessage()
+    msg.setType(REQS.LGIN)
+    msg.addValue("username", username)
+    msg.addValue("password", password)
+    if house_id is not None:
+        msg.addValue("house_id", str(house_id))
+    if topology:
+        msg.addValue("topology", "1")
+    return msg
+
+
+def _reconnector(sock):
+    """connect(timeout) for the address sock is connected to, or None if it has none (e.g. a socketpair)."""
+    try:
+        address = sock.getpeername()
+    except (OSError, AttributeError):
+        return None
+    if not isinstance(address, tuple):
+        return None
+
+    def connect(timeout):
+        new_sock = socket.create_connection(address[:2], timeout=timeout)
+        new_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return new_sock
+    return connect
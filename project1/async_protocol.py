@@ -0,0 +1,172 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+asyncio counterpart of SmartHomeProtocol, for asyncio applications that
+would otherwise run the blocking client in threads:
+
+    client = await AsyncSmartHomeProtocol.connect("localhost", 50000)
+    await client.login("hannahbanana", "JuniperTheCat")
+    lamps, blinds = await asyncio.gather(client.query("group", "lamps"), client.query("group", "blinds"))
+    await client.control(1, "dim", level=40)
+    await client.close()
+
+Requests are pipelined: each call writes its request at once and waits on a
+future, so any number of requests can be in flight on one connection. The
+server answers a connection's requests in the order it received them, so
+responses are matched to futures first in, first out.
+
+The server does not push anything, so changes() follows a house by polling
+the history query and yields each change once.
+'''
+
+import ast
+import time
+import socket
+import asyncio
+from collections import deque
+
+from csmessage import CSmessage, REQS
+
+
+class AsyncSmartHomeProtocol:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Use connect() instead."""
+        self._reader = reader
+        self._writer = writer
+        self._pending = deque()  # futures of the requests in flight, oldest first
+        self._closed = False
+        self.logged_in = False
+        self.house_id = None
+        self.topology = None  # {"version": ..., "rooms": {room_id: {"name": ..., "devices": {device_id: type}}}}
+        self._read_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, host: str = "localhost", port: int = 50000):
+        reader, writer = await asyncio.open_connection(host, port)
+        # Pipelined small frames would otherwise sit in Nagle's buffer waiting for delayed ACKs
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(reader, writer)
+
+    # ---- requests ----
+
+    async def login(self, username: str, password: str, house_id: int = None, topology: bool = False) -> bool:
+        """
+        :param house_id: (Optional) House to work on; the server picks the user's first house if omitted.
+        :param topology: Fill in self.topology (rooms, device IDs and types) from the login response,
+                         or with a topology query if it did not fit in the response
+        """
+        resp = await self.request(REQS.LGIN, username=username, password=password, house_id=house_id,
+                                  topology="1" if topology else None)
+        self.logged_in = resp.getValue("status") == "success"
+        if self.logged_in:
+            self.house_id = int(resp.getValue("house_id"))
+            if topology:
+                try:
+                    self.topology = ast.literal_eval(resp.getValue("topology"))
+                except (ValueError, SyntaxError):  # not sent (too big for one frame) or unreadable
+                    try:
+                        self.topology = await self.query("topology")
+                    except (RuntimeError, ValueError, SyntaxError):
+                        self.topology = None
+        return self.logged_in
+
+    async def logout(self):
+        await self.request(REQS.LOUT)
+        self.logged_in = False
+
+    async def control(self, device_id, action: str, **fields) -> CSmessage:
+        """
+        Control a device, e.g. control(1, "dim", level=40) or control(10, "unlock", code="1234").
+        Extra fields (level, color, code, delay, at, target, ...) are sent as given.
+        :return: The server's response (check getValue("status"))
+        """
+        self._check_login()
+        return await self.request(REQS.CTRL, device_id=device_id, action=action, **fields)
+
+    async def query(self, query_type: str, query_value=None, **fields):
+        """
+        Query device status ("all", "room", "group", "device", "history", ...).
+        :return: The parsed device_status
+        :raises RuntimeError: The server answered with an error
+        """
+        self._check_login()
+        resp = await self.request(REQS.QERY, query_type=query_type, query_value=query_value, **fields)
+        if resp.getValue("status") != "success":
+            raise RuntimeError(f"Query {query_type} {query_value or ''} failed: {resp.getValue('error_message')}")
+        return ast.literal_eval(resp.getValue("device_status"))
+
+    async def changes(self, target: str, interval: float = 1.0, since: float = None):
+        """
+        Async iterator over changes to a target ("device:9", "room:101", "group:locks"),
+        polling the history query every `interval` seconds:
+
+            async for change in client.changes("group:locks"):
+                print(change["device_id"], change["action"])
+        """
+        since = time.time() if since is None else since
+        while True:
+            history = (await self.query("history", target, since=since))["history"]
+            for change in history:
+                yield change
+            if history:
+                since = history[-1]["time"] + 1e-6
+            await asyncio.sleep(interval)
+
+    async def request(self, req_type: REQS, **fields) -> CSmessage:
+        """Send one request (None fields are left out) and wait for its response."""
+        if self._closed:
+            raise ConnectionError("Connection is closed.")
+        msg = CSmessage(req_type)
+        for key, value in fields.items():
+            if value is not None:
+                msg.addValue(key, str(value))
+        msg.validate()
+        data = msg.marshal()
+        future = asyncio.get_running_loop().create_future()
+        # No await between queueing the future and writing the frame, so frames and futures stay in the same order
+        self._pending.append(future)
+        self._writer.write("{:04}{}".format(len(data), data).encode("utf-8"))
+        await self._writer.drain()
+        return await future
+
+    def _check_login(self):
+        if not self.logged_in:
+            raise PermissionError("You must be logged in first.")
+
+    # ---- responses ----
+
+    async def _read_loop(self):
+        try:
+            while True:
+                size = int(await self._reader.readexactly(4))
+                msg = CSmessage()
+                msg.unmarshal((await self._reader.readexactly(size)).decode("utf-8"))
+                future = self._pending.popleft()
+                if not future.done():  # the caller may have given up on it
+                    future.set_result(msg)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, IndexError) as e:
+            self._fail_pending(ConnectionError(f"Connection lost: {e}"))
+
+    def _fail_pending(self, error: Exception):
+        self._closed = True
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self):
+        """Log out (if logged in) and close the connection."""
+        if self.logged_in and not self._closed:
+            try:
+                await asyncio.wait_for(self.logout(), 5)
+            except (ConnectionError, asyncio.TimeoutError):
+                pass
+        self._closed = True
+        self._read_task.cancel()
+        self._fail_pending(ConnectionError("Connection closed."))
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
@@ -0,0 +1,72 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Async client benchmark: device queries per second over ONE connection,
+with the blocking SmartHomeProtocol (one round trip at a time) and with
+AsyncSmartHomeProtocol keeping up to W requests in flight.
+
+    python benchmarks/bench_async_client.py             # 4000 requests each
+    python benchmarks/bench_async_client.py -n 20000 --window 1 16 256
+'''
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_protocol import SmartHomeProtocol
+from async_protocol import AsyncSmartHomeProtocol
+from bench_client_pool import start_server
+
+LOGIN = ("hannahbanana", "JuniperTheCat")
+
+
+def run_blocking(port: int, n: int) -> float:
+    sock = socket.create_connection(("localhost", port))
+    client = SmartHomeProtocol(sock, cache_ttl=0)  # measure round trips, not the client cache
+    client.send_login(*LOGIN)
+    start = time.perf_counter()
+    for i in range(n):
+        client.request_device_status("device", 1 + i % 3)
+    elapsed = time.perf_counter() - start
+    client.send_logout()
+    sock.close()
+    return n / elapsed
+
+
+async def run_async(port: int, n: int, window: int) -> float:
+    client = await AsyncSmartHomeProtocol.connect("localhost", port)
+    await client.login(*LOGIN)
+    start = time.perf_counter()
+    for base in range(0, n, window):
+        await asyncio.gather(*(client.query("device", 1 + i % 3) for i in range(base, min(n, base + window))))
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async client throughput benchmark")
+    parser.add_argument("-n", type=int, default=4000, help="requests per run (default: 4,000)")
+    parser.add_argument("--window", type=int, nargs="+", default=[1, 8, 64], help="requests in flight to try")
+    args = parser.parse_args()
+
+    proc, port = start_server()
+    try:
+        print(f"{'client':<24}{'requests/s':>14}")
+        print(f"{'blocking':<24}{run_blocking(port, args.n):>14,.0f}")
+        for window in args.window:
+            rate = asyncio.run(run_async(port, args.n, window))
+            print(f"{f'async, {window} in flight':<24}{rate:>14,.0f}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Client pool benchmark: device queries per second from T threads sharing a
+SmartHomeClientPool of T connections, against a server in its own process.
+With one connection every request waits for the previous round trip; more
+connections keep several requests in flight at once.
+
+    python benchmarks/bench_client_pool.py             # 4000 requests per pool size
+    python benchmarks/bench_client_pool.py -n 20000 --sizes 1 4 16
+'''
+
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import subprocess
+
+PROJECT1_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT1_DIR)
+
+from client_pool import SmartHomeClientPool
+
+
+def start_server(workers: int = 4):
+    """Run csserver.py in a child process. :return: (process, port)"""
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        port = probe.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, os.path.join(PROJECT1_DIR, "csserver.py"), "--port", str(port),
+                             "--workers", str(workers)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("localhost", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            if time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError("server did not start")
+            time.sleep(0.05)
+
+
+def run(port: int, size: int, n: int) -> float:
+    """:return: requests/s with `size` threads on a pool of `size` connections"""
+    pool = SmartHomeClientPool("localhost", port, ("hannahbanana", "JuniperTheCat"), size=size,
+                               cache_ttl=0)  # measure round trips, not the client cache
+    per_thread = n // size
+
+    def worker():
+        for i in range(per_thread):
+            pool.run(lambda client: client.request_device_status("device", 1 + i % 3))
+
+    pool.run(lambda client: None)  # log in outside the timing
+    threads = [threading.Thread(target=worker) for _ in range(size)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return per_thread * size / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client pool throughput benchmark")
+    parser.add_argument("-n", type=int, default=4000, help="requests per pool size (default: 4,000)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8], help="pool sizes to try")
+    args = parser.parse_args()
+
+    proc, port = start_server()
+    try:
+        print(f"{'connections':<14}{'requests/s':>14}")
+        for size in args.sizes:
+            rate = run(port, size, args.n)
+            print(f"{size:<14}{rate:>14,.0f}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Microbenchmarks of the wire format: CSmessage marshal / unmarshal /
+validate, and a CSpdu sendMessage + recvMessage round trip over a
+socketpair, for a tiny CTRL request and for "query all" responses of
+houses with 10, 1,000 and 10,000 devices.
+
+    python benchmarks/bench_codec.py                              # print the table
+    python benchmarks/bench_codec.py -o baseline.json             # also save the results
+    python benchmarks/bench_codec.py --compare baseline.json      # flag cases >10% slower
+    python benchmarks/bench_codec.py --compare baseline.json --threshold 5 --filter marshal
+
+Each case is timed in several repeats of a calibrated number of calls and
+reported as the median (and best) time per call, so results are comparable
+between runs on one machine. With --compare, a case whose median got more
+than --threshold percent slower than the baseline is a regression, and the
+exit status is 1; so is a case the baseline timed that is now missing or
+unsupported. Run the baseline and the comparison on the same machine (a
+baseline from another Python or machine is compared, with a warning).
+
+CSpdu frames carry a 4-digit length, so a message over 9,999 bytes cannot be
+framed (the 1k and 10k device responses today); those round trips are listed
+as unsupported rather than timed.
+'''
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csmessage import CSmessage, REQS
+from cspdu import CSpdu, MAX_FRAME
+from home_model import SmartHouse, Room, Lamp, Lock, Blinds
+
+DEVICES_PER_ROOM = 50
+
+
+def tiny_ctrl() -> CSmessage:
+    msg = CSmessage(REQS.CTRL)
+    msg.addValue("device_id", "1")
+    msg.addValue("action", "dim")
+    msg.addValue("level", "40")
+    return msg
+
+
+def query_all_response(devices: int) -> CSmessage:
+    """The server's answer to "query all" for a house of `devices` lamps, locks and blinds."""
+    house = SmartHouse(1, "Benchmark House")
+    for n in range(0, devices, DEVICES_PER_ROOM):
+        room = Room(100 + n // DEVICES_PER_ROOM, f"Room {n // DEVICES_PER_ROOM}")
+        house.add_room(room)
+        count = min(DEVICES_PER_ROOM, devices - n)
+        kinds = (lambda: Lamp(0), lambda: Lock(0, code=["1234"]), lambda: Blinds(0))
+        room.add_devices(devices=[kinds[i % 3]() for i in range(count)])
+    msg = CSmessage(REQS.QERY)
+    msg.addValue("status", "success")
+    msg.addValue("device_status", str(house.check_status()))
+    msg.addValue("version", str(house.version))
+    return msg
+
+
+def messages() -> dict:
+    return {"ctrl": tiny_ctrl(), "all_10": query_all_response(10),
+            "all_1k": query_all_response(1000), "all_10k": query_all_response(10000)}
+
+
+def time_call(fn, repeats: int = 5, min_time: float = 0.05) -> dict:
+    """Median and best seconds per call of fn(), over `repeats` batches of at least min_time each."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed < min_time / 10 else max(2, int(min_time / max(elapsed, 1e-9)) + 1)
+    runs = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+    return {"median_us": round(statistics.median(runs) * 1e6, 3), "best_us": round(min(runs) * 1e6, 3),
+            "calls": number * repeats}
+
+
+def cases(msgs: dict):
+    """Yield (case name, payload bytes, function to time or None with the reason it can't run)."""
+    left, right = socket.socketpair()
+    sender, receiver = CSpdu(left), CSpdu(right)
+    try:
+        for name, msg in msgs.items():
+            data = msg.marshal()
+            size = len(data.encode("utf-8"))
+            yield f"marshal/{name}", size, msg.marshal
+            yield f"unmarshal/{name}", size, lambda data=data: CSmessage().unmarshal(data)
+            yield f"validate/{name}", size, msg.validate
+            if size > MAX_FRAME:
+                yield f"pdu_roundtrip/{name}", size, f"unsupported: {size} bytes > {MAX_FRAME}-byte frame limit"
+            else:
+                def roundtrip(msg=msg):
+                    sender.sendMessage(msg)
+                    receiver.recvMessage()
+                yield f"pdu_roundtrip/{name}", size, roundtrip
+    finally:
+        left.close()
+        right.close()
+
+
+def run(name_filter: str = None, repeats: int = 5, min_time: float = 0.05) -> dict:
+    results = {}
+    for name, size, fn in cases(messages()):
+        if name_filter and name_filter not in name:
+            continue
+        if isinstance(fn, str):
+            results[name] = {"bytes": size, "skipped": fn}
+        else:
+            results[name] = dict(time_call(fn, repeats, min_time), bytes=size)
+    return {"meta": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                     "machine": platform.machine(), "system": platform.system(), "time": time.time(),
+                     "filter": name_filter},
+            "results": results}
+
+
+def meta_differences(current: dict, baseline: dict) -> list:
+    """Ways the baseline's environment differs from this run's, e.g. "python 3.11.4 -> 3.12.1"."""
+    differences = []
+    for key in ("python", "implementation", "machine", "system"):
+        then, now = baseline.get("meta", {}).get(key), current["meta"].get(key)
+        if then != now:
+            differences.append(f"{key} {then} -> {now}")
+    return differences
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    :return: (case, baseline us, current us, percent change, regressed, note) for every case the
+             baseline timed (and this run's --filter selects). A case that is missing now, or no
+             longer timed, is a regression with no current time and the reason in note.
+    """
+    rows = []
+    name_filter = current["meta"].get("filter")
+    for name, base in baseline["results"].items():
+        if "median_us" not in base or (name_filter and name_filter not in name):
+            continue
+        result = current["results"].get(name)
+        if result is None:
+            rows.append((name, base["median_us"], None, None, True, "missing"))
+        elif "median_us" not in result:
+            rows.append((name, base["median_us"], None, None, True, result.get("skipped", "not timed")))
+        else:
+            change = (result["median_us"] - base["median_us"]) / base["median_us"] * 100
+            rows.append((name, base["median_us"], result["median_us"], change, change > threshold, None))
+    return rows
+
+
+def format_results(report: dict) -> str:
+    lines = [f"{'case':<26}{'bytes':>10}{'median us':>14}{'best us':>12}"]
+    for name, result in report["results"].items():
+        if "skipped" in result:
+            lines.append(f"{name:<26}{result['bytes']:>10,}  {result['skipped']}")
+        else:
+            lines.append(f"{name:<26}{result['bytes']:>10,}{result['median_us']:>14,.2f}{result['best_us']:>12,.2f}")
+    return "\n".join(lines)
+
+
+def format_comparison(rows, threshold: float) -> str:
+    lines = [f"{'case':<26}{'baseline us':>14}{'now us':>12}{'change':>10}"]
+    for name, base, now, change, regressed, note in rows:
+        if now is None:
+            lines.append(f"{name:<26}{base:>14,.2f}{'-':>12}{'-':>10}  REGRESSION ({note})")
+            continue
+        flag = f"  REGRESSION (>{threshold:g}%)" if regressed else ""
+        lines.append(f"{name:<26}{base:>14,.2f}{now:>12,.2f}{change:>+9.1f}%{flag}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSmessage / CSpdu microbenchmarks")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slower that counts as a regression (default: 10)")
+    parser.add_argument("--filter", help="only run cases whose name contains this")
+    parser.add_argument("--repeats", type=int, default=5, help="timed batches per case (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per batch at least (default: 0.05)")
+    args = parser.parse_args()
+
+    report = run(args.filter, args.repeats, args.min_time)
+    print(format_results(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print()
+        for difference in meta_differences(report, baseline):
+            print(f"WARNING: baseline was run elsewhere ({difference}); times may not be comparable")
+        print(format_comparison(rows, args.threshold))
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
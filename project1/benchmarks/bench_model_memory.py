@@ -0,0 +1,68 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Memory benchmark for the device model: builds N devices of each kind and
+reports bytes per device, next to a dict-backed copy of the old Lamp for
+comparison.
+
+    python benchmarks/bench_model_memory.py            # 1M devices per kind
+    python benchmarks/bench_model_memory.py -n 100000
+'''
+
+import os
+import sys
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from home_model import Lamp, CeilingLight, Lock, Blinds, Alarm
+
+
+class DictLamp:
+    """The pre-__slots__ Lamp layout (instance __dict__), kept here only as a baseline."""
+    def __init__(self, device_id, on=False, shade=100, color="white"):
+        self.device_id = device_id
+        self.on = on
+        self.shade = shade
+        self.color = color.lower()
+
+
+CODES = ["1234", "1235"]  # shared, like the per-lock code list in a real layout
+
+FACTORIES = {
+    "DictLamp (baseline)": lambda i: DictLamp(i),
+    "Lamp": lambda i: Lamp(i),
+    "CeilingLight": lambda i: CeilingLight(i),
+    "Lock": lambda i: Lock(i, CODES),
+    "Blinds": lambda i: Blinds(i),
+    "Alarm": lambda i: Alarm(9999, device_id=i),
+}
+
+
+def measure(factory, n: int) -> int:
+    """Bytes allocated to keep n devices alive (the list of references is excluded)."""
+    devices = [None] * n
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(n):
+        devices[i] = factory(i)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Device model memory benchmark")
+    parser.add_argument("-n", type=int, default=1_000_000, help="devices per kind (default: 1,000,000)")
+    args = parser.parse_args()
+
+    print(f"{'device':<22}{'total MiB':>12}{'bytes/device':>15}")
+    for name, factory in FACTORIES.items():
+        used = measure(factory, args.n)
+        print(f"{name:<22}{used / 2**20:>12.1f}{used / args.n:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Persistence benchmark: CTRL throughput of one session against the demo
+house with no database, with a synchronous database (each change is
+committed before the reply) and with write-behind (changes are queued and
+committed in batches by the background writer).
+
+    python benchmarks/bench_persistence.py            # 20k requests per mode
+    python benchmarks/bench_persistence.py -n 100000
+'''
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csmessage import CSmessage, REQS
+from csserver import SmartHomeServer, SmartHomeServerOps, PROJECT2_DIR
+
+sys.path.insert(0, PROJECT2_DIR)
+from db_manager import DatabaseManager
+
+LAMPS = (1, 2, 3, 6, 7)
+
+
+def run(n: int, db) -> tuple:
+    """:return: (requests/s on the request path, seconds until everything was on disk)"""
+    server = SmartHomeServer(port=0, num_workers=1, db=db)
+    ops = SmartHomeServerOps(server=server)
+    login = CSmessage(REQS.LGIN)
+    login.addValue("username", "hannahbanana")
+    login.addValue("password", "JuniperTheCat")
+    ops._process(login)
+
+    requests = []
+    for i in range(n):
+        req = CSmessage(REQS.CTRL)
+        req.addValue("device_id", str(LAMPS[i % len(LAMPS)]))
+        req.addValue("action", "dim")
+        req.addValue("level", str(i % 101))
+        requests.append(req)
+
+    start = time.perf_counter()
+    for req in requests:
+        ops._process(req)
+    elapsed = time.perf_counter() - start
+    if db is not None:
+        db.flush()
+    durable = time.perf_counter() - start
+
+    server.server_socket.close()
+    server.workers.shutdown()
+    return n / elapsed, durable
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistence throughput benchmark")
+    parser.add_argument("-n", type=int, default=20_000, help="CTRL requests per mode (default: 20,000)")
+    args = parser.parse_args()
+
+    print(f"{'mode':<16}{'requests/s':>14}{'all on disk after (s)':>24}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("no database", "synchronous", "write-behind"):
+            db = None
+            if mode != "no database":
+                db = DatabaseManager(os.path.join(tmp, f"{mode}.db"), write_behind=(mode == "write-behind"))
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # per-request prints
+                rate, durable = run(args.n, db)
+            if db is not None:
+                stats = db.stats()
+                db.close()
+            print(f"{mode:<16}{rate:>14,.0f}{durable:>24.2f}")
+            if mode == "write-behind":
+                print(f"  {stats['batches']} batches, {stats['written']} row writes for {args.n} changes")
+
+
+if __name__ == "__main__":
+    main()
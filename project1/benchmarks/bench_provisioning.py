@@ -0,0 +1,65 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Provisioning benchmark: how long it takes to build a site of N devices,
+once through the one-at-a-time add_lamp/add_lock calls and once through
+the batch Room.add_devices, for a single huge room and for many small ones.
+
+    python benchmarks/bench_provisioning.py             # 100k devices
+    python benchmarks/bench_provisioning.py -n 1000000
+'''
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from home_model import SmartHouse, Room, Lamp, Lock
+
+CODES = ["1234"]
+
+
+def build(n: int, room_size: int, batch: bool) -> float:
+    """Time to add n pre-built devices to a fresh house (device construction is not timed)."""
+    house = SmartHouse(1, "Benchmark Site")
+    plan = []
+    remaining = n
+    while remaining:
+        size = min(room_size, remaining)
+        lamps = [Lamp(device_id=0) for _ in range(size // 2)]
+        locks = [Lock(device_id=0, code=CODES) for _ in range(size - size // 2)]
+        plan.append((lamps, locks))
+        remaining -= size
+
+    start = time.perf_counter()
+    for room_id, (lamps, locks) in enumerate(plan, start=1):
+        room = Room(room_id=room_id, name=f"Room {room_id}")
+        house.add_room(room)
+        if batch:
+            room.add_devices(lamps=lamps, locks=locks)
+        else:
+            for lamp in lamps:
+                room.add_lamp(lamp)
+            for lock in locks:
+                room.add_lock(lock)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Site provisioning benchmark")
+    parser.add_argument("-n", type=int, default=100_000, help="devices to provision (default: 100,000)")
+    args = parser.parse_args()
+
+    print(f"{'layout':<28}{'mode':<10}{'seconds':>10}{'devices/s':>14}")
+    for label, room_size in (("one room", args.n), ("rooms of 100 devices", 100)):
+        for batch in (False, True):
+            elapsed = build(args.n, room_size, batch)
+            mode = "batch" if batch else "single"
+            print(f"{label:<28}{mode:<10}{elapsed:>10.3f}{args.n / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Restart benchmark: how long a server takes to get a big site's device state
+back, by replaying the write-ahead log (one change per device) and by
+attaching to a memory-mapped state file. Also times a monitor reading the
+whole state file in place.
+
+    python benchmarks/bench_restart.py             # 100k devices
+    python benchmarks/bench_restart.py -n 1000000
+'''
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_startup import write_site
+from house_loader import load_site
+from mapped_store import MappedDeviceStore
+from wal import MutationLog
+
+
+def all_devices(house):
+    for room in house.rooms.values():
+        yield from room.devices.values()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restart benchmark: log replay vs mapped state")
+    parser.add_argument("-n", type=int, default=100_000, help="devices in the generated site (default: 100,000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        site = os.path.join(tmp, "site.jsonl")
+        write_site(site, args.n)
+        state_dir = os.path.join(tmp, "state")
+        os.mkdir(state_dir)
+
+        # First run: change every device once, through the log and the state file
+        (house,), _ = load_site(site)
+        log = MutationLog(os.path.join(tmp, "wal"), checkpoint_every=0, fsync=False)
+        log.recover([house])
+        (mapped,), _ = load_site(site, state_dir)
+        for device, view in zip(all_devices(house), all_devices(mapped)):
+            if hasattr(device, "on"):
+                device.on = view.on = True
+            else:
+                device.is_unlocked = view.is_unlocked = True
+            log.append(1, device)
+        log.close()
+        mapped.store.close()
+
+        start = time.perf_counter()
+        (house,), _ = load_site(site)
+        built = time.perf_counter() - start
+        MutationLog(os.path.join(tmp, "wal"), fsync=False).recover([house])
+        replayed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        (mapped,), _ = load_site(site, state_dir)
+        attached = time.perf_counter() - start
+        assert mapped.store.reattached == args.n
+        mapped.store.close()
+
+        start = time.perf_counter()
+        monitor = MappedDeviceStore(os.path.join(state_dir, "house-1.state"), readonly=True)
+        opened = time.perf_counter() - start
+        monitor.export_status()
+        exported = time.perf_counter() - start
+        monitor.close()
+
+    print(f"{args.n:,} devices")
+    print(f"  build layout only                 {built:8.3f} s")
+    print(f"  build layout + replay log         {replayed:8.3f} s  (state restore {replayed - built:.3f} s)")
+    print(f"  build layout + attach state file  {attached:8.3f} s  (state restore {max(attached - built, 0):.3f} s)")
+    print(f"  monitor: open state file          {opened * 1000:8.3f} ms")
+    print(f"  monitor: read every device        {exported:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
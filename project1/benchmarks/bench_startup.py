@@ -0,0 +1,99 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Startup benchmark for the site loader: writes a generated site of N devices
+(rooms of 100) in each file format, then times load_site on it and reports
+the peak memory the load needed on top of the finished houses.
+
+    python benchmarks/bench_startup.py              # 100k devices
+    python benchmarks/bench_startup.py -n 1000000 --formats jsonl csv
+'''
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from house_loader import load_site
+
+ROOM_SIZE = 100
+CSV_FIELDS = ("kind", "house_id", "room_id", "name", "on", "shade", "code")
+
+
+def site_records(n: int):
+    """A house with n devices: rooms of ROOM_SIZE, alternating lamps and locks."""
+    yield {"kind": "house", "house_id": 1, "name": "Benchmark Site"}
+    for i in range(n):
+        room_id = i // ROOM_SIZE + 1
+        if i % ROOM_SIZE == 0:
+            yield {"kind": "room", "room_id": room_id, "name": f"Room {room_id}"}
+        if i % 2:
+            yield {"kind": "lock", "room_id": room_id, "code": ["1234", "5678"]}
+        else:
+            yield {"kind": "lamp", "room_id": room_id, "on": False, "shade": 100}
+
+
+def write_site(path: str, n: int):
+    ext = os.path.splitext(path)[1]
+    with open(path, "w", newline="") as f:
+        if ext == ".jsonl":
+            for record in site_records(n):
+                f.write(json.dumps(record) + "\n")
+        elif ext == ".csv":
+            writer = csv.DictWriter(f, CSV_FIELDS)
+            writer.writeheader()
+            for record in site_records(n):
+                if "code" in record:
+                    record["code"] = "|".join(record["code"])
+                writer.writerow(record)
+        elif ext == ".json":
+            json.dump(list(site_records(n)), f)
+        elif ext == ".toml":
+            for record in site_records(n):
+                f.write("[[records]]\n")
+                for key, value in record.items():
+                    f.write(f"{key} = {json.dumps(value)}\n")  # JSON scalars/lists are valid TOML here
+
+
+def measure(path: str):
+    """
+    Load the site twice: once timed, once under tracemalloc (which slows it down).
+    :return: (seconds, peak MiB above the built houses)
+    """
+    start = time.perf_counter()
+    load_site(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    houses, _ = load_site(path)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, (peak - current) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Site loader startup benchmark")
+    parser.add_argument("-n", type=int, default=100_000, help="devices in the generated site (default: 100,000)")
+    parser.add_argument("--formats", nargs="+", default=["jsonl", "csv", "json", "toml"])
+    args = parser.parse_args()
+
+    print(f"{'format':<8}{'file MiB':>10}{'seconds':>10}{'devices/s':>14}{'load overhead MiB':>20}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            path = os.path.join(tmp, f"site.{fmt}")
+            write_site(path, args.n)
+            size = os.path.getsize(path) / 2**20
+            elapsed, overhead = measure(path)
+            print(f"{fmt:<8}{size:>10.1f}{elapsed:>10.2f}{args.n / elapsed:>14,.0f}{overhead:>20.1f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Load generator: N concurrent SmartHomeProtocol sessions run a mix of the
+requests from the tcp_client_test.py scenario (logins, queries for all /
+room / group / device, lamp controls) against a server, and the run is
+reported as JSON: throughput, p50/p95/p99/max latency and error rates,
+overall and per kind of request.
+
+    python benchmarks/load_test.py --spawn                       # own server, 8 sessions, 10s closed loop
+    python benchmarks/load_test.py --port 50000 -c 32 -d 30      # a server that is already running
+    python benchmarks/load_test.py --spawn --rate 2000           # open loop: 2000 requests/s in total
+    python benchmarks/load_test.py --spawn --mix device=10,control=5,all=1 -o run.json
+
+Closed loop (the default): each session sends its next request as soon as
+the last one is answered, so the server sets the pace and throughput is
+its capacity for that many clients. Open loop (--rate): requests are due on
+a fixed schedule whatever the server does, and latency is counted from when
+a request was due, so a server that falls behind shows it in the
+percentiles instead of quietly slowing the clients down.
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_protocol import SmartHomeProtocol
+from client_runner import latency_summary
+from bench_client_pool import start_server
+
+DEFAULT_MIX = "login=1,all=1,room=2,group=2,device=10,control=4"
+OPERATIONS = ("login", "all", "room", "group", "device", "control")
+GROUPS = ("lamps", "locks", "blinds", "alarms")
+COLORS = ("white", "blue", "red", "green")
+
+
+def parse_mix(text: str) -> dict:
+    """'device=10,control=4' -> {"device": 10, "control": 4}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation '{name}' (use {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("the mix has no weight")
+    return mix
+
+
+class Session:
+    """One client connection and the samples it took: (operation, seconds, ok)."""
+
+    def __init__(self, host: str, port: int, credentials, seed: int):
+        self.credentials = credentials
+        self.sock = socket.create_connection((host, port))
+        self.client = SmartHomeProtocol(self.sock, cache_ttl=0)  # every request goes to the server
+        self.random = random.Random(seed)
+        self.samples = []
+        if not self.client.send_login(*credentials, topology=True):
+            raise PermissionError(f"Login as {credentials[0]} failed.")
+        self.rooms = list(self.client.room_names)
+        self.lamps = self.client.device_ids_by_type.get("Lamp", [])
+        self.devices = [int(device_id) for device_id in self.client.device_types_by_id]
+
+    def call(self, operation: str):
+        client, rnd = self.client, self.random
+        if operation == "login":
+            return client.send_login(*self.credentials)
+        if operation == "all":
+            return client.request_device_status("all")
+        if operation == "room":
+            return client.request_device_status("room", rnd.choice(self.rooms))
+        if operation == "group":
+            return client.request_device_status("group", rnd.choice(GROUPS))
+        if operation == "device":
+            return client.request_device_status("device", rnd.choice(self.devices))
+        # Dim and color always succeed, so errors mean the server (or its throttle) said no
+        if rnd.random() < 0.5:
+            return client.send_device_control(rnd.choice(self.lamps), "dim", level=rnd.randint(0, 100))
+        return client.send_device_control(rnd.choice(self.lamps), "color", color=rnd.choice(COLORS))
+
+    def close(self):
+        try:
+            self.client.send_logout()
+        except Exception:
+            pass
+        self.sock.close()
+
+
+def run_session(session: Session, operations, weights, stop_at: float, interval: float = None, offset: float = 0.0):
+    """
+    Send requests until stop_at. Closed loop if interval is None; otherwise one
+    request is due every `interval` seconds, starting `offset` seconds in.
+    """
+    rnd = session.random
+    due = time.perf_counter() + offset
+    while True:
+        if interval is not None:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        start = time.perf_counter() if interval is None else due
+        if start >= stop_at:
+            break
+        operation = rnd.choices(operations, weights)[0]
+        try:
+            ok = bool(session.call(operation))
+        except Exception:
+            ok = False
+        session.samples.append((operation, time.perf_counter() - start, ok))
+        if interval is not None:
+            due += interval
+
+
+def summarize(samples, elapsed: float) -> dict:
+    errors = sum(1 for _, _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "per_second": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": latency_summary([seconds for _, seconds, _ in samples], (50, 95, 99)),
+    }
+
+
+def load_test(host: str, port: int, clients: int = 8, duration: float = 10.0, rate: float = None,
+              mix: dict = None, credentials=("hannahbanana", "JuniperTheCat"), seed: int = 1) -> dict:
+    """
+    Run the load and return the report.
+    :param rate: Requests per second over all sessions (open loop); None for closed loop
+    """
+    mix = mix or parse_mix(DEFAULT_MIX)
+    operations = [name for name in OPERATIONS if mix.get(name)]
+    weights = [mix[name] for name in operations]
+    sessions = [Session(host, port, credentials, seed + i) for i in range(clients)]
+
+    interval = clients / rate if rate else None  # each session's share of the arrivals
+    start = time.perf_counter()
+    stop_at = start + duration
+    threads = [threading.Thread(target=run_session,
+                                args=(session, operations, weights, stop_at, interval,
+                                      i * interval / clients if interval else 0.0))
+               for i, session in enumerate(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    for session in sessions:
+        session.close()
+
+    samples = [sample for session in sessions for sample in session.samples]
+    report = {
+        "config": {"host": host, "port": port, "clients": clients, "duration": duration,
+                   "mode": "open" if rate else "closed", "rate": rate, "mix": mix, "seed": seed},
+        "seconds": round(elapsed, 3),
+        "total": summarize(samples, elapsed),
+        "operations": {name: summarize([s for s in samples if s[0] == name], elapsed) for name in operations},
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-client load generator")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=50000)
+    parser.add_argument("--spawn", action="store_true", help="start a server of our own for the run")
+    parser.add_argument("--workers", type=int, default=4, help="house workers of a spawned server")
+    parser.add_argument("-c", "--clients", type=int, default=8, help="concurrent sessions (default: 8)")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds to run (default: 10)")
+    parser.add_argument("--rate", type=float, help="open loop: requests/s over all sessions (default: closed loop)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--user", default="hannahbanana")
+    parser.add_argument("--password", default="JuniperTheCat")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the request mix, for repeatable runs")
+    parser.add_argument("-o", "--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    proc = None
+    if args.spawn:
+        proc, args.port = start_server(args.workers)
+    try:
+        report = load_test(args.host, args.port, args.clients, args.duration, args.rate, parse_mix(args.mix),
+                           (args.user, args.password), args.seed)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Client-side cache of query results, used by SmartHomeProtocol so repeated
+reads cost no round trip:
+
+    cache = StateCache(ttl=1.0)
+    cache.put(("room", "101"), status, version)
+    cache.get(("room", "101"))      # the status, or None once stale
+
+An entry is dropped when it is older than `ttl`, when the client's own
+control succeeds, or when any response reports a house state version other
+than the one the cache was filled at (someone else changed something).
+
+Device, room and group queries are also answered from a cached "all"
+result, so after one `query all` most reads never leave the client.
+'''
+
+import time
+
+# Queries whose answer only changes when the house state does
+CACHEABLE = ("all", "room", "group", "device")
+
+# Group names -> the "type" field of their devices
+GROUP_TYPES = {"lamps": "Lamp", "locks": "Lock", "blinds": "Blinds", "alarms": "Alarm", "ceiling_lights": "CeilingLight"}
+
+
+class StateCache:
+    def __init__(self, ttl: float = 1.0, clock=time.monotonic):
+        """:param ttl: Seconds an entry may be served for (0 turns the cache off)"""
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = {}  # { (query_type, query_value): (expires, status) }
+        self.version = None  # house state version the entries were read at
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached status for (query_type, query_value), or None."""
+        if not self.ttl:
+            return None
+        status = self._lookup(key)
+        if status is None and key[0] != "all":
+            everything = self._lookup(("all", None))
+            if everything is not None:
+                try:
+                    status = _derive(everything, *key)
+                except ValueError:  # not a numeric ID; let the server answer
+                    status = None
+        if status is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return status
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < self.clock():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def put(self, key, status, version=None):
+        if not self.ttl or key[0] not in CACHEABLE:
+            return
+        self.note_version(version)
+        self._entries[key] = (self.clock() + self.ttl, status)
+
+    def note_version(self, version):
+        """Called with the version of every response; drops everything if the house changed."""
+        if version is None:
+            return
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "version": self.version}
+
+
+def _derive(everything: dict, query_type: str, query_value):
+    """Answer a room, group or device query from a cached 'all' status, in the server's shape."""
+    if query_type == "room":
+        room_id = int(query_value)
+        return {room_id: everything[room_id]} if room_id in everything else None
+    if query_type == "device":
+        device_id = int(query_value)
+        for devices in everything.values():
+            if device_id in devices:
+                return {device_id: devices[device_id]}
+        return None
+    if query_type == "group":
+        name = str(query_value).lower()
+        if name not in GROUP_TYPES:
+            return None
+        return {name: {device_id: status for devices in everything.values()
+                       for device_id, status in devices.items() if status.get("type") == GROUP_TYPES[name]}}
+    return None
@@ -0,0 +1,179 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Pool of logged-in SmartHomeProtocol connections for multi-threaded callers.
+A SmartHomeProtocol owns one socket and one request at a time, so threads
+must not share one; the pool hands each thread a connection of its own:
+
+    pool = SmartHomeClientPool("localhost", 50000, ("hannahbanana", "JuniperTheCat"), size=8)
+    with pool.connection() as client:
+        client.send_device_control(1, "on")
+    pool.run(lambda client: client.request_device_status("device", 1))
+    pool.close()
+
+Connections are opened (and logged in) on demand, up to `size`. A caller
+that finds them all in use waits at most `acquire_timeout` seconds, then
+gets a TimeoutError. A connection that has sat idle for `idle_check`
+seconds is checked before it is handed out (without a round trip: an idle
+connection has nothing to read unless the server closed it), and a
+connection that failed while in use is dropped; either way the next caller
+gets a freshly connected one.
+'''
+
+import time
+import queue
+import select
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+
+from app_protocol import SmartHomeProtocol
+
+
+class PooledConnection:
+    __slots__ = ("client", "credentials", "last_used")
+
+    def __init__(self, client, credentials):
+        self.client = client
+        self.credentials = credentials
+        self.last_used = time.monotonic()
+
+
+class SmartHomeClientPool:
+    def __init__(self, host: str, port: int, credentials, size: int = 4,
+                 acquire_timeout: float = 5.0, idle_check: float = 5.0, connect_timeout: float = 5.0,
+                 cache_ttl: float = 1.0):
+        """
+        :param credentials: (username, password) or (username, password, house_id) for every
+                            connection, or a list of them to spread connections over several users
+        :param size: Most connections open at once
+        :param acquire_timeout: Longest wait for a free connection
+        :param idle_check: Check connections idle for longer than this before handing them out
+        :param connect_timeout: Timeout for connecting a new socket
+        :param cache_ttl: Query cache TTL of each connection (see SmartHomeProtocol)
+        """
+        self.host = host
+        self.port = port
+        self.credentials = [credentials] if isinstance(credentials[0], str) else list(credentials)
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.idle_check = idle_check
+        self.connect_timeout = connect_timeout
+        self.cache_ttl = cache_ttl
+
+        self._idle = queue.LifoQueue()  # most recently used first, so extra connections go idle and get checked
+        self._slots = threading.BoundedSemaphore(size)  # one per connection that may exist
+        self._lock = threading.Lock()
+        self._opened = 0  # connections opened so far, also picks their credentials
+        self._closed = False
+        self.reconnects = 0
+        self.timeouts = 0
+
+    # ---- handing out ----
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Borrow a logged-in SmartHomeProtocol for the duration of a with block.
+        :param timeout: Longest wait for a free connection (default: acquire_timeout)
+        :raises TimeoutError: No connection came free in time
+        """
+        conn = self._acquire(self.acquire_timeout if timeout is None else timeout)
+        broken = True
+        try:
+            yield conn.client
+            # SmartHomeProtocol reports a request that failed even after reconnecting as a None response
+            broken = conn.client.last_response is None
+        finally:
+            self._release(conn, broken)
+
+    def run(self, fn, timeout: float = None):
+        """Call fn(client) on a borrowed connection and return its result."""
+        with self.connection(timeout) as client:
+            return fn(client)
+
+    def _acquire(self, timeout: float) -> PooledConnection:
+        if self._closed:
+            raise RuntimeError("The pool is closed.")
+        if not self._slots.acquire(timeout=timeout):
+            self.timeouts += 1
+            raise TimeoutError(f"No free connection to {self.host}:{self.port} within {timeout}s")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if time.monotonic() - conn.last_used < self.idle_check or _healthy(conn.client.sock):
+                    return conn
+                logging.info(f"[POOL] Dropping a dead idle connection to {self.host}:{self.port}")
+                self.reconnects += 1
+                _close(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, conn: PooledConnection, broken: bool):
+        if broken or self._closed:
+            if broken:
+                logging.info(f"[POOL] Dropping a connection that failed in use ({self.host}:{self.port})")
+                self.reconnects += 1
+            _close(conn)
+        else:
+            conn.last_used = time.monotonic()
+            self._idle.put(conn)
+        self._slots.release()
+
+    def _open(self) -> PooledConnection:
+        with self._lock:
+            credentials = self.credentials[self._opened % len(self.credentials)]
+            self._opened += 1
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        sock.settimeout(None)
+        client = SmartHomeProtocol(sock, cache_ttl=self.cache_ttl)
+        client.send_login(*credentials)
+        if not client.logged_in:
+            sock.close()
+            raise PermissionError(f"Login as {credentials[0]} failed.")
+        return PooledConnection(client, credentials)
+
+    # ---- lifecycle ----
+
+    def stats(self) -> dict:
+        return {"size": self.size, "idle": self._idle.qsize(), "opened": self._opened,
+                "reconnects": self.reconnects, "timeouts": self.timeouts}
+
+    def close(self):
+        """Log out and close the idle connections; borrowed ones are closed when returned."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.client.send_logout()
+            except Exception:
+                pass
+            _close(conn)
+
+
+def _healthy(sock) -> bool:
+    """
+    An idle connection has nothing to read: if select says it is readable,
+    the server closed it (or sent something nobody asked for).
+    """
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+def _close(conn: PooledConnection):
+    try:
+        conn.client.sock.close()  # the client's current socket: it may have reconnected
+    except OSError:
+        pass
@@ -0,0 +1,201 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Non-interactive client: runs a file (or stdin) of commands against the
+server as fast as it answers, then reports throughput, latency percentiles
+and the commands that failed.
+
+    python client_runner.py scene.txt
+    python client_runner.py scene.txt --window 32 --json
+    cat scene.txt | python client_runner.py --port 50001
+
+One command per line; blank lines and lines starting with # are skipped:
+
+    login hannahbanana JuniperTheCat [house_id]
+    query all
+    query room 101
+    query group lamps
+    query device 5
+    query history device:9
+    control 1 dim level=40
+    control room:103 off
+    control 10 lock delay=30
+    logout
+
+Fields after a control's action (level=, color=, code=, delay=, at=, every=)
+are sent as given. With --window above 1, up to that many commands are in
+flight at once on the one connection; the server still runs a connection's
+commands in order, so the outcome is the same, only sooner. A logout ends the
+session and closes the connection, so it belongs at the end.
+'''
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+from csmessage import REQS
+from async_protocol import AsyncSmartHomeProtocol
+
+
+class Command:
+    __slots__ = ("line_no", "text", "req_type", "fields")
+
+    def __init__(self, line_no: int, text: str, req_type: REQS, fields: dict):
+        self.line_no = line_no
+        self.text = text
+        self.req_type = req_type
+        self.fields = fields
+
+
+def parse_command(text: str, line_no: int = 0) -> Command:
+    """
+    Turn one command line into a request.
+    :raises ValueError: Not a command this runner knows
+    """
+    words = text.split()
+    verb = words[0].lower()
+    if verb == "login" and len(words) in (3, 4):
+        fields = {"username": words[1], "password": words[2]}
+        if len(words) == 4:
+            fields["house_id"] = words[3]
+        return Command(line_no, text, REQS.LGIN, fields)
+    if verb == "logout" and len(words) == 1:
+        return Command(line_no, text, REQS.LOUT, {})
+    if verb == "query" and len(words) in (2, 3):
+        fields = {"query_type": words[1].lower()}
+        if len(words) == 3:
+            fields["query_value"] = words[2]
+        return Command(line_no, text, REQS.QERY, fields)
+    if verb == "control" and len(words) >= 3:
+        target, action = words[1], words[2].lower()
+        fields = {"target": target} if ":" in target else {"device_id": target}
+        fields["action"] = action
+        for word in words[3:]:
+            key, sep, value = word.partition("=")
+            if not sep:
+                raise ValueError(f"expected key=value, got '{word}'")
+            fields[key] = value
+        return Command(line_no, text, REQS.CTRL, fields)
+    raise ValueError(f"unknown command '{text}'")
+
+
+def read_commands(lines):
+    """
+    Parse command lines, skipping blanks and # comments.
+    :return: (commands, failures) where failures are (line_no, text, error) of lines that did not parse
+    """
+    commands, failures = [], []
+    for line_no, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+        try:
+            commands.append(parse_command(text, line_no))
+        except ValueError as e:
+            failures.append((line_no, text, str(e)))
+    return commands, failures
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples (0 if there are none)."""
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * pct // 100))  # ceil without floats
+    return samples[int(rank) - 1]
+
+
+def latency_summary(latencies: list, pcts=(50, 90, 99)) -> dict:
+    """{"p50": ..., ..., "max": ...} in milliseconds."""
+    ordered = sorted(latencies)
+    summary = {f"p{pct:g}": round(percentile(ordered, pct) * 1000, 3) for pct in pcts}
+    summary["max"] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+    return summary
+
+
+async def run_commands(commands, host: str = "localhost", port: int = 50000, window: int = 1) -> dict:
+    """
+    Send the commands over one connection, keeping up to `window` in flight.
+    :return: Report with counts, throughput, latency percentiles and failures
+    """
+    client = await AsyncSmartHomeProtocol.connect(host, port)
+    slots = asyncio.Semaphore(window)
+    latencies, failures = [], []
+
+    async def send(command: Command):
+        start = time.perf_counter()
+        try:
+            resp = await client.request(command.req_type, **command.fields)
+            error = None
+            if resp.getType() != REQS.LOUT and resp.getValue("status") != "success":
+                error = resp.getValue("error_message") or resp.getValue("status") or "no status"
+        except Exception as e:  # refused by validation, or the connection went away
+            error = f"{type(e).__name__}: {e}"
+        latencies.append(time.perf_counter() - start)
+        if error is not None:
+            failures.append((command.line_no, command.text, error))
+        slots.release()
+
+    start = time.perf_counter()
+    tasks = []
+    for command in commands:
+        await slots.acquire()
+        # Tasks start in creation order, so requests go out in file order
+        tasks.append(asyncio.get_running_loop().create_task(send(command)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    await client.close()
+
+    failures.sort()
+    return {
+        "commands": len(commands),
+        "succeeded": len(commands) - len(failures),
+        "failed": len(failures),
+        "window": window,
+        "seconds": round(elapsed, 4),
+        "per_second": round(len(commands) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+        "failures": [{"line": line_no, "command": text, "error": error} for line_no, text, error in failures],
+    }
+
+
+def format_report(report: dict) -> str:
+    latency = report["latency_ms"]
+    lines = [f"{report['commands']} commands in {report['seconds']:.3f}s "
+             f"({report['per_second']:,.0f}/s, window {report['window']}): "
+             f"{report['succeeded']} succeeded, {report['failed']} failed",
+             "latency ms: " + "  ".join(f"{name} {value:.2f}" for name, value in latency.items())]
+    for failure in report["failures"]:
+        lines.append(f"  line {failure['line']}: {failure['command']!r}: {failure['error']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a file of smart home commands")
+    parser.add_argument("commands", nargs="?", default="-", help="command file (default: stdin)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=50000)
+    parser.add_argument("--window", type=int, default=1, help="commands in flight at once (default: 1)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.commands == "-":
+        commands, bad_lines = read_commands(sys.stdin)
+    else:
+        with open(args.commands) as f:
+            commands, bad_lines = read_commands(f)
+
+    report = asyncio.run(run_commands(commands, args.host, args.port, max(1, args.window)))
+    # Lines that did not parse were never sent, but they are failures all the same
+    report["failed"] += len(bad_lines)
+    report["failures"] = sorted(report["failures"] + [{"line": line_no, "command": text, "error": error}
+                                                      for line_no, text, error in bad_lines],
+                                key=lambda failure: failure["line"])
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -113,24 +113,24 @@ class CSmessage:
                 raise ValueError("LOGIN requires username and password")
 
         elif req_type == REQS.QERY:
-            # "all" queries don't need query_value
+            # "all" and "stats" queries don't need query_value
             if 'query_type' not in self._data:
                 raise ValueError("QERY requires 'query_type' (all, room, group, device)")
 
-            if self._data['query_type'] != "all" and 'query_value' not in self._data:
+            if self._data['query_type'] not in ("all", "topology", "stats", "timers", "rules") and 'query_value' not in self._data:
                 raise ValueError("QERY requires 'query_value' for room, group, and device queries")
 
 
 
         elif req_type == REQS.CTRL:
-            # CTRL must have device_id and action
-            if 'device_id' not in self._data or 'action' not in self._data:
-                raise ValueError("CTRL requires device_id and action")
+            # CTRL must have an action and a device_id (or a room:/group: target)
+            if 'action' not in self._data or ('device_id' not in self._data and 'target' not in self._data):
+                raise ValueError("CTRL requires device_id (or target) and action")
 
 
 
             valid_actions = ["on", "off", "lock", "unlock", "open", "close", "up", "down", "dim", "color", 
-                             "arm", "disarm", "trigger_alarm", "stop_alarm"]
+                             "arm", "disarm", "trigger_alarm", "stop_alarm", "enter_code", "cancel_timer"]
             if self._data['action'] not in valid_actions:
                 raise ValueError(f"Invalid action '{self._data['action']}'")
 
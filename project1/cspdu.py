@@ -4,9 +4,12 @@ Created on Feb 15, 2025
 (forked from nigel)
 '''
 
+import time
 import socket
 from csmessage import CSmessage
 
+MAX_FRAME = 9999  # longest message a frame can carry: the length prefix is 4 digits
+
 class CSpdu:
     def __init__(self, comm: socket.socket):
         """
@@ -14,13 +17,20 @@ class CSpdu:
         """
         self._sock = comm
 
-    def _loopRecv(self, size: int):
+    def _loopRecv(self, size: int, deadline: float = None):
         """
         Ensure full reception of a message of given size.
+        :param deadline: time.monotonic() by which all of it must have arrived (None: no limit)
         """
         data = bytearray(size)
         mv = memoryview(data)
         while size:
+            if deadline is not None:
+                # Each recv gets only what is left, so a trickle of bytes cannot stretch the wait
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("deadline passed")
+                self._sock.settimeout(remaining)
             rsize = self._sock.recv_into(mv, size)
             if rsize == 0:
                 raise ConnectionError("Socket closed unexpectedly")
@@ -42,13 +52,14 @@ class CSpdu:
         except Exception as e:
             raise ConnectionError(f"Failed to send message: {e}")
 
-    def recvMessage(self) -> CSmessage:
+    def recvMessage(self, deadline: float = None) -> CSmessage:
         """
         Receive a CSmessage from the socket.
+        :param deadline: time.monotonic() by which the whole message must have arrived (None: no limit)
         """
         try:
-            size = int(self._loopRecv(4).decode('utf-8'))
-            params = self._loopRecv(size).decode('utf-8')
+            size = int(self._loopRecv(4, deadline).decode('utf-8'))
+            params = self._loopRecv(size, deadline).decode('utf-8')
             m = CSmessage()
             m.unmarshal(params)
             return m
@@ -4,25 +4,119 @@ Created on Feb 20, 2025
 (forked from nigel)
 '''
 
+import os
+import sys
 import socket
+import signal
 import logging
+import argparse
+import threading
 from csmessage import CSmessage, REQS
-from cspdu import CSpdu
-from home_model import SmartHouse, Room, Lamp, Blinds, Alarm, Lock, CeilingLight
+from cspdu import CSpdu, MAX_FRAME
+from home_model import Lamp, Blinds, Alarm, Lock, CeilingLight, HouseManager, UserManager, VALID_COLORS
+from house_workers import HouseWorkerPool
+from house_loader import SiteConfig, DEMO_CONFIG
+from throttle import AttemptThrottle, THROTTLED_ACTIONS
+from wal import MutationLog
+from history import DeviceHistory
+from events import EventBus
+from scheduler import Scheduler
+from rules import RuleEngine
+from permissions import PermissionSet, READ, SCHEDULE, ADMIN, action_class
 
 
 logging.basicConfig(level=logging.DEBUG)
 
+HISTORY_LIMIT = 50  # most changes one history query returns: more would not fit in a frame
+
+# Group names accepted by "group" and "history" queries
+QUERY_GROUPS = {"lamps": Lamp, "locks": Lock, "blinds": Blinds, "alarms": Alarm, "ceiling_lights": CeilingLight}
+
+# Extra CTRL fields an action may need, carried over when a control is scheduled or fanned out
+CONTROL_FIELDS = ("level", "color", "code")
+
+# Persistence lives in project2 (db_manager.py), imported only when --db is given
+PROJECT2_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "project2")
+
 class SmartHomeServer:
     """Smart Home TCP Server using request routing."""
     logger = logging.getLogger("SmartHomeServer")
 
-    def __init__(self, host="localhost", port=50000):
-        """Initialize the Smart Home Server."""
+    def __init__(self, host="localhost", port=50000, layout=None, num_workers=None, db=None, wal=None,
+                 auto_relock=None, alarm_after=3, history_entries=100_000):
+        """
+        Initialize the Smart Home Server.
+        :param layout: Object whose build_houses()/build_users() create the served houses and accounts,
+                       called again on reload (default: SiteConfig of the demo site file)
+        :param num_workers: Number of house worker threads (default: one per CPU)
+        :param db: Optional db_manager.DatabaseManager; stored device state is restored at
+                   startup and every successful CTRL is recorded to it
+        :param wal: Optional wal.MutationLog; replayed at startup (after the database), and
+                    every successful CTRL is acknowledged only once it is in the log
+        :param auto_relock: Seconds after which an unlocked lock locks itself again (None: never)
+        :param alarm_after: Failed unlock attempts in a row that trigger an armed alarm in the same house
+                            (installed as a rule per alarm; None or 0: never)
+        :param history_entries: Device changes kept in the history of all houses together,
+                                split evenly between the houses
+        """
         print("[INIT] Smart Home Server is starting...")
         self.host = host
         self.port = port
 
+        # Houses and users are owned by the server and shared by every session
+        if layout is None:
+            layout = SiteConfig()
+        self.layout = layout
+        self.houses = HouseManager()
+        self.users = UserManager()
+        self.throttles = {}  # { house_id: AttemptThrottle }, each only touched by its house's worker
+        self.histories = {}  # { house_id: DeviceHistory }, same
+        self.history_entries = history_entries
+
+        # Model events from every house; listeners run on the bus's own thread
+        self.events = EventBus()
+        self.events.subscribe("*", self._log_event)
+
+        houses = layout.build_houses()
+        for house in houses:
+            house.events = self.events
+            _adopt_pending_store(house)
+            self.houses.add_house(house)
+            self.throttles[house.house_id] = AttemptThrottle()
+            self.histories[house.house_id] = DeviceHistory(max_entries=self._history_share(len(houses)))
+        layout.build_users(self.users, list(self.houses.houses.values()))
+
+        # Restore device state: database first, then the (newer) log on top
+        self.db = db
+        self.wal = wal
+        if db is not None:
+            restored = db.restore_state(self.houses.houses.values())
+            print(f"[INIT] Restored state of {restored} devices from {db.path}")
+        if wal is not None:
+            replayed = wal.recover(self.houses.houses.values())
+            print(f"[INIT] Replayed log for {replayed} devices from {wal.directory}")
+        if db is not None:
+            db.save_site(self.houses.houses.values(), self.users.users_by_name.values())
+
+        self.workers = HouseWorkerPool(num_workers or os.cpu_count() or 4)
+
+        # Timed controls and rule actions run on the house's worker, as a "scheduler"/"rules" session of that house
+        self._system_sessions = {}  # { (house_id, user): SmartHomeServerOps }, each only touched by its house's worker
+        self.scheduler = Scheduler(self.workers, self._fire_timer)
+        self.rules = RuleEngine(self.events, self.workers, self.houses, self._fire_rule)
+        self.alarm_after = alarm_after
+        for house in self.houses.houses.values():
+            self._add_lockout_rules(house)
+        self.auto_relock = auto_relock
+        self._relock_timers = {}  # { (house_id, device_id): timer_id }, only touched by the event bus thread
+        if auto_relock:
+            self.events.subscribe("lock.unlocked", self._schedule_relock)
+
+        self._reload_lock = threading.Lock()
+        self._running = True
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.bind((self.host, self.port))
@@ -34,11 +128,11 @@ class SmartHomeServer:
             exit(1)
 
     def run(self):
-        """Main server loop."""
+        """Main server loop. Each client gets its own session thread."""
         print(f"[RUN] Smart Home Server is running on {self.host}:{self.port}...")
         logging.info("Waiting for client connections...")
 
-        while True:
+        while self._running:
             try:
                 print("[LISTENING] Waiting for a client to connect...")
                 client_socket, addr = self.server_socket.accept()
@@ -46,85 +140,237 @@ class SmartHomeServer:
                 logging.info(f"Client connected: {addr}")
                 self.connected = True
 
-                # Create PDU for communication
-                pdu = CSpdu(client_socket)
-
-                # Create an instance of SmartHomeServerOps to process requests
-                handler = SmartHomeServerOps()
-                handler.pdu = pdu
-                handler.connected = True
-
-                # Run the request handling loop
-                handler.run()
-
-                logging.info(f"Client {addr} disconnected.")
-                print(f"[DISCONNECTED] Client {addr} disconnected.")
-                client_socket.close()
+                threading.Thread(target=self._serve_client, args=(client_socket, addr), daemon=True).start()
 
             except Exception as e:
+                if not self._running:
+                    break  # shutdown() closed the listening socket
                 logging.error(f"[ERROR] Server error: {e}")
                 print(f"[ERROR] Server error: {e}")
 
+    def shutdown(self):
+        """Stop accepting clients and stop the scheduler, rules, event bus and house workers."""
+        self._running = False
+        try:
+            self.server_socket.shutdown(socket.SHUT_RDWR)  # wakes a blocked accept() (close alone doesn't)
+        except OSError:
+            pass
+        self.server_socket.close()
+        self.scheduler.shutdown()
+        self.rules.shutdown()
+        self.events.shutdown()
+        self.workers.shutdown()
+        for house in self.houses.houses.values():
+            if house.store is not None and hasattr(house.store, "close"):
+                house.store.close()  # flushes a mapped state file
+
+    def _serve_client(self, client_socket, addr):
+        """Session thread: socket I/O only, house work is handed to the house's worker."""
+        try:
+            # Replies are small frames; don't let Nagle hold back replies to pipelined requests
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Create PDU for communication
+            pdu = CSpdu(client_socket)
 
-class SmartHomeServerOps:
-    """Handles Smart Home client requests."""
-    logger = logging.getLogger("SmartHomeServerOps")
-
-    def __init__(self):
-        
-
-        # 1) Create the House
-        self.smart_home = SmartHouse(1, "My Demo House")
-
-        # 2) Create the Rooms
-        living_room = Room(room_id=101, name="Living Room")
-        kitchen = Room(room_id=102, name="Kitchen")
-        bedroom = Room(room_id=103, name="Bedroom")
-
-        # Add rooms to the house
-        self.smart_home.add_room(living_room)
-        self.smart_home.add_room(kitchen)
-        self.smart_home.add_room(bedroom)
-
-        # 3) Add devices to the Living Room
-        lr_light1 = Lamp(device_id=0, on=False, shade=100)
-        lr_light2 = Lamp(device_id=0, on=False, shade=100)
-        lr_light3 = Lamp(device_id=0, on=False, shade=100)
-        lr_blinds = Blinds(device_id=0, is_up=True, is_open=False)
-
-        living_room.add_lamp(lr_light1)
-        living_room.add_lamp(lr_light2)
-        living_room.add_lamp(lr_light3)
-        living_room.add_blinds(lr_blinds)
+            # Create an instance of SmartHomeServerOps to process requests
+            handler = SmartHomeServerOps(server=self)
+            handler.pdu = pdu
+            handler.connected = True
 
-        # 4) Add devices to the Kitchen
-        kitchen_light = CeilingLight(device_id=0, on=False, shade=100)
-        kitchen.add_ceiling_light(kitchen_light)
+            # Run the request handling loop
+            handler.run()
 
-        # 5) Add devices to the Bedroom
-        bed_light1 = Lamp(device_id=0, on=False, shade=100)
-        bed_light2 = Lamp(device_id=0, on=False, shade=100)
-        bed_blinds = Blinds(device_id=0, is_up=True, is_open=False)
+            logging.info(f"Client {addr} disconnected.")
+            print(f"[DISCONNECTED] Client {addr} disconnected.")
+        except Exception as e:
+            logging.error(f"[ERROR] Session error: {e}")
+            print(f"[ERROR] Session error: {e}")
+        finally:
+            client_socket.close()
+
+    def throttle_for(self, house_id: int) -> AttemptThrottle:
+        return self.throttles[house_id]
+
+    def stats(self, house_id: int) -> dict:
+        """Server stats as seen from a session bound to house_id."""
+        return {
+            "throttle": self.throttle_for(house_id).stats(),
+            "history": self.histories[house_id].stats(),
+            "workers": self.workers.stats(),
+            "events": self.events.stats(),
+            "scheduler": self.scheduler.stats(),
+            "rules": self.rules.stats(),
+            "houses": len(self.houses.houses),
+            "db": self.db.stats() if self.db is not None else None,
+            "wal": self.wal.stats() if self.wal is not None else None
+        }
 
-        bedroom.add_lamp(bed_light1)
-        bedroom.add_lamp(bed_light2)
-        bedroom.add_blinds(bed_blinds)
+    @staticmethod
+    def _log_event(event):
+        logging.debug(f"[EVENT] house {event.house_id} device {event.device_id}: {event.topic} {event.data}")
 
-        alarm = Alarm(code=9999, is_armed=False, is_alarm=False)
-       
-        living_room._assign_device_id(alarm)
-        living_room.devices[alarm.device_id] = alarm
+    def _system_control(self, house_id: int, user: str, target: str, action: str, fields: dict) -> CSmessage:
+        """
+        Runs on the house's worker: apply a control like a CTRL request from `user`,
+        so history, database, log and events see it like any other change.
+        """
+        key = (house_id, user)
+        session = self._system_sessions.get(key)
+        if session is None:
+            session = SmartHomeServerOps(server=self)
+            session.logged_in_user = user
+            session._bind_house(house_id)
+            self._system_sessions[key] = session
+        resp = session._controlTargets(target, action, fields)
+        session._wal_seq = 0  # nobody waits for these log records
+        return resp
 
-        # Two Locks
-        lock1 = Lock(device_id=0, code=["1234", "1235", "1236", "1237", "1238"], is_unlocked=False)
-        lock2 = Lock(device_id=0, code=["9999", "9998", "9997", "9996", "9995"], is_unlocked=False)
-        living_room.add_lock(lock1)
-        living_room.add_lock(lock2)
+    def _fire_timer(self, timer):
+        """Runs on the timer's house worker."""
+        if self.houses.get_house(timer.house_id) is None:
+            return
+        resp = self._system_control(timer.house_id, "scheduler", timer.target, timer.action, timer.fields)
+        logging.info(f"[TIMER] {timer.action} {timer.target} (house {timer.house_id}): "
+                     f"{resp.getValue('status')} {resp.getValue('applied') or resp.getValue('error_message')}")
+
+    def _fire_rule(self, rule):
+        """Runs on the rule's house worker, once its conditions hold."""
+        resp = self._system_control(rule.house_id, "rules", rule.target, rule.action, rule.fields)
+        logging.info(f"[RULE] {rule.name or rule.rule_id}: {rule.action} {rule.target} (house {rule.house_id}): "
+                     f"{resp.getValue('status')} {resp.getValue('applied') or resp.getValue('error_message')}")
+
+    def _add_lockout_rules(self, house):
+        """
+        alarm_after failed unlock attempts in a row on any lock of the house
+        trigger each of its armed alarms.
+        """
+        self.rules.remove_where(lambda rule: rule.house_id == house.house_id and rule.name == "lockout")
+        if not self.alarm_after:
+            return
+        for room in house.rooms.values():
+            for device_id, device in room.devices.items():
+                if isinstance(device, Alarm):
+                    self.rules.add_rule(house.house_id, "lock.failed", (f"device:{device_id}", "trigger_alarm"),
+                                        conditions=[("event", "attempts", ">=", self.alarm_after),
+                                                    ("device", device_id, "is_armed", "==", True)],
+                                        name="lockout")
+
+    def _schedule_relock(self, event):
+        """Event listener: lock the device again auto_relock seconds after it was unlocked."""
+        key = (event.house_id, event.device_id)
+        previous = self._relock_timers.pop(key, None)
+        if previous is not None:
+            self.scheduler.cancel(previous)
+        timer = self.scheduler.schedule(event.house_id, f"device:{event.device_id}", "lock", delay=self.auto_relock)
+        self._relock_timers[key] = timer.timer_id
+
+    def request_reload(self):
+        """
+        Ask for the house layout to be reloaded. Safe to call from a signal
+        handler: the work happens on a separate thread.
+        """
+        threading.Thread(target=self.reload_house, name="layout-reload", daemon=True).start()
 
+    def reload_house(self) -> bool:
+        """
+        Rebuild the houses from the layout (re-reading the site file) off to the side,
+        then swap each one in on its own worker, so the swap is ordered with that
+        house's requests. Device state is carried across where IDs match.
+        The old houses keep serving if the new layout fails to build.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            print("[RELOAD] Already in progress.")
+            return False
+        try:
+            try:
+                new_houses = self.layout.build_houses()
+            except Exception as e:
+                reason = " ".join([str(e), *getattr(e, "__notes__", ())])  # site file errors note the record
+                logging.error(f"[RELOAD] Keeping current layout, new one failed to build: {reason}")
+                print(f"[RELOAD] Failed: {reason}")
+                return False
+
+            carried = 0
+            share = self._history_share(len(set(self.histories) | {house.house_id for house in new_houses}))
+            for house in new_houses:
+                house.events = self.events
+                if house.house_id not in self.throttles:
+                    self.throttles[house.house_id] = AttemptThrottle()
+                    self.histories[house.house_id] = DeviceHistory(max_entries=share)
+                carried += self.workers.call(house.house_id, self._swap_house, house)
+                self._add_lockout_rules(house)
+            # New houses take their share of the history from the others
+            for house_id, history in list(self.histories.items()):
+                self.workers.call(house_id, history.resize, share)
+            if self.db is not None:
+                self.db.save_site(new_houses)
+            logging.info(f"[RELOAD] House layout reloaded, state carried for {carried} devices.")
+            print(f"[RELOAD] House layout reloaded ({carried} devices kept their state).")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def _history_share(self, houses: int) -> int:
+        """Changes each house's history may keep, so all of them together keep history_entries."""
+        return max(1, self.history_entries // max(1, houses))
+
+    def _swap_house(self, new_home) -> int:
+        """
+        Runs on the house's worker: carry state and history from the live house, move
+        the new house into the live house's store (if the loader handed it one), then
+        replace it and close a store the new house no longer uses.
+        """
+        old_home = self.houses.get_house(new_home.house_id)
+        carried = new_home.carry_state_from(old_home) if old_home is not None else 0
+        self.histories[new_home.house_id].keep_devices(
+            {device_id: device.TYPE_NAME for room in new_home.rooms.values() for device_id, device in room.devices.items()})
+        _adopt_pending_store(new_home)
+        self.houses.replace_house(new_home)  # sessions pick it up on their next request
+        old_store = old_home.store if old_home is not None else None
+        if old_store is not None and old_store is not new_home.store and hasattr(old_store, "close"):
+            old_store.close()
+        return carried
+
+
+def _adopt_pending_store(house):
+    """Move a house the loader built against an open store into that store (see load_site)."""
+    store = house.pending_store
+    if store is None:
+        return
+    house.pending_store = None
+    store.start_layout()
+    house.adopt_store(store)
+    store.release_unclaimed()
 
-        #print(f"Device IDs assigned: {[d.device_id for room in self.smart_home.rooms.values() for d in room.devices.values()]}")
 
+class SmartHomeServerOps:
+    """Handles Smart Home client requests."""
+    logger = logging.getLogger("SmartHomeServerOps")
 
+    def __init__(self, throttle=None, server=None):
+        """
+        :param throttle: AttemptThrottle to use (defaults to the bound house's, or a private one)
+        :param server: Owning SmartHomeServer; without one the session gets its own demo houses and users
+        """
+        self.logged_in_user = None
+        self.house_id = None  # bound at login
+        self._perms = None  # PermissionSet of the logged in user in the bound house (None: system session)
+        self.server = server
+        self._wal_seq = 0  # log record the current reply has to wait for
+        self._history = DeviceHistory() if server is None else None
+        if server is None:
+            self._houses = HouseManager()
+            self._users = UserManager()
+            layout = SiteConfig()
+            for house in layout.build_houses():
+                self._houses.add_house(house)
+            layout.build_users(self._users, list(self._houses.houses.values()))
+
+        # Code-guessing limits: the device buckets live in the throttle,
+        # this session only owns its own bucket
+        self._fixed_throttle = throttle
+        self.throttle = throttle if throttle is not None else AttemptThrottle()
+        self._attempts = self.throttle.new_session_bucket()
 
         # Routing table
         self._route = {
@@ -134,30 +380,88 @@ class SmartHomeServerOps:
             REQS.QERY: self._doQuery
         }
 
+    @property
+    def history(self) -> DeviceHistory:
+        """Change history of the bound house."""
+        return self.server.histories[self.house_id] if self.server is not None else self._history
+
+    @property
+    def houses(self) -> HouseManager:
+        return self.server.houses if self.server is not None else self._houses
+
+    @property
+    def users(self) -> UserManager:
+        return self.server.users if self.server is not None else self._users
+
+    @property
+    def smart_home(self):
+        """The house this session is bound to. Looked up on every access so a reload applies to live sessions."""
+        return self.houses.get_house(self.house_id)
+
     def _doLogin(self, req: CSmessage) -> CSmessage:
-        """Handles login request."""
+        """
+        Handles login request. The session is bound to the requested house_id,
+        or to the user's lowest accessible house if none is given.
+        """
         username = req.getValue("username")
         password = req.getValue("password")
         SmartHomeServerOps.logger.info(f"[LOGIN] Attempt from: {username}")
 
-        #how to handle admin priveleges here lol
-        if username == "hannahbanana" and password == "JuniperTheCat":
-            self.logged_in_user = username
-            resp = CSmessage(REQS.LGIN)
-            resp.addValue("status", "success")
-            print(f"[LOGIN SUCCESS] User: {username}")
-        else:
-            resp = CSmessage(REQS.LGIN)
+        resp = CSmessage(REQS.LGIN)
+        user = self.users.get_user(username)
+        if user is None or not user.verify_password(password):
             resp.addValue("status", "failure")
             print(f"[LOGIN FAILED] User: {username}")
+            return resp
+
+        house_id = req.getValue("house_id")
+        try:
+            house_id = int(house_id) if house_id is not None else min(user.accessible_houses)
+        except ValueError:
+            house_id = None
+        if house_id not in user.accessible_houses or self.houses.get_house(house_id) is None:
+            resp.addValue("status", "failure")
+            resp.addValue("error_message", "No access to the requested house.")
+            print(f"[LOGIN FAILED] User: {username} has no access to house {house_id}")
+            return resp
 
+        self.logged_in_user = username
+        self._bind_house(house_id)
+        self._perms = PermissionSet(user, house_id)
+        resp.addValue("status", "success")
+        resp.addValue("house_id", str(house_id))
+        if req.getValue("topology") == "1":
+            # Opt-in bootstrap: rooms and devices ride along, so the client needs no "query all"
+            topology = self.server.workers.call(house_id, self._topology) if self.server is not None else self._topology()
+            text = str(topology)
+            if len(resp.marshal()) + len(CSmessage.PJOIN + CSmessage.VJOIN.format("topology", text)) <= MAX_FRAME:
+                resp.addValue("topology", text)
+            else:
+                # Hundreds of devices don't fit in one frame; the client asks with a topology query instead
+                resp.addValue("topology_truncated", "1")
+        print(f"[LOGIN SUCCESS] User: {username} (house {house_id})")
         return resp
 
+    def _topology(self) -> dict:
+        """Rooms (with names), device IDs and types of the bound house that the user may read."""
+        house = self.smart_home
+        rooms = None if self._perms is None else [room_id for room_id in house.rooms if self._allowed(READ, room_id)]
+        return {"version": house.topology_version, "rooms": house.topology(rooms)}
+
+    def _bind_house(self, house_id: int):
+        self.house_id = house_id
+        if self.server is not None and self._fixed_throttle is None:
+            throttle = self.server.throttle_for(house_id)
+            if throttle is not self.throttle:
+                self.throttle = throttle
+                self._attempts = throttle.new_session_bucket()
+
     def _doLogout(self, req: CSmessage) -> CSmessage:
         """Handles logout request."""
         print(f"[LOGOUT] User: {self.logged_in_user} logging out.")
         SmartHomeServerOps.logger.info(f"Logging out user: {self.logged_in_user}")
         self.logged_in_user = None
+        self._perms = None
         self.connected = False  # terminate session
         return CSmessage(REQS.LOUT)
 
@@ -182,6 +486,19 @@ class SmartHomeServerOps:
             resp.addValue("error_message", "User not logged in")
             return resp
 
+        # Timed controls, and controls of a whole room or group ("target": "room:101")
+        if req.getValue("delay") is not None or req.getValue("at") is not None:
+            return self._scheduleControl(req)
+        if req.getValue("every") is not None:
+            resp = CSmessage(REQS.CTRL)
+            resp.addValue("status", "error")
+            resp.addValue("error_message", "Invalid timer: 'every' needs a 'delay' or an 'at' to start from.")
+            return resp
+        if req.getValue("action") == "cancel_timer":
+            return self._cancelTimer(req)
+        if req.getValue("target") is not None:
+            return self._controlTargets(req.getValue("target"), req.getValue("action"), _control_fields(req))
+
         # 1) Get the device_id and action from the request
         device_id_str = req.getValue("device_id")
         action = req.getValue("action")
@@ -195,6 +512,12 @@ class SmartHomeServerOps:
             resp.addValue("error_message", f"Invalid device_id: {device_id_str}")
             return resp
 
+        throttled = action in THROTTLED_ACTIONS
+        if throttled:
+            wait = self.throttle.check_session(self._attempts)
+            if wait:
+                return self._throttledResponse(device_id, wait)
+
         # 2) Find the actual device object in the house
         found_device = None
         for room in self.smart_home.rooms.values():
@@ -209,6 +532,14 @@ class SmartHomeServerOps:
             resp.addValue("error_message", f"Device {device_id} not found in any room.")
             return resp
 
+        if not self._allowed(action_class(action), room.room_id):
+            return self._deniedResponse(REQS.CTRL, f"'{action}' on device {device_id}")
+
+        if throttled:
+            wait = self.throttle.check_device(self._attempts, device_id)
+            if wait:
+                return self._throttledResponse(device_id, wait)
+
         # 3) Device-Specific Logic
 
         if isinstance(found_device, Lamp) or isinstance(found_device, CeilingLight):
@@ -259,11 +590,10 @@ class SmartHomeServerOps:
                     resp.addValue("error_message", "Missing color value for color action.")
                     return resp
 
-                valid_colors = ["red", "green", "blue", "white", "yellow", "purple", "orange"]
-                if color_str.lower() not in valid_colors:
+                if color_str.lower() not in VALID_COLORS:
                     resp = CSmessage(REQS.CTRL)
                     resp.addValue("status", "error")
-                    resp.addValue("error_message", f"Invalid color '{color_str}'. Supported colors: {', '.join(valid_colors)}.")
+                    resp.addValue("error_message", f"Invalid color '{color_str}'. Supported colors: {', '.join(VALID_COLORS)}.")
                     return resp
 
                 found_device.change_color(color_str.lower())  # Apply color change
@@ -293,6 +623,8 @@ class SmartHomeServerOps:
                     print(f"[DEVICE CONTROL] Unlocked device {device_id} (Lock)")
                 else:
                     print(f"[DEVICE CONTROL] Incorrect code for unlocking device {device_id}. Failed attempts: {found_device.failed_attempts}")
+                    # Its own action, so "when was it last unlocked?" doesn't find failed attempts
+                    self._record_change(found_device, room.room_id, "unlock_failed")
                     resp = CSmessage(REQS.CTRL)
                     resp.addValue("status", "error")
                     resp.addValue("error_message", "Incorrect unlock code.")
@@ -425,10 +757,144 @@ class SmartHomeServerOps:
                           f"Device {device_id} type is not recognized or supported by this server.")
             return resp
 
+        self._record_change(found_device, room.room_id, action)
+        resp = CSmessage(REQS.CTRL)
+        resp.addValue("status", "success")
+        return resp
+
+    def _controlTargets(self, target: str, action: str, fields: dict) -> CSmessage:
+        """
+        Apply one action to every device of a target ("device:9", "room:101", "group:locks"),
+        each as its own CTRL. Devices that don't support the action (or that the user
+        may not control) are skipped.
+        """
+        resp = CSmessage(REQS.CTRL)
+        if not self._allowed(SCHEDULE):
+            return self._deniedResponse(REQS.CTRL, f"controlling all of {target}")
+        try:
+            device_ids = self._targetDevices(target)
+        except ValueError as e:
+            resp.addValue("status", "error")
+            resp.addValue("error_message", f"Invalid target '{target}': {e}")
+            return resp
+
+        applied = []
+        for device_id in device_ids:
+            req = CSmessage(REQS.CTRL)
+            req.addValue("device_id", str(device_id))
+            req.addValue("action", action)
+            for field, value in fields.items():
+                req.addValue(field, value)
+            if self._doDeviceControl(req).getValue("status") == "success":
+                applied.append(device_id)
+
+        if not applied:
+            resp.addValue("status", "error")
+            resp.addValue("error_message", f"No device in {target} accepted '{action}'.")
+            return resp
+        print(f"[DEVICE CONTROL] {action} applied to {len(applied)} of {len(device_ids)} devices in {target}")
+        resp.addValue("status", "success")
+        resp.addValue("applied", ",".join(str(device_id) for device_id in applied))
+        return resp
+
+    def _scheduleControl(self, req: CSmessage) -> CSmessage:
+        """
+        Schedule a CTRL instead of running it: "delay" (seconds) or "at" ("HH:MM", daily),
+        optionally repeated "every" N seconds. The control runs later on the house's worker.
+        """
+        resp = CSmessage(REQS.CTRL)
+        if self.server is None:
+            resp.addValue("status", "error")
+            resp.addValue("error_message", "Timers are not available in this session.")
+            return resp
+
+        action = req.getValue("action")
+        target = req.getValue("target") or f"device:{req.getValue('device_id')}"
+        try:
+            # Checked now, resolved again when the timer fires (as the scheduler, which may do anything)
+            device_ids = self._targetDevices(target)
+            if not self._allowed(SCHEDULE) or not all(
+                    self._allowed(action_class(action), self._roomOf(device_id)) for device_id in device_ids):
+                return self._deniedResponse(REQS.CTRL, f"scheduling '{action}' on {target}")
+            delay = req.getValue("delay")
+            every = req.getValue("every")
+            timer = self.server.scheduler.schedule(
+                self.house_id, target, action, _control_fields(req),
+                delay=float(delay) if delay is not None else None,
+                at=req.getValue("at"),
+                every=float(every) if every is not None else None
+            )
+        except ValueError as e:
+            resp.addValue("status", "error")
+            resp.addValue("error_message", f"Invalid timer: {e}")
+            return resp
+
+        print(f"[TIMER] {self.logged_in_user} scheduled {action} on {target} (timer {timer.timer_id})")
+        resp.addValue("status", "success")
+        resp.addValue("timer_id", str(timer.timer_id))
+        return resp
+
+    def _cancelTimer(self, req: CSmessage) -> CSmessage:
+        """Cancel a pending timer of the bound house ("timer_id" field)."""
         resp = CSmessage(REQS.CTRL)
+        if not self._allowed(SCHEDULE):
+            return self._deniedResponse(REQS.CTRL, "cancelling timers")
+        try:
+            timer_id = int(req.getValue("timer_id"))
+        except (TypeError, ValueError):
+            timer_id = None
+        scheduler = self.server.scheduler if self.server is not None else None
+        timer = scheduler.get(timer_id) if scheduler is not None and timer_id is not None else None
+        if timer is None or timer.house_id != self.house_id or not scheduler.cancel(timer_id):
+            resp.addValue("status", "error")
+            resp.addValue("error_message", f"No pending timer {req.getValue('timer_id')}.")
+            return resp
+        print(f"[TIMER] {self.logged_in_user} cancelled timer {timer_id}")
         resp.addValue("status", "success")
         return resp
 
+    def _record_change(self, device, room_id: int, action: str):
+        """
+        Record a changed device in the history, and in the server's database and
+        log if it has them. Nothing blocks here; _dispatch waits for the log
+        record before replying.
+        """
+        self.smart_home.touch()
+        self.history.record(device, room_id, action, self.logged_in_user)
+        if self.server is None:
+            return
+        if self.server.db is not None:
+            self.server.db.record_state(self.house_id, device)
+        if self.server.wal is not None:
+            self._wal_seq = self.server.wal.append(self.house_id, device)
+
+    def _allowed(self, bits: int, room_id: int = None) -> bool:
+        """Permission check for the bound house; system sessions (no PermissionSet) may do anything."""
+        return self._perms is None or self._perms.allows(bits, room_id)
+
+    def _deniedResponse(self, req_type, what: str) -> CSmessage:
+        print(f"[DENIED] {self.logged_in_user}: {what}")
+        resp = CSmessage(req_type)
+        resp.addValue("status", "error")
+        resp.addValue("error_message", f"Permission denied: {what}.")
+        return resp
+
+    def _roomOf(self, device_id: int):
+        """Room ID holding a device of the bound house, or None."""
+        for room in self.smart_home.rooms.values():
+            if room.get_device(device_id) is not None:
+                return room.room_id
+        return None
+
+    def _throttledResponse(self, device_id: int, wait: float) -> CSmessage:
+        """Rejects a code attempt without running any device logic."""
+        print(f"[THROTTLED] Code attempt on device {device_id}, retry in {wait:.1f}s")
+        resp = CSmessage(REQS.CTRL)
+        resp.addValue("status", "error")
+        resp.addValue("error_message", "Too many code attempts. Try again later.")
+        resp.addValue("retry_after", f"{wait:.2f}")
+        return resp
+
     
     def _doQuery(self, req: CSmessage) -> CSmessage:
         """Handles device status queries for All Devices, By Room, By Group, or By Device."""
@@ -449,18 +915,20 @@ class SmartHomeServerOps:
             query_value = req.getValue("query_value")  # Room ID, Group Name, or Device ID
 
             if query_type == "all":
-                # Return status of all rooms and devices with type information
-                all_status = {}
-                for room_id, room in self.smart_home.rooms.items():
-                    room_status = {}
-                    for device_id, device in room.devices.items():
-                        # Add device type to each device status
-                        device_status = device.check_status()
-                        device_status["type"] = type(device).__name__
-                        room_status[device_id] = device_status
-                    all_status[room_id] = room_status
-                    
-                status = all_status
+                if self.smart_home.store is not None:
+                    # Houses with a device store (columnar or mapped) export straight from it
+                    status = self.smart_home.store.export_status()
+                    if self._perms is not None:
+                        status = {room_id: devices for room_id, devices in status.items() if self._allowed(READ, room_id)}
+                else:
+                    # Return status of all rooms and devices (cached device statuses already carry their type)
+                    all_status = {}
+                    for room_id, room in self.smart_home.rooms.items():
+                        if not self._allowed(READ, room_id):
+                            continue
+                        all_status[room_id] = {device_id: device.check_status() for device_id, device in room.devices.items()}
+
+                    status = all_status
                 print("[QUERY] Returning status for all devices.")
                 self.logger.info("[QUERY] Returning status for all devices.")
 
@@ -471,14 +939,11 @@ class SmartHomeServerOps:
                     room = self.smart_home.get_room(room_id)
                     if not room:
                         raise ValueError("Room not found")
-                    
-                    # Add type information to each device in the room
-                    room_status = {}
-                    for device_id, device in room.devices.items():
-                        device_status = device.check_status()
-                        device_status["type"] = type(device).__name__
-                        room_status[device_id] = device_status
-                        
+                    if not self._allowed(READ, room_id):
+                        return self._deniedResponse(REQS.QERY, f"reading room {room_id}")
+
+                    room_status = {device_id: device.check_status() for device_id, device in room.devices.items()}
+
                     status = {room_id: room_status}
                     print(f"[QUERY] Returning status for Room {room_id}")
                     self.logger.info(f"[QUERY] Returning status for Room {room_id}")
@@ -492,16 +957,13 @@ class SmartHomeServerOps:
                 group_name = query_value.lower()
                 group_status = {}
                 
+                group_cls = QUERY_GROUPS.get(group_name, ())
                 for room in self.smart_home.rooms.values():
+                    if not self._allowed(READ, room.room_id):
+                        continue
                     for device_id, device in room.devices.items():
-                        if (group_name == "lamps" and isinstance(device, Lamp)) or \
-                        (group_name == "locks" and isinstance(device, Lock)) or \
-                        (group_name == "blinds" and isinstance(device, Blinds)) or \
-                        (group_name == "alarms" and isinstance(device, Alarm)) or \
-                        (group_name == "ceiling_lights" and isinstance(device, CeilingLight)):
-                            device_status = device.check_status()
-                            device_status["type"] = type(device).__name__
-                            group_status[device_id] = device_status
+                        if isinstance(device, group_cls):
+                            group_status[device_id] = device.check_status()
 
                 if not group_status:
                     print(f"[QUERY] No devices found in group '{group_name}'")
@@ -521,11 +983,10 @@ class SmartHomeServerOps:
 
                     if not found_device:
                         raise ValueError("Device not found")
+                    if not self._allowed(READ, room.room_id):
+                        return self._deniedResponse(REQS.QERY, f"reading device {device_id}")
 
-                    # Already includes type in the device query
-                    device_status = found_device.check_status()
-                    device_status["type"] = type(found_device).__name__
-                    status = {device_id: device_status}
+                    status = {device_id: found_device.check_status()}
                     
                     print(f"[QUERY] Returning status for Device {device_id}")
                     self.logger.info(f"[QUERY] Returning status for Device {device_id}")
@@ -534,9 +995,61 @@ class SmartHomeServerOps:
                     resp.addValue("error_message", f"Invalid device ID: {query_value}")
                     return resp
 
+            elif query_type == "history":
+                # query_value is "device:<id>", "room:<id>" or "group:<name>";
+                # optional since/until (Unix time), action and limit fields narrow it down
+                try:
+                    device_ids = self._targetDevices(query_value)
+                    if self._perms is not None:
+                        readable = {device_id for room in self.smart_home.rooms.values() if self._allowed(READ, room.room_id)
+                                    for device_id in room.devices}
+                        device_ids = [device_id for device_id in device_ids if device_id in readable]
+                    since = req.getValue("since")
+                    until = req.getValue("until")
+                    limit = int(req.getValue("limit", HISTORY_LIMIT))
+                    if limit < 0:
+                        raise ValueError("limit can't be negative")
+                    changes = self.history.changes(
+                        device_ids,
+                        since=float(since) if since is not None else None,
+                        until=float(until) if until is not None else None,
+                        action=req.getValue("action"),
+                        limit=min(limit, HISTORY_LIMIT)
+                    )
+                except ValueError as e:
+                    resp.addValue("status", "error")
+                    resp.addValue("error_message", f"Invalid history query: {e}")
+                    return resp
+                status = {"history": changes}
+                print(f"[QUERY] Returning {len(changes)} history entries for {query_value}")
+
+            elif query_type == "topology":
+                status = self._topology()
+                print(f"[QUERY] Returning the topology of house {self.house_id}.")
+
+            elif query_type in ("timers", "rules", "stats") and not self._allowed(SCHEDULE if query_type == "timers" else ADMIN):
+                return self._deniedResponse(REQS.QERY, f"the {query_type} query")
+
+            elif query_type == "timers":
+                timers = self.server.scheduler.pending(self.house_id) if self.server is not None else []
+                status = {"timers": [timer.as_dict() for timer in timers]}
+                print(f"[QUERY] Returning {len(timers)} pending timers.")
+
+            elif query_type == "rules":
+                rules = self.server.rules.rules(self.house_id) if self.server is not None else []
+                status = {"rules": [rule.as_dict() for rule in rules]}
+                print(f"[QUERY] Returning {len(rules)} rules.")
+
+            elif query_type == "stats":
+                if self.server is not None:
+                    status = self.server.stats(self.house_id)
+                else:
+                    status = {"throttle": self.throttle.stats()}
+                print("[QUERY] Returning server stats.")
+
             else:
                 resp.addValue("status", "error")
-                resp.addValue("error_message", "Invalid query type. Use 'all', 'room', 'group', or 'device'.")
+                resp.addValue("error_message", "Invalid query type. Use 'all', 'room', 'group', 'device', 'history', 'topology', 'timers', 'rules' or 'stats'.")
                 return resp
 
             # Create response message with successful status
@@ -554,15 +1067,68 @@ class SmartHomeServerOps:
         
         return resp
 
+    def _targetDevices(self, target: str) -> list:
+        """Device IDs named by a history or control target ("device:9", "room:101", "group:locks")."""
+        scope, _, value = target.partition(":")
+        if scope == "device":
+            return [int(value)]
+        if scope == "room":
+            room = self.smart_home.get_room(int(value))
+            if room is None:
+                raise ValueError(f"room {value} not found")
+            return list(room.devices)
+        if scope == "group":
+            if value.lower() not in QUERY_GROUPS:
+                raise ValueError(f"unknown group '{value}'")
+            group_cls = QUERY_GROUPS[value.lower()]
+            return [device_id for room in self.smart_home.rooms.values()
+                    for device_id, device in room.devices.items() if isinstance(device, group_cls)]
+        raise ValueError("target must be device:<id>, room:<id> or group:<name>")
+
     def _process(self, req: CSmessage) -> CSmessage:
         """Routes requests."""
         handler = self._route.get(req.getType(), None)
         if handler:
-            return handler(req)
+            resp = handler(req)
+            if req.getType() in (REQS.CTRL, REQS.QERY) and self.house_id is not None and self.smart_home is not None:
+                # Lets clients tell whether what they cached from this house is still current
+                resp.addValue("version", str(self.smart_home.version))
+            return resp
         else:
             print(f"[WARNING] Unknown request type: {req.getType()}")
         return CSmessage(REQS.LOUT)
 
+    def _dispatch(self, req: CSmessage) -> CSmessage:
+        """
+        Runs requests that touch the bound house on that house's worker thread;
+        login/logout (and anything before login) stay on the session thread.
+        """
+        if self.server is not None and self.house_id is not None and req.getType() in (REQS.CTRL, REQS.QERY):
+            resp = self.server.workers.call(self.house_id, self._process, req)
+            if self._wal_seq:
+                # Wait here, not on the worker, so the house keeps serving while the
+                # log thread batches this record with other sessions' into one fsync
+                seq, self._wal_seq = self._wal_seq, 0
+                try:
+                    self.server.wal.wait_durable(seq)
+                except OSError as e:
+                    # Too late to undo the change; say it may not survive a restart
+                    logging.error(f"[WAL] {e}")
+                    failed = CSmessage(resp.getType())
+                    failed.addValue("status", "error")
+                    failed.addValue("error_message", f"Change applied but not durable: {e}")
+                    if resp.getValue("version") is not None:
+                        failed.addValue("version", resp.getValue("version"))
+                    return failed
+            return resp
+        return self._process(req)
+
+    def shutdown(self):
+        """Ends the session."""
+        self.connected = False
+        self.logged_in_user = None
+        self.house_id = None
+
     def run(self):
         """Server loop."""
         print("[START] Handling client requests...")
@@ -573,7 +1139,7 @@ class SmartHomeServerOps:
                     print(f"[REQUEST] Received: {req}")
                     SmartHomeServerOps.logger.info(f"Received request: {req}")
 
-                    resp = self._process(req)
+                    resp = _fit_frame(self._dispatch(req))
                     print(f"[RESPONSE] Sending: {resp}")
                     SmartHomeServerOps.logger.info(f"Sending response: {resp}")
 
@@ -598,6 +1164,59 @@ class SmartHomeServerOps:
         self.shutdown()
 
 
+def _fit_frame(resp: CSmessage) -> CSmessage:
+    """The response, or an error in its place if it is too big for one CSpdu frame."""
+    size = len(resp.marshal())
+    if size <= MAX_FRAME:
+        return resp
+    error = CSmessage(resp.getType())
+    error.addValue("status", "error")
+    error.addValue("error_message", f"Response too large ({size} bytes, a frame holds {MAX_FRAME}).")
+    return error
+
+
+def _control_fields(req: CSmessage) -> dict:
+    return {field: req.getValue(field) for field in CONTROL_FIELDS if req.getValue(field) is not None}
+
+
 # Code for running the server
-server = SmartHomeServer()  # Default host="localhost", port=50000
-server.run()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Home TCP server")
+    parser.add_argument("config", nargs="?", default=DEMO_CONFIG,
+                        help="site file (.jsonl, .csv, .json or .toml) describing the houses and users")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=None, help="house worker threads (default: one per CPU)")
+    parser.add_argument("--db", default=None, help="SQLite file to persist houses, users and device state in")
+    parser.add_argument("--sync-writes", action="store_true", help="write each change before replying (no write-behind)")
+    parser.add_argument("--wal", default=None, help="directory for the write-ahead log of device changes")
+    parser.add_argument("--auto-relock", type=float, default=None, metavar="SECONDS",
+                        help="lock every lock again this many seconds after it is unlocked")
+    parser.add_argument("--alarm-after", type=int, default=3, metavar="ATTEMPTS",
+                        help="failed unlock attempts in a row that trigger an armed alarm (0: never)")
+    parser.add_argument("--state-dir", default=None,
+                        help="keep each house's device state in a memory-mapped file in this directory")
+    parser.add_argument("--history-entries", type=int, default=100_000, metavar="CHANGES",
+                        help="device changes kept in the history of all houses together (default: 100000)")
+    args = parser.parse_args()
+
+    db = None
+    if args.db:
+        sys.path.insert(0, PROJECT2_DIR)
+        from db_manager import DatabaseManager
+        db = DatabaseManager(args.db, write_behind=not args.sync_writes)
+
+    wal = MutationLog(args.wal) if args.wal else None
+
+    server = SmartHomeServer(args.host, args.port, layout=SiteConfig(args.config, args.state_dir), num_workers=args.workers,
+                             db=db, wal=wal, auto_relock=args.auto_relock, alarm_after=args.alarm_after,
+                             history_entries=args.history_entries)
+    try:
+        server.run()
+    finally:
+        server.shutdown()
+        if wal is not None:
+            wal.close()
+        if db is not None:
+            db.close()
+
@@ -0,0 +1,278 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Columnar storage engine for SmartHouse. Device state lives in parallel
+typed arrays (one row per device) and the usual device classes are
+replaced by thin views whose attributes read and write those rows.
+
+    house = SmartHouse(1, "Big Site", store=ColumnarDeviceStore())
+
+Bulk operations work on whole columns or on per-room row lists with
+C-level array/map calls, instead of calling a method on every object.
+'''
+
+from array import array
+from collections import deque
+from itertools import repeat
+
+from home_model import Lamp, CeilingLight, Lock, Blinds, Alarm, VALID_COLORS
+
+# Device kind codes stored in the "kind" column
+LAMP, CEILING_LIGHT, LOCK, BLINDS, ALARM = range(5)
+DEAD = 255  # row of a device whose room was removed
+
+KIND_NAMES = {LAMP: Lamp.TYPE_NAME, CEILING_LIGHT: CeilingLight.TYPE_NAME, LOCK: Lock.TYPE_NAME,
+              BLINDS: Blinds.TYPE_NAME, ALARM: Alarm.TYPE_NAME}
+LIGHT_KINDS = (LAMP, CEILING_LIGHT)
+
+# One-byte state columns, plus the wider ones. Columns that don't apply
+# to a device kind stay 0 for its rows.
+BYTE_COLUMNS = ("kind", "on", "shade", "color", "is_open", "is_up", "is_unlocked", "is_armed", "is_alarm")
+WIDE_COLUMNS = ("device_id", "room_id", "failed_attempts")
+
+
+def _kind_mask_table(kinds) -> bytes:
+    """bytes.translate table mapping the given kind codes to 0xFF and everything else to 0x00."""
+    return bytes(0xFF if code in kinds else 0x00 for code in range(256))
+
+
+def _drain(iterator):
+    """Run an iterator to completion in C (no Python-level loop body)."""
+    deque(iterator, maxlen=0)
+
+
+class ColumnarDeviceStore:
+    def __init__(self):
+        for name in BYTE_COLUMNS:
+            setattr(self, name, array("B"))
+        for name in WIDE_COLUMNS:
+            setattr(self, name, array("q"))
+        self._rows = {}  # { (room_id, kind): array of row numbers }
+        self.house = None  # SmartHouse using this store (set by the house)
+
+    def __len__(self):
+        return len(self.kind)
+
+    # ---- attaching devices ----
+
+    def attach(self, device, room_id: int):
+        """
+        Copy a device's state into a new row and return the view that replaces it.
+        The original object is not updated afterwards; use the returned view
+        (or room.get_device) from then on.
+        """
+        kind = _KIND_OF[type(device)]
+        row = len(self.kind)
+        for name in BYTE_COLUMNS:
+            getattr(self, name).append(0)
+        for name in WIDE_COLUMNS:
+            getattr(self, name).append(0)
+        self.kind[row] = kind
+        self.device_id[row] = device.device_id
+        self.room_id[row] = room_id
+        self._rows.setdefault((room_id, kind), array("q")).append(row)
+
+        view_cls = _VIEW_OF[type(device)]
+        view = view_cls.__new__(view_cls)
+        view._store = self
+        view._row = row
+        view.device_id = device.device_id
+        if kind == LOCK:
+            view._code = device._code
+        elif kind == ALARM:
+            view.code = device.code
+        for field in device.STATE_FIELDS:
+            setattr(view, field, getattr(device, field))
+        return view
+
+    def drop_room(self, room_id: int):
+        """Retire the rows of a removed room (state cleared, kind marked DEAD)."""
+        for (rid, kind) in [key for key in self._rows if key[0] == room_id]:
+            for row in self._rows.pop((rid, kind)):
+                for name in BYTE_COLUMNS:
+                    getattr(self, name)[row] = 0
+                self.kind[row] = DEAD
+
+    def rows(self, room_ids=None, kinds=None) -> list:
+        """Row arrays for the given rooms/kinds (None = all)."""
+        return [
+            rows for (room_id, kind), rows in self._rows.items()
+            if (room_ids is None or room_id in room_ids) and (kinds is None or kind in kinds)
+        ]
+
+    # ---- bulk operations ----
+    #
+    # Internal: these write the columns directly and do not go through the
+    # CTRL path, so no history, log (WAL) records or events are produced.
+    # They only give the house a new state version, so version-keyed client
+    # caches drop what they hold. Changes clients should see in history or
+    # replay after a restart go through CTRL (room:/group: targets) instead.
+
+    def set_shade(self, level: int, room_ids=None, kinds=LIGHT_KINDS) -> int:
+        """
+        Dim every light (or every lamp, with kinds=(LAMP,)) in the given rooms.
+        :return: Number of devices changed
+        """
+        if not 0 <= level <= 100:
+            raise ValueError("Shade level must be between 0 and 100.")
+        return self._changed(self._fill(self.shade, level, room_ids, kinds))
+
+    def switch(self, on: bool, room_ids=None, kinds=LIGHT_KINDS) -> int:
+        """Turn every light in the given rooms on or off."""
+        return self._changed(self._fill(self.on, int(on), room_ids, kinds))
+
+    def lock_all(self, room_ids=None) -> int:
+        """Lock every lock in the given rooms."""
+        return self._changed(self._fill(self.is_unlocked, 0, room_ids, (LOCK,)))
+
+    def _changed(self, count: int) -> int:
+        """Bump the house's state version when a bulk op touched any rows."""
+        if count and self.house is not None:
+            self.house.touch()
+        return count
+
+    def _fill(self, column, value, room_ids, kinds) -> int:
+        if room_ids is None:
+            return self._blend(column, value, kinds)
+        changed = 0
+        for rows in self.rows(room_ids, kinds):
+            _drain(map(column.__setitem__, rows, repeat(value, len(rows))))
+            changed += len(rows)
+        return changed
+
+    def _blend(self, column, value, kinds) -> int:
+        """
+        Whole-column conditional fill: column[i] = value wherever kind[i] is in kinds.
+        The kind column is turned into a 0x00/0xFF byte mask with bytes.translate and
+        the select is done with big-integer bit operations, so every step is a
+        single C-level pass over the data.
+        """
+        size = len(column)
+        mask = self.kind.tobytes().translate(_kind_mask_table(kinds))
+        m = int.from_bytes(mask, "little")
+        current = int.from_bytes(column.tobytes(), "little")
+        fill = int.from_bytes(bytes((value,)) * size, "little")
+        blended = (current & ~m) | (fill & m)
+        memoryview(column)[:] = blended.to_bytes(size, "little")
+        return mask.count(0xFF)
+
+    def count_on(self, room_ids=None) -> int:
+        """Number of lights switched on (only light rows ever have on=1)."""
+        if room_ids is None:
+            return self.on.count(1)
+        return sum(sum(map(self.on.__getitem__, rows)) for rows in self.rows(room_ids, LIGHT_KINDS))
+
+    def count_unlocked(self, room_ids=None) -> int:
+        if room_ids is None:
+            return self.is_unlocked.count(1)
+        return sum(sum(map(self.is_unlocked.__getitem__, rows)) for rows in self.rows(room_ids, (LOCK,)))
+
+    # ---- export ----
+
+    def device_status(self, row: int) -> dict:
+        """Status dict of one row, in the same shape as Device.check_status() plus "type"."""
+        kind = self.kind[row]
+        status = {"device_id": self.device_id[row]}
+        if kind in LIGHT_KINDS:
+            status["on"] = self.on[row] == 1
+            status["shade"] = self.shade[row]
+            status["color"] = VALID_COLORS[self.color[row]]
+        elif kind == LOCK:
+            status["is_unlocked"] = self.is_unlocked[row] == 1
+            status["failed_attempts"] = self.failed_attempts[row]
+        elif kind == BLINDS:
+            status["is_up"] = self.is_up[row] == 1
+            status["is_open"] = self.is_open[row] == 1
+        elif kind == ALARM:
+            status["is_armed"] = self.is_armed[row] == 1
+            status["is_alarm"] = self.is_alarm[row] == 1
+        status["type"] = KIND_NAMES[kind]
+        return status
+
+    def export_status(self) -> dict:
+        """
+        Whole-house status straight from the columns, in the server's
+        'query all' shape: { room_id: { device_id: status } }.
+        """
+        result = {}
+        room_ids = self.room_id
+        for row, kind in enumerate(self.kind):
+            if kind == DEAD:
+                continue
+            result.setdefault(room_ids[row], {})[self.device_id[row]] = self.device_status(row)
+        return result
+
+
+# ---- views ----
+
+class _StoreView:
+    """Mixin for the view classes: status always comes straight from the store's row,
+    since bulk operations change rows without going through the device."""
+    __slots__ = ()
+
+    def check_status(self):
+        return self._store.device_status(self._row)
+
+
+def _flag(column):
+    return property(
+        lambda self: getattr(self._store, column)[self._row] == 1,
+        lambda self, value: getattr(self._store, column).__setitem__(self._row, 1 if value else 0)
+    )
+
+
+def _number(column):
+    return property(
+        lambda self: getattr(self._store, column)[self._row],
+        lambda self, value: getattr(self._store, column).__setitem__(self._row, value)
+    )
+
+
+def _color():
+    return property(
+        lambda self: VALID_COLORS[self._store.color[self._row]],
+        lambda self, value: self._store.color.__setitem__(self._row, VALID_COLORS.index(value))
+    )
+
+
+class LampView(_StoreView, Lamp):
+    __slots__ = ("_store", "_row")
+    on = _flag("on")
+    shade = _number("shade")
+    color = _color()
+
+
+class CeilingLightView(_StoreView, CeilingLight):
+    __slots__ = ("_store", "_row")
+    on = _flag("on")
+    shade = _number("shade")
+    color = _color()
+
+
+class LockView(_StoreView, Lock):
+    __slots__ = ("_store", "_row")
+    is_unlocked = _flag("is_unlocked")
+    failed_attempts = _number("failed_attempts")
+
+
+class BlindsView(_StoreView, Blinds):
+    __slots__ = ("_store", "_row")
+    is_up = _flag("is_up")
+    is_open = _flag("is_open")
+
+
+class AlarmView(_StoreView, Alarm):
+    __slots__ = ("_store", "_row")
+    is_armed = _flag("is_armed")
+    is_alarm = _flag("is_alarm")
+
+
+_KIND_OF = {
+    Lamp: LAMP, CeilingLight: CEILING_LIGHT, Lock: LOCK, Blinds: BLINDS, Alarm: ALARM,
+    LampView: LAMP, CeilingLightView: CEILING_LIGHT, LockView: LOCK, BlindsView: BLINDS, AlarmView: ALARM,
+}
+_VIEW_OF = {
+    Lamp: LampView, CeilingLight: CeilingLightView, Lock: LockView, Blinds: BlindsView, Alarm: AlarmView,
+    LampView: LampView, CeilingLightView: CeilingLightView, LockView: LockView, BlindsView: BlindsView, AlarmView: AlarmView,
+}
@@ -0,0 +1,122 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+In-process event bus for model events. Devices and SmartHouse publish
+("light.on", "lock.failed", "alarm.triggered", "house.room_added", ...);
+publishing only puts the event on a queue, and dispatcher threads call the
+listeners, so a slow listener never slows down the request that caused
+the event.
+
+    bus = EventBus()
+    bus.subscribe("lock.failed", lambda event: print(event.data["attempts"]))
+    house.events = bus
+
+Listeners run on the bus's threads, not on the house's worker: anything
+that wants to change a house should hand the work back to that worker.
+'''
+
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+
+Event = namedtuple("Event", "topic house_id device_id data time")
+
+
+class EventBus:
+    def __init__(self, num_workers: int = 1, max_queue: int = 100_000):
+        """
+        :param num_workers: Dispatcher threads (with one, listeners see events in publish order)
+        :param max_queue: Events waiting for dispatch before new ones are dropped (publish never blocks)
+        """
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._listeners = []  # [(pattern, listener)]
+        self._by_topic = {}  # { topic: tuple of listeners }, rebuilt lazily after (un)subscribe
+        self._lock = threading.Lock()
+        self._count_lock = threading.Lock()  # publishers and dispatchers both count
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name=f"event-bus-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def subscribe(self, pattern: str, listener):
+        """
+        Call listener(event) for every event whose topic matches pattern:
+        an exact topic ("lock.failed"), a prefix ("lock.*") or everything ("*").
+        :return: Token for unsubscribe()
+        """
+        token = (pattern, listener)
+        with self._lock:
+            self._listeners.append(token)
+            self._by_topic = {}
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._listeners.remove(token)
+            self._by_topic = {}
+
+    def _listeners_for(self, topic: str) -> tuple:
+        listeners = self._by_topic.get(topic)
+        if listeners is None:
+            with self._lock:
+                listeners = tuple(listener for pattern, listener in self._listeners if _matches(pattern, topic))
+                self._by_topic[topic] = listeners
+        return listeners
+
+    def publish(self, topic: str, house_id: int = None, device_id: int = None, data: dict = None) -> bool:
+        """Queue an event for the listeners. Never blocks; returns False if the event was dropped."""
+        try:
+            self._queue.put_nowait(Event(topic, house_id, device_id, data or {}, time.time()))
+        except queue.Full:
+            with self._count_lock:
+                self.dropped += 1
+            return False
+        with self._count_lock:
+            self.published += 1
+        return True
+
+    def _dispatch_loop(self):
+        while True:
+            event = self._queue.get()
+            try:
+                if event is None:
+                    return
+                for listener in self._listeners_for(event.topic):
+                    try:
+                        listener(event)
+                    except Exception as e:
+                        with self._count_lock:
+                            self.failed += 1
+                        logging.error(f"[EVENTS] Listener for {event.topic} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """Wait until every event published so far has been dispatched."""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        with self._count_lock:
+            counts = {"published": self.published, "dropped": self.dropped, "failed": self.failed}
+        return dict(counts, queued=self._queue.qsize())
+
+    def shutdown(self):
+        """Dispatch what is queued, then stop the threads."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def _matches(pattern: str, topic: str) -> bool:
+    if pattern == "*" or pattern == topic:
+        return True
+    return pattern.endswith(".*") and topic.startswith(pattern[:-1])
@@ -0,0 +1,128 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Bounded in-memory history of device changes, for questions like "when was
+lock 9 last unlocked?" without a database.
+
+Each device keeps a ring buffer of its last `per_device` changes, and the
+whole history never holds more than `max_entries` changes: past that, the
+oldest change in the house is dropped first. Memory use is therefore capped
+no matter how many devices there are or how busy they get. A server keeps
+one history per house and splits one total cap between them (resize()).
+
+An entry stores the device's cached status dict (see Device.check_status),
+which is never modified after it is handed out, so recording a change does
+not copy any state.
+'''
+
+import time
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+# Fields of an entry tuple
+TIME, SEQ, ROOM_ID, ACTION, USER, STATUS = range(6)
+
+
+class DeviceHistory:
+    def __init__(self, per_device: int = 32, max_entries: int = 100_000, clock=time.time):
+        """
+        :param per_device: Changes kept per device
+        :param max_entries: Changes kept for all devices together
+        :param clock: Timestamp source (wall clock, since clients ask for time ranges)
+        """
+        self.per_device = per_device
+        self.max_entries = max_entries
+        self.clock = clock
+        self._rings = {}  # { device_id: deque of entries, oldest first }
+        self._order = deque()  # (device_id, seq) of every entry, oldest first; may hold already-dropped ones
+        self._seq = 0
+        self._size = 0
+        self._last_time = float("-inf")
+
+    def __len__(self):
+        return self._size
+
+    def record(self, device, room_id: int, action: str, user: str = None):
+        """Remember the device's current state as one change."""
+        self._seq += 1
+        ring = self._rings.get(device.device_id)
+        if ring is None:
+            ring = self._rings[device.device_id] = deque()
+        if len(ring) == self.per_device:
+            ring.popleft()  # its slot in _order goes stale and is skipped later
+            self._size -= 1
+        # Never let time go backwards inside the history (the rings are searched by time)
+        self._last_time = now = max(self.clock(), self._last_time)
+        ring.append((now, self._seq, room_id, action, user, device.check_status()))
+        self._order.append((device.device_id, self._seq))
+        self._size += 1
+        self._trim()
+
+    def _trim(self):
+        """Enforce the cap, and keep _order from filling up with stale slots."""
+        order = self._order
+        while self._size > self.max_entries or len(order) > 2 * self.max_entries:
+            device_id, seq = order.popleft()
+            oldest = self._rings.get(device_id)
+            if oldest and oldest[0][SEQ] == seq:
+                oldest.popleft()
+                self._size -= 1
+                if not oldest:
+                    del self._rings[device_id]
+
+    def resize(self, max_entries: int):
+        """Change the cap; the oldest changes past it are dropped now."""
+        self.max_entries = max_entries
+        self._trim()
+
+    def keep_devices(self, device_types: dict) -> int:
+        """
+        After a layout reload, keep the changes of the devices that still exist
+        with the same type (as SmartHouse.carry_state_from does for state).
+        :param device_types: { device_id: type name } of the new layout
+        :return: Number of changes dropped
+        """
+        dropped = 0
+        for device_id, ring in list(self._rings.items()):
+            if device_types.get(device_id) != ring[-1][STATUS].get("type"):
+                del self._rings[device_id]  # its slots in _order go stale
+                dropped += len(ring)
+        self._size -= dropped
+        return dropped
+
+    def changes(self, device_ids, since: float = None, until: float = None, action: str = None, limit: int = None) -> list:
+        """
+        Changes of the given devices with since <= time <= until, oldest first.
+        :param action: Only changes made by this action (e.g. "unlock")
+        :param limit: Keep only the newest `limit` changes
+        """
+        lo = since if since is not None else float("-inf")
+        hi = until if until is not None else float("inf")
+        selected = []
+        for device_id in device_ids:
+            ring = self._rings.get(device_id)
+            if not ring:
+                continue
+            start = bisect_left(ring, lo, key=_time)
+            end = bisect_right(ring, hi, key=_time)
+            entries = [ring[i] for i in range(start, end)]
+            if action is not None:
+                entries = [e for e in entries if e[ACTION] == action]
+            selected.append([(device_id, e) for e in entries])
+        merged = list(heapq.merge(*selected, key=lambda item: item[1][SEQ]))
+        if limit is not None:
+            merged = merged[-limit:] if limit > 0 else []
+        return [
+            {"time": e[TIME], "device_id": device_id, "room_id": e[ROOM_ID], "action": e[ACTION],
+             "user": e[USER], "status": e[STATUS]}
+            for device_id, e in merged
+        ]
+
+    def stats(self) -> dict:
+        return {"entries": self._size, "devices": len(self._rings), "max_entries": self.max_entries}
+
+
+def _time(entry):
+    return entry[TIME]
@@ -5,7 +5,10 @@ Created on Feb 16, 2025
 
 '''
 
+import sys
+import heapq
 import socket
+import itertools
 import csmessage
 import cspdu
 import hashlib
@@ -26,17 +29,22 @@ class house
 #question - do I need to add admin priveleges? 
 #should there be a dictionary of users and associated allowed passwords?
 class User:
-    def __init__(self, user_id: int, username: str, password: str, logged_in: bool):
+    def __init__(self, user_id: int, username: str, password: str, logged_in: bool = False, role: str = "regular"):
         """
         Initialize a user.
         :param user_id: Unique identifier for the user
         :param username: The username of the user
         :param password: The user's password (hashed internally)
+        :param role: 'admin', 'regular' or 'guest'
         """
         self.user_id = user_id
         self.username = username
         self.password_hash = self._hash_password(password)
         self.logged_in = logged_in
+        self.role = role
+        self.accessible_houses = set()  # house_ids this user can access
+        self.grants = []  # [(house_id, room_id or None, permission bits)] on top of the role
+        self.perm_version = 0  # bumped on every permission change, so sessions rebuild their bitsets
 
     def _hash_password(self, password: str) -> str:
         """
@@ -54,11 +62,18 @@ class User:
         """
         if self.logged_in:
             return False
-        if self.password_hash == self._hash_password(password):
+        if self.verify_password(password):
             self.logged_in = True
             return True
         return False
 
+    def verify_password(self, password: str) -> bool:
+        """
+        Check a password without touching logged_in.
+        The server uses this, since one user may hold several sessions at once.
+        """
+        return self.password_hash == self._hash_password(password)
+
     def logout(self):
         """
         Logs the user out.
@@ -78,6 +93,34 @@ class User:
             "logged_in": self.logged_in
         }
 
+    def can_control(self):
+        return self.role in ("admin", "regular")
+
+    def can_modify_structure(self):
+        return self.role == "admin"
+
+    def set_role(self, role: str):
+        """Change the role; takes effect on each of the user's sessions at its next request."""
+        self.role = role
+        self.permissions_changed()
+
+    def grant(self, house_id: int, room_id: int, bits: int):
+        """
+        Allow extra action classes (permissions.READ, CONTROL, ...) in one room,
+        or in the whole house with room_id None.
+        """
+        self.grants.append((house_id, room_id, bits))
+        self.permissions_changed()
+
+    def revoke(self, house_id: int, room_id: int = None):
+        """Drop the grants for a room (room_id None: all of the house's grants)."""
+        self.grants = [g for g in self.grants if not (g[0] == house_id and (room_id is None or g[1] == room_id))]
+        self.permissions_changed()
+
+    def permissions_changed(self):
+        """Call after changing accessible_houses directly."""
+        self.perm_version += 1
+
     def __str__(self):
         """
         Returns a string representation of the user.
@@ -85,6 +128,63 @@ class User:
         return f"User {self.username} - Logged in: {self.logged_in}"
 
 
+#class for managing multiple user ids, NOT for threading specifically
+class UserManager:
+    def __init__(self):
+        self.users_by_name = {}
+        self.next_user_id = 1
+
+    def add_user(self, username, password, role="regular"):
+        if username in self.users_by_name:
+            raise ValueError("Username already exists")
+        user = User(self.next_user_id, username, password, role=role)
+        self.users_by_name[username] = user
+        self.next_user_id += 1
+        return user
+
+    def get_user(self, username):
+        return self.users_by_name.get(username)
+
+    def authenticate_user(self, username, password):
+        user = self.get_user(username)
+        if user and user.authenticate(password):
+            return user
+        return None
+
+
+class HouseManager:
+    def __init__(self):
+        self.houses = {}  # {house_id: SmartHouse}
+        self.next_house_id = 1
+
+    def create_house(self, name, admin_user):
+        house = SmartHouse(self.next_house_id, name)
+        self.houses[self.next_house_id] = house
+        admin_user.accessible_houses.add(self.next_house_id)
+        self.next_house_id += 1
+        return house
+
+    def add_house(self, house):
+        """Register an already-built house under its own house_id."""
+        if house.house_id in self.houses:
+            raise ValueError(f"House ID {house.house_id} already exists.")
+        self.houses[house.house_id] = house
+        self.next_house_id = max(self.next_house_id, house.house_id + 1)
+
+    def replace_house(self, house):
+        """
+        Swap in a new house under its house_id (single dict store).
+        :return: The house it replaced, or None
+        """
+        old = self.houses.get(house.house_id)
+        self.houses[house.house_id] = house
+        self.next_house_id = max(self.next_house_id, house.house_id + 1)
+        return old
+
+    def get_house(self, house_id):
+        return self.houses.get(house_id)
+
+
 class Room:
     def __init__(self, room_id: int, name: str, ceiling_light=None, blinds=None):
         self.room_id = room_id
@@ -92,6 +192,10 @@ class Room:
         self.house = None  # will be set by set_house(...)
         
         self.devices = {}   # { device_id: device_object }
+        # id() -> every device object added to the room, for O(1) duplicate checks. With a device
+        # store the room holds views, so the objects the caller passed are kept here (alive, so
+        # their id()s are not reused) and checked instead.
+        self._members = {}
         self.ceiling_light = None
         self.blinds = None
         
@@ -116,29 +220,71 @@ class Room:
         self._pending_blinds = None
 
     def _assign_device_id(self, device):
-        """Ask the House for a globally unique ID."""
+        """
+        Ask the House for a globally unique ID.
+        :return: The device as stored in the room (a view if the house uses a device store)
+        """
         if not self.house:
             raise RuntimeError("This room doesn't belong to a house yet.")
         new_id = self.house.get_next_device_id()
         device.device_id = new_id
+        device.mark_dirty()
+        self._members[id(device)] = device
+        if self.house.store is not None:
+            device = self.house.store.attach(device, self.room_id)
+        device._house = self.house
         self.devices[new_id] = device
+        self.house.layout_changed()
+        return device
+
+    def add_devices(self, lamps=None, locks=None, devices=None):
+        """
+        Add many devices at once. Duplicates are rejected before anything is
+        added, and the house reserves all the IDs in one step.
+        :param devices: Any other multi-instance devices (e.g. an Alarm)
+        """
+        batch = [*(lamps or ()), *(locks or ()), *(devices or ())]
+        if not batch:
+            return
+        if not self.house:
+            raise RuntimeError("This room doesn't belong to a house yet.")
 
-    def add_devices(self, lamps=None, locks=None):
-        for lamp in (lamps or []):
-            self.add_lamp(lamp)
-        for lock in (locks or []):
-            self.add_lock(lock)
+        seen = set()
+        for device in batch:
+            key = id(device)
+            if key in self._members or key in seen:
+                raise ValueError(f"This {device.TYPE_NAME.lower()} is already in the room.")
+            seen.add(key)
+
+        # Same steps as _assign_device_id, inlined for large batches
+        house = self.house
+        store = house.store
+        devices, members = self.devices, self._members
+        for device, device_id in zip(batch, self.house.allocate_device_ids(len(batch))):
+            device.device_id = device_id
+            device.mark_dirty()
+            members[id(device)] = device
+            if store is not None:
+                device = store.attach(device, self.room_id)
+            device._house = house
+            devices[device_id] = device
+        house.layout_changed()
 
     def add_lamp(self, lamp):
-        if lamp in self.devices.values():
+        if id(lamp) in self._members:
             raise ValueError("This lamp is already in the room.")
         self._assign_device_id(lamp)
 
     def add_lock(self, lock):
-        if lock in self.devices.values():
+        if id(lock) in self._members:
             raise ValueError("This lock is already in the room.")
         self._assign_device_id(lock)
 
+    def add_alarm(self, alarm):
+        if id(alarm) in self._members:
+            raise ValueError("This alarm is already in the room.")
+        self._assign_device_id(alarm)
+
     def add_ceiling_light(self, ceiling_light):
         if self.ceiling_light is not None:
             raise ValueError("Ceiling light already exists. Cannot replace it.")
@@ -147,8 +293,7 @@ class Room:
             self._pending_ceiling_light = ceiling_light
             return
         # Otherwise, assign it now
-        self._assign_device_id(ceiling_light)
-        self.ceiling_light = ceiling_light
+        self.ceiling_light = self._assign_device_id(ceiling_light)
 
     def add_blinds(self, blinds):
         if self.blinds is not None:
@@ -156,8 +301,7 @@ class Room:
         if not self.house:
             self._pending_blinds = blinds
             return
-        self._assign_device_id(blinds)
-        self.blinds = blinds
+        self.blinds = self._assign_device_id(blinds)
 
     def get_device(self, device_id: int):
         return self.devices.get(device_id)
@@ -179,25 +323,69 @@ class Room:
 
 
 
-class Alarm:
-    def __init__(self, code: int, is_armed: bool = False, is_alarm: bool = False):
+class Device:
+    """
+    Base of all devices. check_status() hands out a cached status dict that
+    is rebuilt only after a mutator has marked the device dirty, so queries
+    don't allocate a new dict per device per call.
+    """
+    __slots__ = ("device_id", "_status", "_house")  # _house: set by the room, for publishing events
+    TYPE_NAME = "Device"
+    STATE_FIELDS = ()
+
+    def _emit(self, topic: str, **data):
+        """Publish an event on the house's event bus, if the device is in a house that has one."""
+        house = self._house
+        if house is not None and house.events is not None:
+            house.events.publish(topic, house.house_id, self.device_id, data)
+
+    def mark_dirty(self):
+        """Drop the cached status; call after changing state without a mutator."""
+        self._status = None
+
+    def check_status(self):
+        """
+        Returns the current status of the device, including its "type".
+        The dict is shared until the next state change: treat it as read-only.
+        """
+        status = self._status
+        if status is None:
+            status = self._status = self._build_status()
+        return status
+
+    def _build_status(self) -> dict:
+        raise NotImplementedError
+
+
+class Alarm(Device):
+    __slots__ = ("is_armed", "is_alarm", "code")
+    TYPE_NAME = "Alarm"
+    STATE_FIELDS = ("is_armed", "is_alarm")  # runtime state (carried across reloads)
+
+    def __init__(self, code: int, is_armed: bool = False, is_alarm: bool = False, device_id: int = 0):
         """
         Initialize the alarm system.
         :param code: The correct disarm code
         :param is_armed: Whether the alarm system is currently armed
         :param is_alarm: Whether the alarm has been triggered
+        :param device_id: Assigned by the room the alarm is added to
         """
+        self.device_id = device_id
+        self._status = None
+        self._house = None
         self.is_armed = is_armed  # If True, alarm is armed and waiting for an intrusion
         self.is_alarm = is_alarm  # If True, alarm has been triggered
         self.code = code  # Security code to disarm the alarm
 
-    def check_status(self):
+    def _build_status(self):
         """
         Returns the current status of the alarm system.
         """
         return {
+            "device_id": self.device_id,
             "is_armed": self.is_armed,
-            "is_alarm": self.is_alarm
+            "is_alarm": self.is_alarm,
+            "type": self.TYPE_NAME
         }
 
     def enter_code(self, user_code: str):
@@ -209,8 +397,11 @@ class Alarm:
         if user_code == self.code:
             self.is_armed = False  # Disarm the alarm
             self.is_alarm = False  # Reset alarm trigger
+            self._status = None
+            self._emit("alarm.disarmed")
             return True  # Correct code entered
         else:
+            self._emit("alarm.wrong_code")
             return False  # Incorrect code
 
     def arm(self):
@@ -219,12 +410,16 @@ class Alarm:
         """
         self.is_armed = True
         self.is_alarm = False  # Reset alarm state
+        self._status = None
+        self._emit("alarm.armed")
 
     def disarm(self):
         """
         Disarms the alarm system.
         """
         self.is_armed = False
+        self._status = None
+        self._emit("alarm.disarmed")
 
     def trigger_alarm(self):
         """
@@ -232,6 +427,8 @@ class Alarm:
         """
         if self.is_armed:
             self.is_alarm = True  # Set the alarm to active
+            self._status = None
+            self._emit("alarm.triggered")
     
     def stop_alarm(self):
         """
@@ -239,105 +436,94 @@ class Alarm:
         """
         if self.is_alarm:
             self.is_alarm = False # keeps the system armed, just turns off alarm
+            self._status = None
+            self._emit("alarm.stopped")
 
 
 
-class Lamp:
-    def __init__(self, device_id: int, on: bool = False, shade: int = 100, color: str = "white"):
-        """
-        Initialize a Lamp.
-        :param device_id: Unique identifier for the lamp
-        :param on: Whether the lamp is on or off (default: False)
-        :param shade: Brightness level (0-100, default: 100)
-        :param color: Lamp color (default: white)
-        """
-        self.device_id = device_id
-        self.on = on
-        self.shade = max(0, min(100, shade))  # Ensure brightness is within range
-        self.color = color.lower()  # Store color in lowercase for consistency
+VALID_COLORS = ("red", "green", "blue", "white", "yellow", "purple", "orange")
 
-    def flip_switch(self):
-        """Toggle the lamp on/off."""
-        self.on = not self.on
 
-    def set_shade(self, level: int):
-        """Set the brightness of the lamp."""
-        if 0 <= level <= 100:
-            self.shade = level
-        else:
-            raise ValueError("Shade level must be between 0 and 100.")
-
-    def change_color(self, new_color: str):
-        """Change the color of the lamp."""
-        valid_colors = ["red", "green", "blue", "white", "yellow", "purple", "orange"]
-        if new_color.lower() in valid_colors:
-            self.color = new_color.lower()
-        else:
-            raise ValueError(f"Invalid color '{new_color}'. Supported colors: {', '.join(valid_colors)}.")
+class Light(Device):
+    """
+    Shared implementation of Lamp and CeilingLight. Device classes use
+    __slots__ so large sites don't pay for a __dict__ per device.
+    """
+    __slots__ = ("on", "shade", "color")
+    STATE_FIELDS = ("on", "shade", "color")
 
-    def check_status(self):
-        """Returns the current status of the lamp."""
-        return {
-            "device_id": self.device_id,
-            "on": self.on,
-            "shade": self.shade,
-            "color": self.color
-        }
-
-    def __str__(self):
-        """Returns a string representation of the lamp."""
-        return f"Lamp {self.device_id}: {'On' if self.on else 'Off'}, Shade: {self.shade}, Color: {self.color}"
-
-
-class CeilingLight:
     def __init__(self, device_id: int, on: bool = False, shade: int = 100, color: str = "white"):
         """
-        Initialize a Ceiling Light.
-        :param device_id: Unique identifier for the ceiling light
+        Initialize a light.
+        :param device_id: Unique identifier for the light
         :param on: Whether the light is on or off (default: False)
         :param shade: Brightness level (0-100, default: 100)
         :param color: Light color (default: white)
         """
         self.device_id = device_id
+        self._status = None
+        self._house = None
         self.on = on
         self.shade = max(0, min(100, shade))  # Ensure brightness is within range
-        self.color = color.lower()
+        self.color = sys.intern(color.lower())  # Lowercase for consistency, interned so lights share one string
 
     def flip_switch(self):
-        """Toggle the ceiling light on/off."""
+        """Toggle the light on/off."""
         self.on = not self.on
+        self._status = None
+        self._emit("light.on" if self.on else "light.off")
 
     def set_shade(self, level: int):
-        """Set the brightness of the ceiling light."""
+        """Set the brightness of the light."""
         if 0 <= level <= 100:
             self.shade = level
+            self._status = None
+            self._emit("light.dimmed", level=level)
         else:
             raise ValueError("Shade level must be between 0 and 100.")
 
     def change_color(self, new_color: str):
-        """Change the color of the ceiling light."""
-        valid_colors = ["red", "green", "blue", "white", "yellow", "purple", "orange"]
-        if new_color.lower() in valid_colors:
-            self.color = new_color.lower()
+        """Change the color of the light."""
+        if new_color.lower() in VALID_COLORS:
+            self.color = sys.intern(new_color.lower())
+            self._status = None
+            self._emit("light.color", color=self.color)
         else:
-            raise ValueError(f"Invalid color '{new_color}'. Supported colors: {', '.join(valid_colors)}.")
+            raise ValueError(f"Invalid color '{new_color}'. Supported colors: {', '.join(VALID_COLORS)}.")
 
-    def check_status(self):
-        """Returns the current status of the ceiling light."""
+    def _build_status(self):
+        """Returns the current status of the light."""
         return {
             "device_id": self.device_id,
             "on": self.on,
             "shade": self.shade,
-            "color": self.color
+            "color": self.color,
+            "type": self.TYPE_NAME
         }
 
     def __str__(self):
-        """Returns a string representation of the ceiling light."""
-        return f"CeilingLight {self.device_id}: {'On' if self.on else 'Off'}, Shade: {self.shade}, Color: {self.color}"
+        """Returns a string representation of the light."""
+        return f"{self.TYPE_NAME} {self.device_id}: {'On' if self.on else 'Off'}, Shade: {self.shade}, Color: {self.color}"
+
 
+class Lamp(Light):
+    """A free-standing lamp; a room may have any number of them."""
+    __slots__ = ()
+    TYPE_NAME = "Lamp"  # name used for the "type" field in query responses
 
 
-class Lock:
+class CeilingLight(Light):
+    """The single ceiling light of a room."""
+    __slots__ = ()
+    TYPE_NAME = "CeilingLight"
+
+
+
+class Lock(Device):
+    __slots__ = ("_code", "is_unlocked", "failed_attempts")
+    TYPE_NAME = "Lock"
+    STATE_FIELDS = ("is_unlocked", "failed_attempts")  # the codes come from the layout
+
     def __init__(self, device_id: int, code: list[int], is_unlocked: bool = False):
         """
         Initialize a Lock.
@@ -346,13 +532,17 @@ class Lock:
         :param is_unlocked: Whether the lock is initially unlocked (default: False)
         """
         self.device_id = device_id
-        self._code = code  
+        self._status = None
+        self._house = None
+        self._code = code
         self.is_unlocked = is_unlocked
         self.failed_attempts = 0  # Track incorrect unlock attempts
 
     def lock(self):
         """Lock the door."""
         self.is_unlocked = False
+        self._status = None
+        self._emit("lock.locked")
 
     def unlock(self, user_code: str) -> bool:
         """
@@ -360,27 +550,35 @@ class Lock:
         :param user_code: Code entered by the user
         :return: True if unlocked successfully, False otherwise
         """
+        self._status = None
         if user_code in self._code:
             self.is_unlocked = True
             self.failed_attempts = 0  # Reset failed attempts
+            self._emit("lock.unlocked")
             return True
         else:
             self.failed_attempts += 1
+            self._emit("lock.failed", attempts=self.failed_attempts)
             return False
 
-    def check_status(self):
+    def _build_status(self):
         """Returns the current status of the lock."""
         return {
             "device_id": self.device_id,
             "is_unlocked": self.is_unlocked,
-            "failed_attempts": self.failed_attempts
+            "failed_attempts": self.failed_attempts,
+            "type": self.TYPE_NAME
         }
 
     def __str__(self):
         """Returns a string representation of the lock."""
         return f"Lock {self.device_id}: {'Unlocked' if self.is_unlocked else 'Locked'}"
 
-class Blinds:
+class Blinds(Device):
+    __slots__ = ("is_up", "is_open")
+    TYPE_NAME = "Blinds"
+    STATE_FIELDS = ("is_up", "is_open")
+
     def __init__(self, device_id: int, is_up: bool = True, is_open: bool = False):
         """
         Initialize Blinds.
@@ -388,24 +586,31 @@ class Blinds:
         :param is_up: Whether the blinds are initially up (default: True)
         """
         self.device_id = device_id
+        self._status = None
+        self._house = None
         self.is_up = is_up  # True = Up, False = Down
         self.is_open = is_open # True = open, False = closed
 
     def toggle(self):
         """Toggle the blinds up/down."""
         self.is_up = not self.is_up
+        self._status = None
+        self._emit("blinds.up" if self.is_up else "blinds.down")
 
     def shutter(self):
         """Open or close the blinds"""
         self.is_open = not self.is_open
+        self._status = None
+        self._emit("blinds.opened" if self.is_open else "blinds.closed")
 
 
-    def check_status(self):
+    def _build_status(self):
         """Returns the current status of the blinds."""
         return {
             "device_id": self.device_id,
             "is_up": self.is_up,
-            "is_open" : self.is_open
+            "is_open" : self.is_open,
+            "type": self.TYPE_NAME
         }
 
     def __str__(self):
@@ -413,21 +618,60 @@ class Blinds:
         return f"Blinds {self.device_id}: {'Up' if self.is_up else 'Down'}"
 
 
+# Every house state gets a version number that no other house state (of any house, or
+# of a reloaded house) ever had, so "same version" always means "nothing changed"
+_state_versions = itertools.count(1)
+
+
 class SmartHouse:
     
-    def __init__(self, house_id: int, name: str):
+    def __init__(self, house_id: int, name: str, store=None, recycle_ids: bool = False):
+        """
+        :param store: Optional device store (e.g. device_store.ColumnarDeviceStore);
+                      devices added to the house then live in the store's columns
+        :param recycle_ids: Reuse the device IDs of removed rooms (lowest first)
+
+        Set `events` to an events.EventBus to have the house and its devices
+        publish model events ("light.on", "lock.failed", "house.room_added", ...).
+        """
         self.house_id = house_id
         self.name = name
         self.rooms = {}  # { room_id: Room }
-        
+        self.store = store
+        if store is not None:
+            store.house = self
+        self.pending_store = None  # live store to move the devices into when the house is swapped in (reload)
+        self.events = None  # events.EventBus that the house and its devices publish to
+        self.version = next(_state_versions)  # changes whenever a device or the room layout changes
+        self.topology_version = self.version  # changes only when rooms or devices are added or removed
+
         self.next_device_id = 1  # <--- Global device ID for the whole house
+        self.recycle_ids = recycle_ids
+        self._free_ids = []  # heap of IDs freed by remove_room (only filled when recycling)
 
     def get_next_device_id(self) -> int:
         """Return a globally unique device ID."""
+        if self._free_ids:
+            return heapq.heappop(self._free_ids)
         new_id = self.next_device_id
         self.next_device_id += 1
         return new_id
 
+    def allocate_device_ids(self, count: int):
+        """
+        Reserve count device IDs in one step: recycled IDs first, then a
+        fresh contiguous range.
+        :return: A range (or list, when recycled IDs are involved) of IDs
+        """
+        fresh = count - min(count, len(self._free_ids))
+        start = self.next_device_id
+        self.next_device_id += fresh
+        if fresh == count:
+            return range(start, start + count)
+        reused = [heapq.heappop(self._free_ids) for _ in range(count - fresh)]
+        reused.extend(range(start, start + fresh))
+        return reused
+
     def add_room(self, room):
         """
         Add a room to the house.
@@ -439,6 +683,32 @@ class SmartHouse:
         # Let the Room know which house it belongs to (for ID assignment)
         room.set_house(self)
         self.rooms[room.room_id] = room
+        self.layout_changed()
+        self._emit("house.room_added", room_id=room.room_id)
+
+    def touch(self):
+        """Give the house a new state version (call after changing a device)."""
+        self.version = next(_state_versions)
+
+    def layout_changed(self):
+        """Give the house a new state and topology version (rooms or devices were added or removed)."""
+        self.touch()
+        self.topology_version = self.version
+
+    def topology(self, rooms=None) -> dict:
+        """
+        The layout of the house, without device state: what a client needs to
+        name rooms and find devices.
+        :param rooms: Optional room IDs to limit it to
+        :return: { room_id: {"name": room name, "devices": { device_id: device type }} }
+        """
+        return {room_id: {"name": room.name,
+                          "devices": {device_id: device.TYPE_NAME for device_id, device in room.devices.items()}}
+                for room_id, room in self.rooms.items() if rooms is None or room_id in rooms}
+
+    def _emit(self, topic: str, **data):
+        if self.events is not None:
+            self.events.publish(topic, self.house_id, None, data)
     
     
     def remove_room(self, room_id: int):
@@ -447,7 +717,14 @@ class SmartHouse:
         :param room_id: The ID of the room to remove
         """
         if room_id in self.rooms:
-            del self.rooms[room_id]
+            room = self.rooms.pop(room_id)
+            if self.recycle_ids:
+                self._free_ids.extend(room.devices)
+                heapq.heapify(self._free_ids)
+            if self.store is not None:
+                self.store.drop_room(room_id)
+            self.layout_changed()
+            self._emit("house.room_removed", room_id=room_id)
         else:
             raise ValueError(f"Room ID {room_id} not found in this house.")
 
@@ -466,6 +743,48 @@ class SmartHouse:
         """
         return {room_id: room.check_status() for room_id, room in self.rooms.items()}
 
+    def adopt_store(self, store):
+        """
+        Move the devices of a house built without a store into `store`: each
+        device object is replaced by the store's view of it. The room's
+        duplicate checks keep working on the original objects.
+        """
+        self.store = store
+        store.house = self
+        for room in self.rooms.values():
+            for device_id, device in list(room.devices.items()):
+                view = store.attach(device, room.room_id)
+                view._house = self
+                room.devices[device_id] = view
+                if room.ceiling_light is device:
+                    room.ceiling_light = view
+                if room.blinds is device:
+                    room.blinds = view
+
+    def carry_state_from(self, old_house) -> int:
+        """
+        Copy device state from another house into this one, for every device ID
+        that exists in both with the same device type. Used when a new layout
+        replaces a running one.
+        :param old_house: The SmartHouse being replaced
+        :return: Number of devices whose state was carried over
+        """
+        old_devices = {}
+        for room in old_house.rooms.values():
+            old_devices.update(room.devices)
+
+        carried = 0
+        for room in self.rooms.values():
+            for device_id, device in room.devices.items():
+                old = old_devices.get(device_id)
+                # same kind of device, whether or not either side is a store view
+                if old is not None and (isinstance(device, type(old)) or isinstance(old, type(device))):
+                    for field in device.STATE_FIELDS:
+                        setattr(device, field, getattr(old, field))
+                    device.mark_dirty()
+                    carried += 1
+        return carried
+
     def __str__(self):
         """
         Returns a string representation of the house and its rooms.
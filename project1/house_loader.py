@@ -0,0 +1,310 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Builds the served houses from a site description file instead of code.
+A site file is a flat list of records, each with a "kind":
+
+    {"kind": "house", "house_id": 1, "name": "My Demo House"}
+    {"kind": "room", "room_id": 101, "name": "Living Room"}
+    {"kind": "lamp", "room_id": 101, "on": false, "shade": 100, "color": "white"}
+    {"kind": "lock", "room_id": 101, "code": ["1234", "1235"]}
+    {"kind": "user", "username": "juniper", "password": "meow", "houses": [1]}
+    {"kind": "user", "username": "sitter", "password": "woof", "role": "guest", "houses": [1],
+     "grants": ["1:102:control", "1:*:schedule"]}
+
+A user's "grants" add permissions (read, control, security, schedule, admin,
+joined with "+") to their role in one room of a house, or in every room ("*").
+
+Rooms and devices go to the most recent house unless they give a house_id.
+Device IDs are handed out in file order, so keep the order stable between
+reloads (device state is carried across by ID).
+
+Supported formats, picked by extension:
+    .jsonl  one JSON record per line        (streamed)
+    .csv    one record per row, header row  (streamed; lists are "a|b|c")
+    .json   a JSON list of records, or {"records": [...]}
+    .toml   [[records]] tables
+
+A house record may also pick a device store: "store": "columnar", or
+"store": "mapped" (optionally with "state_file") to keep device state in a
+memory-mapped file that survives restarts.
+
+JSON Lines and CSV are read one record at a time, so a large site never
+has to be held in memory as text or parsed dicts, only as the built houses.
+'''
+
+import os
+import csv
+import json
+import tomllib
+
+from home_model import SmartHouse, Room, Lamp, CeilingLight, Blinds, Lock, Alarm, VALID_COLORS
+from device_store import ColumnarDeviceStore
+from mapped_store import MappedDeviceStore
+from permissions import parse_classes
+
+DEMO_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "demo_house.jsonl")
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off", "")
+
+
+class SiteConfigError(ValueError):
+    """A record in a site file is malformed or refers to something undefined."""
+
+
+# ---- reading records ----
+
+def iter_records(path: str):
+    """Yield the records of a site file one at a time."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        yield from _iter_jsonl(path)
+    elif ext == ".csv":
+        yield from _iter_csv(path)
+    elif ext == ".json":
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+        yield from doc["records"] if isinstance(doc, dict) else doc
+    elif ext == ".toml":
+        with open(path, "rb") as f:
+            yield from tomllib.load(f).get("records", [])
+    else:
+        raise SiteConfigError(f"Unsupported site file type: {ext or path}")
+
+
+def _iter_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise SiteConfigError(f"{path}:{line_no}: {e}") from None
+
+
+def _iter_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            # Empty cells mean "use the default"
+            yield {key: value for key, value in row.items() if value not in (None, "")}
+
+
+# ---- field conversion (CSV gives strings, JSON/TOML give typed values) ----
+
+def _bool(record, field, default):
+    value = record.get(field, default)
+    if isinstance(value, str):
+        if value.lower() in _TRUE:
+            return True
+        if value.lower() in _FALSE:
+            return False
+        raise SiteConfigError(f"{field} must be true or false, got {value!r}")
+    return bool(value)
+
+
+def _int(record, field, default=None):
+    value = record.get(field, default)
+    if value is None:
+        raise SiteConfigError(f"{record.get('kind')} record is missing {field}")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise SiteConfigError(f"{field} must be a number, got {value!r}") from None
+
+
+def _str(record, field):
+    value = record.get(field)
+    if value is None or value == "":
+        raise SiteConfigError(f"{record.get('kind')} record is missing {field}")
+    return str(value)
+
+
+def _list(record, field):
+    value = record.get(field, [])
+    if isinstance(value, str):
+        return [part for part in value.split("|") if part]
+    return [str(part) for part in value]
+
+
+def _color(record):
+    color = record.get("color", "white").lower()
+    if color not in VALID_COLORS:
+        raise SiteConfigError(f"Unknown color {color!r}, use one of {', '.join(VALID_COLORS)}")
+    return color
+
+
+# ---- devices ----
+
+def _lamp(r):
+    return Lamp(0, on=_bool(r, "on", False), shade=_int(r, "shade", 100), color=_color(r))
+
+
+def _ceiling_light(r):
+    return CeilingLight(0, on=_bool(r, "on", False), shade=_int(r, "shade", 100), color=_color(r))
+
+
+def _blinds(r):
+    return Blinds(0, is_up=_bool(r, "is_up", True), is_open=_bool(r, "is_open", False))
+
+
+def _lock(r):
+    codes = _list(r, "code")
+    if not codes or "" in codes:
+        raise SiteConfigError("lock record needs at least one code, and no empty ones")
+    return Lock(0, code=codes, is_unlocked=_bool(r, "is_unlocked", False))
+
+
+def _alarm(r):
+    # An alarm with an empty code would be disarmed by an empty enter_code
+    return Alarm(_str(r, "code"), is_armed=_bool(r, "is_armed", False), is_alarm=_bool(r, "is_alarm", False))
+
+
+# kind: (device factory, Room method that adds it)
+DEVICE_KINDS = {
+    "lamp": (_lamp, Room.add_lamp),
+    "ceiling_light": (_ceiling_light, Room.add_ceiling_light),
+    "blinds": (_blinds, Room.add_blinds),
+    "lock": (_lock, Room.add_lock),
+    "alarm": (_alarm, Room.add_alarm),
+}
+
+
+# ---- building ----
+
+def load_site(path: str, state_dir: str = None, stores: dict = None):
+    """
+    Build every house in a site file.
+    :param state_dir: Keep every house's device state in a memory-mapped file
+                      (house-<id>.state) in this directory, unless the house picks its own store
+    :param stores: { state file path: MappedDeviceStore } already open (a reload). A house whose
+                   file is in there is built without a store and gets it as `pending_store`, to be
+                   adopted on its worker; files opened here are added.
+    :return: (list of SmartHouse, list of user records)
+    """
+    houses = {}
+    users = []
+    current = None
+    for record in iter_records(path):
+        kind = record.get("kind")
+        try:
+            if kind == "house":
+                house_id = _int(record, "house_id")
+                store, live = _store(record, house_id, path, state_dir, stores)
+                current = SmartHouse(house_id, record.get("name", ""), store=None if live else store,
+                                     recycle_ids=_bool(record, "recycle_ids", False))
+                if live:
+                    current.pending_store = store
+                if current.house_id in houses:
+                    raise SiteConfigError(f"House {current.house_id} is defined twice")
+                houses[current.house_id] = current
+            elif kind == "user":
+                for field in ("username", "password"):  # checked now, the accounts are added by add_users()
+                    _str(record, field)
+                users.append(record)
+            elif kind == "room":
+                house = _house_for(record, houses, current)
+                house.add_room(Room(room_id=_int(record, "room_id"), name=record.get("name", "")))
+            elif kind in DEVICE_KINDS:
+                house = _house_for(record, houses, current)
+                room = house.get_room(_int(record, "room_id"))
+                if room is None:
+                    raise SiteConfigError(f"Room {record['room_id']} is not defined in house {house.house_id}")
+                factory, add = DEVICE_KINDS[kind]
+                add(room, factory(record))
+            else:
+                raise SiteConfigError(f"Unknown record kind: {kind!r}")
+        except SiteConfigError as e:
+            e.add_note(f"in {path}: {kind} record {record}")
+            raise
+        except ValueError as e:
+            # Room/device constructors raise ValueError too; say where it came from
+            raise SiteConfigError(f"{path}: {kind} record {record}: {e}") from None
+    for house in houses.values():
+        if isinstance(house.store, MappedDeviceStore):  # not for pending stores: the live house still uses them
+            # Devices of an older, larger layout still have records in the file
+            house.store.release_unclaimed()
+    return list(houses.values()), users
+
+
+def _store(record, house_id, path, state_dir, stores=None):
+    """
+    The device store a house record asks for: "columnar", or "mapped" with an
+    optional "state_file" (relative to the site file).
+    :return: (store or None, True if it is an already open store from `stores`)
+    """
+    store = record.get("store", "mapped" if state_dir else None)
+    if store is None:
+        return None, False
+    if store == "columnar":
+        return ColumnarDeviceStore(), False
+    if store == "mapped":
+        if "state_file" in record:
+            state_file = os.path.join(os.path.dirname(os.path.abspath(path)), record["state_file"])
+        else:
+            state_file = os.path.join(state_dir or os.path.dirname(os.path.abspath(path)), f"house-{house_id}.state")
+        state_file = os.path.abspath(state_file)
+        if stores is not None and state_file in stores and not stores[state_file].closed:
+            # Never map a live file twice: the open store is handed to the new house on its worker
+            return stores[state_file], True
+        mapped = MappedDeviceStore(state_file)
+        if stores is not None:
+            stores[state_file] = mapped
+        return mapped, False
+    raise SiteConfigError(f"Unknown store {store!r}, use 'columnar' or 'mapped'")
+
+
+def _house_for(record, houses, current):
+    if "house_id" in record:
+        house = houses.get(_int(record, "house_id"))
+        if house is None:
+            raise SiteConfigError(f"House {record['house_id']} is not defined")
+        return house
+    if current is None:
+        raise SiteConfigError("No house defined before this record")
+    return current
+
+
+def add_users(users, user_records, houses):
+    """
+    Register the accounts from a site file.
+    :param users: UserManager to fill
+    :param houses: The houses built from the same file ("houses": "*" means all of them)
+    """
+    for record in user_records:
+        user = users.add_user(_str(record, "username"), _str(record, "password"), role=record.get("role", "regular"))
+        access = record.get("houses", [])
+        if access == "*":
+            user.accessible_houses.update(house.house_id for house in houses)
+        else:
+            user.accessible_houses.update(int(house_id) for house_id in _list(record, "houses"))
+        for grant in _list(record, "grants"):
+            try:
+                house_id, room_id, classes = grant.split(":")
+                user.grant(int(house_id), None if room_id == "*" else int(room_id), parse_classes(classes))
+            except ValueError as e:
+                raise SiteConfigError(f"User {record['username']}: bad grant {grant!r} ({e})") from None
+
+
+class SiteConfig:
+    """
+    Layout source for SmartHomeServer backed by a site file.
+    Every build_houses() call re-reads the file, which is what a reload does.
+    """
+
+    def __init__(self, path: str = DEMO_CONFIG, state_dir: str = None):
+        """:param state_dir: See load_site()"""
+        self.path = path
+        self.state_dir = state_dir
+        self._user_records = []
+        self._stores = {}  # { state file path: MappedDeviceStore } opened by earlier builds
+
+    def build_houses(self) -> list:
+        houses, self._user_records = load_site(self.path, self.state_dir, self._stores)
+        return houses
+
+    def build_users(self, users, houses):
+        add_users(users, self._user_records, houses)
@@ -0,0 +1,76 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+House-affinity worker pool. Every house is pinned to exactly one worker
+thread, and everything that reads or changes that house runs on it, so a
+house never needs a lock and different houses never wait on each other.
+'''
+
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.jobs = queue.SimpleQueue()
+        self.processed = 0  # only ever written by this worker's own thread
+        self.thread = threading.Thread(target=self._loop, name=f"house-worker-{index}", daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            future, fn, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                logging.error(f"[WORKER {self.index}] Job failed: {e}")
+                future.set_exception(e)
+            self.processed += 1
+
+
+class HouseWorkerPool:
+    def __init__(self, num_workers: int = 4):
+        """
+        Start the worker threads.
+        :param num_workers: Number of workers; houses are spread over them by house_id
+        """
+        if num_workers < 1:
+            raise ValueError("Need at least one worker.")
+        self._workers = [_Worker(i) for i in range(num_workers)]
+
+    def worker_index(self, house_id: int) -> int:
+        """The worker a house is pinned to."""
+        return house_id % len(self._workers)
+
+    def submit(self, house_id: int, fn, *args) -> Future:
+        """Queue fn(*args) on the house's worker."""
+        future = Future()
+        self._workers[self.worker_index(house_id)].jobs.put((future, fn, args))
+        return future
+
+    def call(self, house_id: int, fn, *args):
+        """Run fn(*args) on the house's worker and wait for the result."""
+        return self.submit(house_id, fn, *args).result()
+
+    def stats(self) -> list:
+        """Per-worker counters for the server stats query."""
+        return [
+            {"worker": w.index, "processed": w.processed, "queued": w.jobs.qsize()}
+            for w in self._workers
+        ]
+
+    def shutdown(self):
+        """Stop the workers after the jobs already queued."""
+        for w in self._workers:
+            w.jobs.put(None)
+        for w in self._workers:
+            w.thread.join()
@@ -0,0 +1,290 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Memory-mapped device state file. Each device's fixed-width state lives in
+a record of a file indexed by device ID, and the device objects are views
+whose attributes read and write that record:
+
+    house = SmartHouse(1, "Big Site", store=MappedDeviceStore("house-1.state"))
+
+When the server restarts on the same file, a device whose record already
+holds the same kind in the same room keeps that state: the file is simply
+mapped again, nothing is replayed. Other local processes can open the file
+read-only and read the state in place, for monitoring:
+
+    MappedDeviceStore("house-1.state", readonly=True).export_status()
+
+The file lives in the page cache, so it survives a crash of the server
+process; flush() (done on close) also pushes it to disk.
+
+Records of devices the current layout no longer has (a smaller site file
+after a restart, or a reload) are cleared by release_unclaimed() once the
+layout has attached its devices, so neither the server nor a monitor
+reports them.
+
+Layout: a 12-byte header (magic, version, record size, capacity) followed by
+`capacity` records of RECORD (24 bytes) at HEADER.size + device_id * RECORD.size.
+'''
+
+import os
+import mmap
+import struct
+
+from home_model import Lamp, CeilingLight, Lock, Blinds, Alarm, VALID_COLORS
+from device_store import LAMP, CEILING_LIGHT, LOCK, BLINDS, ALARM, KIND_NAMES, LIGHT_KINDS
+
+MAGIC = b"SHMS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")  # magic, version, record size, capacity
+# kind+1 (0 = no device), on, shade, color index, is_open, is_up, is_unlocked,
+# is_armed, is_alarm, padding, failed_attempts, room_id
+RECORD = struct.Struct("<9B3xIq")
+
+# Byte offsets of the fields inside a record
+KIND, ON, SHADE, COLOR, IS_OPEN, IS_UP, IS_UNLOCKED, IS_ARMED, IS_ALARM = range(9)
+FAILED_ATTEMPTS = 12
+ROOM_ID = 16
+_FAILED = struct.Struct("<I")
+
+
+class MappedDeviceStore:
+    def __init__(self, path: str, capacity: int = 1024, readonly: bool = False):
+        """
+        Open (or create) a state file.
+        :param capacity: Initial number of device records (the file grows as needed)
+        :param readonly: Map the file read-only, for monitoring from another process
+        """
+        self.path = path
+        self.readonly = readonly
+        self.reattached = 0  # devices that picked up existing state from the file
+        self._rooms = {}  # { room_id: [device_id, ...] } attached through this store
+
+        if readonly:
+            self._file = open(path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            exists = os.path.exists(path) and os.path.getsize(path) >= HEADER.size
+            self._file = open(path, "r+b" if exists else "w+b")
+            if not exists:
+                self._file.truncate(HEADER.size + capacity * RECORD.size)
+            self._mm = mmap.mmap(self._file.fileno(), 0)
+            if not exists:
+                HEADER.pack_into(self._mm, 0, MAGIC, VERSION, RECORD.size, capacity)
+
+        magic, version, size, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not a device state file (or has an unknown layout)")
+
+    @property
+    def capacity(self) -> int:
+        # Never trust the header beyond what is mapped (the writer may have grown the file since)
+        return min(HEADER.unpack_from(self._mm, 0)[3], (len(self._mm) - HEADER.size) // RECORD.size)
+
+    def _grow(self, device_id: int):
+        capacity = self.capacity
+        while capacity <= device_id:
+            capacity *= 2
+        self._mm.resize(HEADER.size + capacity * RECORD.size)
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, RECORD.size, capacity)
+
+    @staticmethod
+    def offset(device_id: int) -> int:
+        return HEADER.size + device_id * RECORD.size
+
+    # ---- attaching devices ----
+
+    def attach(self, device, room_id: int):
+        """
+        Return the view that replaces a device. If the file already has a
+        record for this ID with the same kind and room, its state is kept;
+        otherwise the record is filled from the device.
+        """
+        if self.readonly:
+            raise PermissionError(f"{self.path} is open read-only")
+        if device.device_id >= self.capacity:
+            self._grow(device.device_id)
+        kind = _KIND_OF[type(device)]
+        base = self.offset(device.device_id)
+        mm = self._mm
+        keep = mm[base + KIND] == kind + 1 and struct.unpack_from("<q", mm, base + ROOM_ID)[0] == room_id
+
+        view_cls = _VIEW_OF[type(device)]
+        view = view_cls.__new__(view_cls)
+        view._mm = mm
+        view._base = base
+        view._status = None
+        view.device_id = device.device_id
+        if kind == LOCK:
+            view._code = device._code
+        elif kind == ALARM:
+            view.code = device.code
+
+        if keep:
+            self.reattached += 1
+        else:
+            RECORD.pack_into(mm, base, kind + 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, room_id)
+            for field in device.STATE_FIELDS:
+                setattr(view, field, getattr(device, field))
+        self._rooms.setdefault(room_id, []).append(device.device_id)
+        return view
+
+    def start_layout(self):
+        """Forget which devices are attached, before a new layout attaches its own."""
+        self._rooms = {}
+
+    def release_unclaimed(self) -> int:
+        """
+        Clear every record that no device attached since start_layout() (or
+        opening the file) claims. Call after the layout has attached its devices.
+        :return: Number of records cleared
+        """
+        claimed = {device_id for device_ids in self._rooms.values() for device_id in device_ids}
+        cleared = 0
+        for device_id in range(self.capacity):
+            base = self.offset(device_id)
+            if self._mm[base + KIND] and device_id not in claimed:
+                self._mm[base:base + RECORD.size] = bytes(RECORD.size)
+                cleared += 1
+        return cleared
+
+    def drop_room(self, room_id: int):
+        """Clear the records of a removed room."""
+        for device_id in self._rooms.pop(room_id, ()):
+            base = self.offset(device_id)
+            self._mm[base:base + RECORD.size] = bytes(RECORD.size)
+
+    # ---- reading ----
+
+    def device_status(self, device_id: int) -> dict:
+        """Status of one device, in the shape of Device.check_status()."""
+        return _status(device_id, RECORD.unpack_from(self._mm, self.offset(device_id)))
+
+    def export_status(self) -> dict:
+        """
+        Every device of the layout, in the server's 'query all' shape:
+        { room_id: { device_id: status } }. Reads the mapping in place.
+        The writer exports the devices attached to it; a read-only monitor,
+        which attaches nothing, exports every record in the file.
+        """
+        if not self.readonly:
+            return {room_id: {device_id: self.device_status(device_id) for device_id in device_ids}
+                    for room_id, device_ids in self._rooms.items()}
+        result = {}
+        with memoryview(self._mm) as mv:
+            records = mv[HEADER.size:HEADER.size + self.capacity * RECORD.size]
+            for device_id, record in enumerate(RECORD.iter_unpack(records)):
+                if record[KIND]:
+                    result.setdefault(record[-1], {})[device_id] = _status(device_id, record)
+            records.release()
+        return result
+
+    def flush(self):
+        if not self.readonly:
+            self._mm.flush()
+
+    @property
+    def closed(self) -> bool:
+        return self._mm.closed
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self._mm.close()
+        self._file.close()
+
+
+def _status(device_id: int, record) -> dict:
+    kind = record[KIND] - 1
+    status = {"device_id": device_id}
+    if kind in LIGHT_KINDS:
+        status["on"] = record[ON] == 1
+        status["shade"] = record[SHADE]
+        status["color"] = VALID_COLORS[record[COLOR]]
+    elif kind == LOCK:
+        status["is_unlocked"] = record[IS_UNLOCKED] == 1
+        status["failed_attempts"] = record[-2]
+    elif kind == BLINDS:
+        status["is_up"] = record[IS_UP] == 1
+        status["is_open"] = record[IS_OPEN] == 1
+    elif kind == ALARM:
+        status["is_armed"] = record[IS_ARMED] == 1
+        status["is_alarm"] = record[IS_ALARM] == 1
+    status["type"] = KIND_NAMES[kind]
+    return status
+
+
+# ---- views ----
+
+def _flag(field):
+    def set_flag(self, value):
+        self._mm[self._base + field] = 1 if value else 0
+    return property(lambda self: self._mm[self._base + field] == 1, set_flag)
+
+
+def _byte(field):
+    def set_byte(self, value):
+        self._mm[self._base + field] = value
+    return property(lambda self: self._mm[self._base + field], set_byte)
+
+
+def _color():
+    def set_color(self, value):
+        self._mm[self._base + COLOR] = VALID_COLORS.index(value)
+    return property(lambda self: VALID_COLORS[self._mm[self._base + COLOR]], set_color)
+
+
+def _failed_attempts():
+    return property(
+        lambda self: _FAILED.unpack_from(self._mm, self._base + FAILED_ATTEMPTS)[0],
+        lambda self, value: _FAILED.pack_into(self._mm, self._base + FAILED_ATTEMPTS, value)
+    )
+
+
+# The views keep the usual status cache: every change made through a
+# request goes through the view (which marks it dirty), and nothing else
+# writes a mapped record while the server owns it.
+
+class MappedLamp(Lamp):
+    __slots__ = ("_mm", "_base")
+    on = _flag(ON)
+    shade = _byte(SHADE)
+    color = _color()
+
+
+class MappedCeilingLight(CeilingLight):
+    __slots__ = ("_mm", "_base")
+    on = _flag(ON)
+    shade = _byte(SHADE)
+    color = _color()
+
+
+class MappedLock(Lock):
+    __slots__ = ("_mm", "_base")
+    is_unlocked = _flag(IS_UNLOCKED)
+    failed_attempts = _failed_attempts()
+
+
+class MappedBlinds(Blinds):
+    __slots__ = ("_mm", "_base")
+    is_up = _flag(IS_UP)
+    is_open = _flag(IS_OPEN)
+
+
+class MappedAlarm(Alarm):
+    __slots__ = ("_mm", "_base")
+    is_armed = _flag(IS_ARMED)
+    is_alarm = _flag(IS_ALARM)
+
+
+_KIND_OF = {
+    Lamp: LAMP, CeilingLight: CEILING_LIGHT, Lock: LOCK, Blinds: BLINDS, Alarm: ALARM,
+    MappedLamp: LAMP, MappedCeilingLight: CEILING_LIGHT, MappedLock: LOCK, MappedBlinds: BLINDS, MappedAlarm: ALARM,
+}
+_VIEW_OF = {
+    Lamp: MappedLamp, CeilingLight: MappedCeilingLight, Lock: MappedLock, Blinds: MappedBlinds, Alarm: MappedAlarm,
+    MappedLamp: MappedLamp, MappedCeilingLight: MappedCeilingLight, MappedLock: MappedLock,
+    MappedBlinds: MappedBlinds, MappedAlarm: MappedAlarm,
+}
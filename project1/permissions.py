@@ -0,0 +1,99 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Per-session permission bitsets. What a user may do in a house is worked out
+once, from the role (can_control / can_modify_structure), the houses they
+can access and their room grants, into one small int per room:
+
+    perms = PermissionSet(user, house_id)
+    perms.allows(SECURITY, room_id)      # one dict lookup and one AND
+
+A guest gets READ on their houses; grants add classes per room, so a dog
+sitter can be let into the kitchen without being able to open the front door:
+
+    user.grant(1, 102, CONTROL)          # site file: "grants": ["1:102:control"]
+
+Changing a user's role, grants or houses bumps user.perm_version, and each
+of that user's sessions rebuilds its bitset on its next check. Nobody
+else's session is touched.
+'''
+
+# Action classes (bits)
+READ = 1  # queries
+CONTROL = 2  # lights and blinds
+SECURITY = 4  # locks and the alarm
+SCHEDULE = 8  # timers, and controls of a whole room or group
+ADMIN = 16  # server stats and rules
+
+CLASS_NAMES = {"read": READ, "control": CONTROL, "security": SECURITY, "schedule": SCHEDULE, "admin": ADMIN}
+ALL = READ | CONTROL | SECURITY | SCHEDULE | ADMIN
+
+SECURITY_ACTIONS = ("lock", "unlock", "arm", "disarm", "trigger_alarm", "stop_alarm", "enter_code")
+
+
+def action_class(action: str) -> int:
+    """The class a CTRL action needs."""
+    return _ACTION_CLASS.get(action, CONTROL)
+
+
+_ACTION_CLASS = {action: SECURITY for action in SECURITY_ACTIONS}
+
+
+def parse_classes(names) -> int:
+    """'control+security' (or a list of names) -> bits."""
+    if isinstance(names, str):
+        names = names.split("+")
+    bits = 0
+    for name in names:
+        if name.lower() not in CLASS_NAMES:
+            raise ValueError(f"Unknown permission {name!r}, use one of {', '.join(CLASS_NAMES)}")
+        bits |= CLASS_NAMES[name.lower()]
+    return bits
+
+
+def role_bits(user) -> int:
+    bits = READ
+    if user.can_control():
+        bits |= CONTROL | SECURITY | SCHEDULE
+    if user.can_modify_structure():
+        bits |= ADMIN
+    return bits
+
+
+class PermissionSet:
+    __slots__ = ("user", "house_id", "version", "default", "rooms")
+
+    def __init__(self, user, house_id: int):
+        """
+        :param user: home_model.User the session is logged in as
+        :param house_id: House the session is bound to
+        """
+        self.user = user
+        self.house_id = house_id
+        self._build()
+
+    def _build(self):
+        user = self.user
+        self.version = user.perm_version
+        # default: every room without a grant of its own (including rooms added by a later reload)
+        self.default = role_bits(user) if self.house_id in user.accessible_houses else 0
+        self.rooms = {}
+        for house_id, room_id, bits in user.grants:
+            if house_id != self.house_id:
+                continue
+            if room_id is None:
+                self.default |= bits
+                for other in self.rooms:
+                    self.rooms[other] |= bits
+            else:
+                self.rooms[room_id] = self.rooms.get(room_id, self.default) | bits
+
+    def allows(self, bits: int, room_id: int = None) -> bool:
+        """
+        True if every class in bits is allowed in the room
+        (room_id None: in the house as a whole, i.e. in rooms without grants).
+        """
+        if self.version != self.user.perm_version:
+            self._build()
+        return self.rooms.get(room_id, self.default) & bits == bits
@@ -0,0 +1,54 @@
+import asyncio
+
+from async_protocol import AsyncSmartHomeProtocol
+
+from test_client_pool import _live_server
+
+
+def test_pipelined_requests():
+    """Many requests in flight on one connection, each answered with its own response."""
+    server, port = _live_server(num_workers=1)
+
+    async def scenario():
+        client = await AsyncSmartHomeProtocol.connect("localhost", port)
+        try:
+            try:
+                await client.query("all")
+                raise AssertionError("query before login")
+            except PermissionError:
+                pass
+            assert not await client.login("hannahbanana", "wrong")
+            assert await client.login("hannahbanana", "JuniperTheCat") and client.house_id == 1
+
+            devices = [1, 2, 3, 6, 7] * 20
+            replies = await asyncio.gather(*(client.query("device", d) for d in devices))
+            assert [list(r) for r in replies] == [[d] for d in devices]
+
+            results = await asyncio.gather(client.control(1, "on"), client.control(1, "dim", level=30),
+                                           client.query("device", 1))
+            assert [r.getValue("status") for r in results[:2]] == ["success", "success"]
+            assert results[2][1]["shade"] == 30 and results[2][1]["on"]
+
+            try:
+                await client.query("room", 999)
+                raise AssertionError("error response not raised")
+            except RuntimeError:
+                pass
+
+            changes = client.changes("device:1", interval=0.01, since=0)
+            first = await changes.__anext__()
+            assert (first["device_id"], first["action"]) == (1, "on")
+            await changes.aclose()
+        finally:
+            await client.close()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+    print("Async client test passed!")
+
+
+if __name__ == "__main__":
+    test_pipelined_requests()
+    print("All async client tests completed successfully.")
@@ -0,0 +1,91 @@
+import socket
+import contextlib
+
+from app_protocol import SmartHomeProtocol
+from client_cache import StateCache
+
+from test_client_pool import _live_server, ADMIN_LOGIN
+from test_server import FakeClock
+
+ALL = {101: {1: {"device_id": 1, "on": False, "type": "Lamp"}, 10: {"device_id": 10, "is_unlocked": False, "type": "Lock"}},
+       102: {5: {"device_id": 5, "on": True, "type": "CeilingLight"}}}
+
+
+def test_ttl_versions_and_derived_reads():
+    clock = FakeClock()
+    cache = StateCache(ttl=1.0, clock=clock)
+    assert cache.get(("device", "1")) is None
+    cache.put(("all", None), ALL, "7")
+    assert cache.get(("device", "1")) == {1: ALL[101][1]}
+    assert cache.get(("room", "102")) == {102: ALL[102]}
+    assert cache.get(("group", "locks")) == {"locks": {10: ALL[101][10]}}
+    assert cache.get(("room", "kitchen")) is None  # names are the server's business
+
+    cache.note_version("7")
+    assert cache.get(("all", None)) == ALL
+    cache.note_version("8")  # the house changed
+    assert cache.get(("all", None)) is None
+
+    cache.put(("device", "1"), {1: ALL[101][1]}, "8")
+    clock.now = 1.5
+    assert cache.get(("device", "1")) is None
+    cache.put(("history", "device:1"), {"history": []}, "8")
+    assert cache.get(("history", "device:1")) is None
+    assert StateCache(ttl=0).get(("all", None)) is None
+    print("Cache TTL/version test passed!")
+
+
+class _CountingSocket:
+    """Counts the frames a client sends."""
+    def __init__(self, sock):
+        self._sock = sock
+        self.sent = 0
+
+    def sendall(self, data):
+        self.sent += 1
+        return self._sock.sendall(data)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def test_cached_reads_skip_the_round_trip():
+    server, port = _live_server(num_workers=1)
+    sock = _CountingSocket(socket.create_connection(("localhost", port)))
+    other_sock = socket.create_connection(("localhost", port))
+    client = SmartHomeProtocol(sock, cache_ttl=60)
+    other = SmartHomeProtocol(other_sock)
+    try:
+        with contextlib.redirect_stdout(None):
+            client.send_login(*ADMIN_LOGIN, topology=True)
+            other.send_login(*ADMIN_LOGIN)
+            client.request_device_status("all")
+            sent = sock.sent
+            client.request_device_status("device", 1)
+            client.request_device_status("room", 101)
+            client.request_device_status("group", "lamps")
+            client.list_rooms()
+            assert sock.sent == sent, "cached reads went to the server"
+
+            # Our own control drops the cache
+            client.send_device_control(1, "on")
+            client.request_device_status("device", 1)
+            assert sock.sent == sent + 2
+
+            # Someone else's change shows up in the version of our next response
+            other.send_device_control(2, "on")
+            client.request_history("device:2")
+            client.request_device_status("device", 2)
+            assert sock.sent == sent + 4
+            assert client.cache.get(("device", "2"))[2]["on"]
+    finally:
+        sock.close()
+        other_sock.close()
+        server.shutdown()
+    print("Client cache round trip test passed!")
+
+
+if __name__ == "__main__":
+    test_ttl_versions_and_derived_reads()
+    test_cached_reads_skip_the_round_trip()
+    print("All client cache tests completed successfully.")
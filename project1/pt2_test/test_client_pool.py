@@ -0,0 +1,83 @@
+import socket
+import threading
+
+from client_pool import SmartHomeClientPool
+from csserver import SmartHomeServer
+
+ADMIN_LOGIN = ("hannahbanana", "JuniperTheCat")
+
+
+def _live_server(**kwargs):
+    """A SmartHomeServer accepting connections on a free port, in a background thread."""
+    server = SmartHomeServer(port=0, **kwargs)
+    threading.Thread(target=server.run, daemon=True).start()
+    return server, server.server_socket.getsockname()[1]
+
+
+def test_threads_share_a_pool():
+    """Many threads, at most `size` connections, every request answered."""
+    server, port = _live_server(num_workers=2)
+    pool = SmartHomeClientPool("localhost", port, ADMIN_LOGIN, size=3)
+    failures = []
+
+    def worker(n):
+        for i in range(10):
+            action = "on" if i % 2 == 0 else "off"
+            with pool.connection() as client:
+                client.send_device_control(1 + n % 3, action)
+                if client.last_response.getValue("status") not in ("success", "error"):
+                    failures.append(client.last_response)
+            pool.run(lambda client: client.request_device_status("device", 1))
+
+    try:
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not failures
+        stats = pool.stats()
+        assert stats["opened"] <= 3 and stats["reconnects"] == 0
+    finally:
+        pool.close()
+        server.shutdown()
+    print("Pool sharing test passed!")
+
+
+def test_bounded_wait_and_reconnect():
+    """A full pool times out instead of blocking; a connection the server dropped is replaced."""
+    server, port = _live_server(num_workers=1)
+    pool = SmartHomeClientPool("localhost", port, ADMIN_LOGIN, size=1, idle_check=0)
+    try:
+        with pool.connection():
+            try:
+                with pool.connection(timeout=0.1):
+                    raise AssertionError("got a second connection from a pool of one")
+            except TimeoutError:
+                pass
+        assert pool.stats()["timeouts"] == 1
+
+        # The server side goes away while the connection is idle
+        conn = pool._idle.get_nowait()
+        conn.client.sock.shutdown(socket.SHUT_RD)
+        pool._idle.put(conn)
+        with pool.connection() as client:
+            client.request_device_status("device", 1)
+            assert client.last_response.getValue("status") == "success"
+        assert pool.stats()["reconnects"] == 1 and pool.stats()["opened"] == 2
+
+        try:
+            SmartHomeClientPool("localhost", port, ("hannahbanana", "wrong")).run(lambda client: None)
+            raise AssertionError("bad credentials were accepted")
+        except PermissionError:
+            pass
+    finally:
+        pool.close()
+        server.shutdown()
+    print("Pool wait/reconnect test passed!")
+
+
+if __name__ == "__main__":
+    test_threads_share_a_pool()
+    test_bounded_wait_and_reconnect()
+    print("All client pool tests completed successfully.")
@@ -0,0 +1,91 @@
+import io
+import socket
+import threading
+import contextlib
+
+from app_protocol import SmartHomeProtocol, Result
+from csmessage import CSmessage, REQS
+from cspdu import CSpdu
+
+TOPOLOGY = {"version": 3, "rooms": {101: {"name": "Den", "devices": {1: "Lamp", 2: "Lock"}}}}
+ALL = {101: {1: {"device_id": 1, "on": False, "type": "Lamp"}, 2: {"device_id": 2, "is_unlocked": False, "type": "Lock"}}}
+
+
+def _fake_server(sock):
+    """Answers like SmartHomeServer would, for the requests this test sends."""
+    pdu = CSpdu(sock)
+    while True:
+        try:
+            req = pdu.recvMessage()
+        except ConnectionError:
+            return
+        resp = CSmessage(req.getType())
+        if req.getType() == REQS.LGIN:
+            resp.addValue("status", "success")
+            resp.addValue("house_id", "1")
+            resp.addValue("topology", str(TOPOLOGY))
+        elif req.getType() == REQS.QERY:
+            resp.addValue("status", "success")
+            resp.addValue("device_status", str(ALL))
+            resp.addValue("version", "9")
+        elif req.getValue("action") == "unlock":
+            resp.addValue("status", "error")
+            resp.addValue("error_message", "Wrong code")
+        else:
+            resp.addValue("status", "success")
+        pdu.sendMessage(resp)
+        if req.getType() == REQS.LOUT:
+            return
+
+
+def test_results_and_no_output():
+    """Calls return Result objects and print nothing."""
+    client_sock, server_sock = socket.socketpair()
+    threading.Thread(target=_fake_server, args=(server_sock,), daemon=True).start()
+    client = SmartHomeProtocol(client_sock, cache_ttl=60)
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            login = client.send_login("hannahbanana", "JuniperTheCat", topology=True)
+            assert isinstance(login, Result) and login and login.status == TOPOLOGY
+            assert client.list_rooms() == {101: "Den"}
+
+            query = client.request_device_status("all")
+            assert query.ok and query.status == ALL and not query.cached
+            cached = client.request_device_status("room", "den")
+            assert cached.ok and cached.cached and cached.status == {101: ALL[101]}
+            missing = client.request_device_status("room", "attic")
+            assert not missing and "attic" in missing.error
+
+            assert client.send_device_control(1, "on").ok
+            denied = client.send_device_control(2, "unlock", code="0000")
+            assert not denied and denied.error == "Wrong code" and denied.response is not None
+            assert client.send_logout().ok
+        assert out.getvalue() == "", out.getvalue()
+    finally:
+        client_sock.close()
+        server_sock.close()
+    print("Client results test passed!")
+
+
+def test_no_response_is_a_failed_result():
+    """A connection that cannot be reopened gives an error result instead of an exception or a print."""
+    client_sock, server_sock = socket.socketpair()
+    client = SmartHomeProtocol(client_sock, cache_ttl=0)
+    client.logged_in = True
+    server_sock.close()
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            result = client.request_device_status("all")
+        assert not result and result.response is None and "Request failed" in result.error
+        assert out.getvalue() == ""
+    finally:
+        client_sock.close()
+    print("No response test passed!")
+
+
+if __name__ == "__main__":
+    test_results_and_no_output()
+    test_no_response_is_a_failed_result()
+    print("All client result tests completed successfully.")
@@ -0,0 +1,61 @@
+import asyncio
+
+from client_runner import parse_command, read_commands, run_commands, percentile, latency_summary
+from csmessage import REQS
+
+from test_client_pool import _live_server
+
+SCRIPT = """
+# nightly scene
+login hannahbanana JuniperTheCat 1
+query all
+control 1 on
+control 1 dim level=40
+control group:lamps on
+control 10 unlock code=0000
+query device 1
+query room 999
+dance 1
+control 2 on level
+"""
+
+
+def test_parse_commands():
+    command = parse_command("control 1 dim level=40", 7)
+    assert (command.line_no, command.req_type, command.fields) == (7, REQS.CTRL, {"device_id": "1", "action": "dim", "level": "40"})
+    assert parse_command("control room:101 off").fields == {"target": "room:101", "action": "off"}
+    assert parse_command("login a b 2").fields == {"username": "a", "password": "b", "house_id": "2"}
+    assert parse_command("query group lamps").fields == {"query_type": "group", "query_value": "lamps"}
+
+    commands, bad = read_commands(SCRIPT.splitlines())
+    assert len(commands) == 8
+    assert [line_no for line_no, _, _ in bad] == [11, 12]
+
+    assert percentile([], 50) == 0.0
+    samples = list(range(1, 101))
+    assert (percentile(samples, 50), percentile(samples, 99), percentile(samples, 100)) == (50, 99, 100)
+    assert latency_summary([0.001, 0.002, 0.003])["max"] == 3.0
+    print("Command parsing test passed!")
+
+
+def test_run_against_server():
+    """Same outcome with and without pipelining; failed commands are reported by line."""
+    commands, _ = read_commands(SCRIPT.splitlines())
+    for window in (1, 8):
+        server, port = _live_server(num_workers=1)  # a fresh house each time: "on" fails on a lamp that is on
+        try:
+            report = asyncio.run(run_commands(commands, "localhost", port, window=window))
+            assert (report["commands"], report["succeeded"], report["failed"]) == (8, 6, 2), report
+            assert [failure["line"] for failure in report["failures"]] == [8, 10]
+            assert report["latency_ms"]["p50"] <= report["latency_ms"]["max"]
+            lamp = server.houses.get_house(1).rooms[101].get_device(1)
+            assert lamp.check_status()["shade"] == 40
+        finally:
+            server.shutdown()
+    print("Command runner test passed!")
+
+
+if __name__ == "__main__":
+    test_parse_commands()
+    test_run_against_server()
+    print("All command runner tests completed successfully.")
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import tempfile
+
+from csserver import SmartHomeServer, SmartHomeServerOps, PROJECT2_DIR
+
+sys.path.insert(0, PROJECT2_DIR)
+from db_manager import DatabaseManager
+
+from test_server import _login, _ctrl
+
+
+def _server(db):
+    return SmartHomeServer(port=0, num_workers=1, db=db)
+
+
+def _stop(server):
+    server.server_socket.close()
+    server.workers.shutdown()
+
+
+def test_state_survives_restart():
+    """Changes recorded through write-behind are restored by the next server on the same file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "home.db")
+
+        db = DatabaseManager(path, flush_interval=60)  # nothing is written before close(): one batch
+        server = _server(db)
+        ops = SmartHomeServerOps(server=server)
+        _login(ops)
+        assert _ctrl(ops, 1, "on").getValue("status") == "success"
+        assert _ctrl(ops, 2, "dim", level="30").getValue("status") == "success"
+        assert _ctrl(ops, 2, "color", color="red").getValue("status") == "success"
+        _stop(server)
+        assert db.written == 0
+        start = time.monotonic()
+        db.close()
+        assert db.written == 2 and db.batches == 1  # the two changes to lamp 2 were coalesced
+        assert time.monotonic() - start < 5  # close() did not sit out the flush interval
+
+        db = DatabaseManager(path, write_behind=False)
+        server = _server(db)
+        try:
+            living_room = server.houses.get_house(1).get_room(101)
+            assert living_room.get_device(1).on
+            lamp = living_room.get_device(2)
+            assert (lamp.on, lamp.shade, lamp.color) == (False, 30, "red")
+            assert not living_room.get_device(3).on
+        finally:
+            _stop(server)
+            db.close()
+    print("Restart test passed!")
+
+
+def test_site_is_stored():
+    db = DatabaseManager(":memory:", write_behind=False)
+    server = _server(db)
+    try:
+        rows = db._conn.execute("SELECT type, COUNT(*) FROM devices GROUP BY type ORDER BY type").fetchall()
+        assert rows == [("Alarm", 1), ("Blinds", 2), ("CeilingLight", 1), ("Lamp", 5), ("Lock", 2)]
+        access = db._conn.execute("SELECT username, house_id FROM user_houses").fetchall()
+        assert access == [("hannahbanana", 1)]
+        # Lock and alarm codes stay in the site file, not in the database
+        configs = dict(db._conn.execute("SELECT type, config FROM devices WHERE type IN ('Lock', 'Alarm')").fetchall())
+        assert configs == {"Lock": '{"codes": 5}', "Alarm": '{"codes": 1}'}
+    finally:
+        _stop(server)
+        db.close()
+    print("Stored site test passed!")
+
+
+if __name__ == "__main__":
+    test_state_survives_restart()
+    test_site_is_stored()
+    print("All database tests completed successfully.")
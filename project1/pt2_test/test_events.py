@@ -0,0 +1,90 @@
+import time
+import threading
+
+from events import EventBus
+from home_model import SmartHouse, Room, Lamp, Lock
+
+from test_server import _login, _ctrl, _lock_id
+from csserver import SmartHomeServer, SmartHomeServerOps
+
+
+def _house_with_bus(bus):
+    house = SmartHouse(1, "Evented")
+    house.events = bus
+    room = Room(101, "Hall")
+    house.add_room(room)
+    room.add_lamp(Lamp(0))
+    room.add_lock(Lock(0, code=["1234"]))
+    return house, room
+
+
+def test_devices_and_house_publish():
+    bus = EventBus()
+    seen = []
+    bus.subscribe("*", lambda event: seen.append((event.topic, event.device_id, event.data)))
+    house, room = _house_with_bus(bus)
+    room.get_device(1).flip_switch()
+    room.get_device(2).unlock("0000")
+    house.remove_room(101)
+    bus.drain()
+    assert seen == [
+        ("house.room_added", None, {"room_id": 101}),
+        ("light.on", 1, {}),
+        ("lock.failed", 2, {"attempts": 1}),
+        ("house.room_removed", None, {"room_id": 101}),
+    ]
+    bus.shutdown()
+    print("Model event test passed!")
+
+
+def test_patterns_and_failing_listeners():
+    bus = EventBus()
+    locks, exact = [], []
+    bus.subscribe("lock.*", lambda event: locks.append(event.topic))
+    bus.subscribe("lock.failed", lambda event: exact.append(event.topic))
+    bus.subscribe("lock.failed", lambda event: 1 / 0)
+    for topic in ("lock.failed", "lock.unlocked", "light.on", "lockdown"):
+        bus.publish(topic)
+    bus.drain()
+    assert locks == ["lock.failed", "lock.unlocked"]
+    assert exact == ["lock.failed"]
+    assert bus.stats()["failed"] == 1
+    bus.shutdown()
+    print("Event pattern test passed!")
+
+
+def test_slow_listener_does_not_delay_requests():
+    """A listener that blocks does not hold up CTRL; a full queue drops instead of blocking."""
+    server = SmartHomeServer(port=0, num_workers=1)
+    release = threading.Event()
+    server.events.subscribe("lock.*", lambda event: release.wait(5))
+    try:
+        ops = SmartHomeServerOps(server=server)
+        _login(ops)
+        lock_id = _lock_id(ops)
+        start = time.perf_counter()
+        assert _ctrl(ops, lock_id, "unlock", code="1234").getValue("status") == "success"
+        assert _ctrl(ops, lock_id, "lock").getValue("status") == "success"
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        server.shutdown()
+    # shutdown() dispatched what was queued and stopped the bus's threads
+    assert server.events.stats()["queued"] == 0
+    assert not any(thread.is_alive() for thread in server.events._threads)
+
+    bus = EventBus(max_queue=1)
+    bus.subscribe("*", lambda event: release.wait())
+    release.clear()
+    results = [bus.publish("light.on") for _ in range(5)]
+    assert results.count(False) >= 3 and bus.stats()["dropped"] >= 3
+    release.set()
+    bus.shutdown()
+    print("Slow listener test passed!")
+
+
+if __name__ == "__main__":
+    test_devices_and_house_publish()
+    test_patterns_and_failing_listeners()
+    test_slow_listener_does_not_delay_requests()
+    print("All event tests completed successfully.")
@@ -0,0 +1,120 @@
+import ast
+import tempfile
+
+from csmessage import CSmessage, REQS
+from csserver import SmartHomeServer, SmartHomeServerOps, HISTORY_LIMIT
+from house_loader import SiteConfig
+from history import DeviceHistory
+from home_model import Lamp
+
+from test_server import FakeClock, _login, _ctrl, _lock_id, _site_file, _demo_records, ADMIN, MULTI_SITE
+
+
+def test_rings_and_global_cap():
+    """Each device keeps its newest changes, and the whole history stays under its cap."""
+    clock = FakeClock()
+    history = DeviceHistory(per_device=3, max_entries=5, clock=clock)
+    lamps = [Lamp(device_id=i) for i in (1, 2, 3)]
+    for step in range(4):
+        clock.now = step
+        lamps[0].set_shade(step)
+        history.record(lamps[0], 101, "dim")
+    assert [c["status"]["shade"] for c in history.changes([1])] == [1, 2, 3]
+
+    clock.now = 10
+    for lamp in lamps[1:]:
+        lamp.flip_switch()
+        history.record(lamp, 101, "on")
+    # 3 + 2 = 5 entries, at the cap
+    assert len(history) == 5
+    clock.now = 11
+    history.record(lamps[2], 101, "off")
+    assert len(history) == 5
+    assert [c["status"]["shade"] for c in history.changes([1])] == [2, 3]
+
+    changes = history.changes([1, 2, 3], since=3, until=10)
+    assert [(c["device_id"], c["action"]) for c in changes] == [(1, "dim"), (2, "on"), (3, "on")]
+    assert history.changes([1, 2, 3], limit=1)[0]["action"] == "off"
+
+    # A smaller share drops the oldest changes at once
+    history.resize(3)
+    assert len(history) == 3 and [c["device_id"] for c in history.changes([1, 2, 3])] == [2, 3, 3]
+    # After a reload, device 2 is gone and device 3 is a lock now: only what still applies is kept
+    assert history.keep_devices({1: "Lamp", 3: "Lock"}) == 3
+    assert len(history) == 0 and history.changes([1, 2, 3]) == []
+    history.record(lamps[0], 101, "on")
+    assert len(history) == 1
+    print("History ring test passed!")
+
+
+def test_history_query():
+    """'When was the lock last unlocked?' through the QERY history type."""
+    ops = SmartHomeServerOps()
+    _login(ops)
+    lock_id = _lock_id(ops)
+    assert _ctrl(ops, lock_id, "unlock", code="1234").getValue("status") == "success"
+    assert _ctrl(ops, lock_id, "lock").getValue("status") == "success"
+    assert _ctrl(ops, 1, "on").getValue("status") == "success"
+    assert _ctrl(ops, lock_id, "unlock", code="0000").getValue("status") == "error"
+
+    req = CSmessage(REQS.QERY)
+    req.addValue("query_type", "history")
+    req.addValue("query_value", f"device:{lock_id}")
+    req.addValue("action", "unlock")
+    req.addValue("limit", "1")
+    resp = ops._process(req)
+    assert resp.getValue("status") == "success"
+    (change,) = ast.literal_eval(resp.getValue("device_status"))["history"]
+    assert change["user"] == "hannahbanana" and change["status"]["is_unlocked"]
+
+    req = CSmessage(REQS.QERY)
+    req.addValue("query_type", "history")
+    req.addValue("query_value", "room:101")
+    changes = ast.literal_eval(ops._process(req).getValue("device_status"))["history"]
+    assert [c["action"] for c in changes] == ["unlock", "lock", "on", "unlock_failed"]
+    assert changes[-1]["status"]["failed_attempts"] == 1
+
+    req = CSmessage(REQS.QERY)
+    req.addValue("query_type", "history")
+    req.addValue("query_value", "garage:1")
+    assert ops._process(req).getValue("status") == "error"
+
+    # The limit is capped so the answer fits in a frame, and can't be negative
+    for i in range(2 * HISTORY_LIMIT):
+        _ctrl(ops, 1 + i % 3, "dim", level=i % 100)
+    req = CSmessage(REQS.QERY)
+    req.addValue("query_type", "history")
+    req.addValue("query_value", "room:101")
+    req.addValue("limit", "1000")
+    changes = ast.literal_eval(ops._process(req).getValue("device_status"))["history"]
+    assert len(changes) == HISTORY_LIMIT
+    req.addValue("limit", "-1")
+    assert ops._process(req).getValue("status") == "error"
+    print("History query test passed!")
+
+
+def test_history_budget_and_reload():
+    """One history budget for all houses; a reload keeps the history of devices that are still there."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _site_file(tmp, "site.jsonl", _demo_records() + [ADMIN])
+        server = SmartHomeServer(port=0, layout=SiteConfig(path), num_workers=1, history_entries=900)
+        try:
+            assert server.histories[1].max_entries == 900
+            ops = SmartHomeServerOps(server=server)
+            _login(ops)
+            assert _ctrl(ops, 1, "on").getValue("status") == "success"
+
+            _site_file(tmp, "site.jsonl", MULTI_SITE)  # houses 2 and 3 join
+            assert server.reload_house()
+            assert [server.histories[house_id].max_entries for house_id in (1, 2, 3)] == [300, 300, 300]
+            assert [c["action"] for c in server.histories[1].changes([1])] == ["on"]
+        finally:
+            server.shutdown()
+    print("History budget test passed!")
+
+
+if __name__ == "__main__":
+    test_rings_and_global_cap()
+    test_history_query()
+    test_history_budget_and_reload()
+    print("All history tests completed successfully.")
@@ -0,0 +1,138 @@
+import os
+import json
+import tempfile
+
+from home_model import UserManager
+from house_loader import load_site, add_users, SiteConfigError, DEMO_CONFIG
+
+CSV_SITE = """kind,house_id,room_id,name,on,shade,color,code,username,password,role,houses
+house,7,,Cabin,,,,,,,,
+room,,1,Porch,,,,,,,,
+lamp,,1,,true,40,blue,,,,,
+lock,,1,,,,,1111|2222,,,,
+alarm,,1,,,,,4321,,,,
+user,,,,,,,,juniper,meow,,7
+"""
+
+TOML_SITE = """
+[[records]]
+kind = "house"
+house_id = 7
+name = "Cabin"
+store = "columnar"
+
+[[records]]
+kind = "room"
+room_id = 1
+name = "Porch"
+
+[[records]]
+kind = "lamp"
+room_id = 1
+on = true
+shade = 40
+color = "blue"
+
+[[records]]
+kind = "lock"
+room_id = 1
+code = ["1111", "2222"]
+
+[[records]]
+kind = "alarm"
+room_id = 1
+code = "4321"
+
+[[records]]
+kind = "user"
+username = "juniper"
+password = "meow"
+houses = [7]
+"""
+
+
+def _write(tmp, name, text):
+    path = os.path.join(tmp, name)
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def test_demo_site_matches_old_layout():
+    """The shipped demo file gives the same device IDs the hardcoded layout did."""
+    houses, user_records = load_site(DEMO_CONFIG)
+    house = houses[0]
+    assert house.house_id == 1 and set(house.rooms) == {101, 102, 103}
+    living_room = house.get_room(101)
+    assert sorted(living_room.devices) == [1, 2, 3, 4, 9, 10, 11]
+    assert house.get_room(102).ceiling_light.device_id == 5
+    assert living_room.get_device(9).enter_code("9999")
+
+    users = UserManager()
+    add_users(users, user_records, houses)
+    assert users.get_user("hannahbanana").accessible_houses == {1}
+    print("Demo site test passed!")
+
+
+def test_formats_build_the_same_site():
+    """CSV (streamed, strings) and TOML (typed, columnar store) describe the same cabin."""
+    with tempfile.TemporaryDirectory() as tmp:
+        statuses = []
+        for name, text in (("site.csv", CSV_SITE), ("site.toml", TOML_SITE)):
+            houses, user_records = load_site(_write(tmp, name, text))
+            assert [h.house_id for h in houses] == [7]
+            assert user_records[0]["username"] == "juniper"
+            statuses.append(houses[0].check_status())
+        assert statuses[0] == statuses[1]
+        assert statuses[0][1][1] == {"device_id": 1, "on": True, "shade": 40, "color": "blue", "type": "Lamp"}
+    print("Site format test passed!")
+
+
+def test_bad_records_are_reported():
+    with tempfile.TemporaryDirectory() as tmp:
+        for records in (
+            [{"kind": "lamp", "room_id": 1}],                                  # no house yet
+            [{"kind": "house", "house_id": 1}, {"kind": "lamp", "room_id": 1}],  # no such room
+            [{"kind": "house", "house_id": 1}, {"kind": "room", "room_id": 1},
+             {"kind": "lamp", "room_id": 1, "color": "plaid"}],                # unknown color
+            [{"kind": "garage_door"}],
+            [{"kind": "user", "password": "secret"}],                          # no username
+            [{"kind": "house", "house_id": 1}, {"kind": "room", "room_id": 1},
+             {"kind": "alarm", "room_id": 1}],                                 # alarm without a code
+            [{"kind": "house", "house_id": 1}, {"kind": "room", "room_id": 1},
+             {"kind": "alarm", "room_id": 1, "code": ""}],                     # ...or with an empty one
+            [{"kind": "house", "house_id": 1}, {"kind": "room", "room_id": 1},
+             {"kind": "lock", "room_id": 1}],                                  # lock without codes
+            [{"kind": "house", "house_id": 1}, {"kind": "room", "room_id": 1},
+             {"kind": "lock", "room_id": 1, "code": []}],
+        ):
+            path = _write(tmp, "bad.jsonl", "\n".join(json.dumps(r) for r in records))
+            try:
+                load_site(path)
+            except SiteConfigError:
+                continue
+            raise AssertionError(f"No error for {records}")
+
+        # Errors of our own come through as raised, with where they came from as a note
+        path = _write(tmp, "bad.jsonl", json.dumps({"kind": "lamp", "room_id": 1}))
+        try:
+            load_site(path)
+            raise AssertionError("No error for a lamp without a house")
+        except SiteConfigError as e:
+            assert str(e) == "No house defined before this record"
+            assert e.__notes__ == [f"in {path}: lamp record {{'kind': 'lamp', 'room_id': 1}}"]
+
+    users = UserManager()
+    try:
+        add_users(users, [{"kind": "user", "password": "secret"}], [])
+        raise AssertionError("No error for a user without a username")
+    except SiteConfigError as e:
+        assert str(e) == "user record is missing username"
+    print("Bad record test passed!")
+
+
+if __name__ == "__main__":
+    test_demo_site_matches_old_layout()
+    test_formats_build_the_same_site()
+    test_bad_records_are_reported()
+    print("All loader tests completed successfully.")
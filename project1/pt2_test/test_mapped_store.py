@@ -0,0 +1,129 @@
+import os
+import tempfile
+
+from home_model import SmartHouse, Room, Lamp
+from house_loader import SiteConfig
+from mapped_store import MappedDeviceStore
+
+from test_server import _login, _ctrl, _site_file, _demo_records, ADMIN, SITE_V2
+from csserver import SmartHomeServer, SmartHomeServerOps
+
+
+def test_state_survives_restart():
+    """A second server on the same state files starts with the first one's device state."""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = SmartHomeServer(port=0, num_workers=1, layout=SiteConfig(state_dir=tmp))
+        ops = SmartHomeServerOps(server=server)
+        _login(ops)
+        assert _ctrl(ops, 1, "on").getValue("status") == "success"
+        assert _ctrl(ops, 5, "color", color="blue").getValue("status") == "success"
+        assert _ctrl(ops, 10, "unlock", code="0000").getValue("status") == "error"
+        server.server_socket.close()
+        server.workers.shutdown()
+        server.houses.get_house(1).store.close()
+
+        house = SiteConfig(state_dir=tmp).build_houses()[0]
+        assert house.store.reattached == 11
+        assert house.get_room(101).get_device(1).on
+        assert house.get_room(102).ceiling_light.color == "blue"
+        assert house.get_room(101).get_device(10).failed_attempts == 1
+
+        # A monitor reads the same file without building anything
+        monitor = MappedDeviceStore(os.path.join(tmp, "house-1.state"), readonly=True)
+        assert monitor.export_status() == house.store.export_status()
+        assert monitor.device_status(10)["failed_attempts"] == 1
+        monitor.close()
+        house.store.close()
+    print("Mapped state restart test passed!")
+
+
+def test_smaller_layout_drops_old_records():
+    """Restarting on the same state file with fewer devices forgets the removed ones."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "site.state")
+        store = MappedDeviceStore(path)
+        house = SmartHouse(1, "Shrinks", store=store)
+        for room_id in (1, 2):
+            house.add_room(Room(room_id, f"Room {room_id}"))
+            house.get_room(room_id).add_devices(lamps=[Lamp(0) for _ in range(3)])
+        store.close()
+
+        store = MappedDeviceStore(path)
+        house = SmartHouse(1, "Shrinks", store=store)
+        house.add_room(Room(1, "Room 1"))
+        house.get_room(1).add_devices(lamps=[Lamp(0) for _ in range(3)])
+        assert list(store.export_status()) == [1]
+        assert store.release_unclaimed() == 3
+        store.flush()
+
+        monitor = MappedDeviceStore(path, readonly=True)
+        assert monitor.export_status() == store.export_status()
+        monitor.close()
+        store.close()
+    print("Smaller layout test passed!")
+
+
+def test_reload_reuses_the_live_store():
+    """A reload moves the new layout into the open state file on the worker; shutdown closes it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _site_file(tmp, "site.jsonl", _demo_records() + [ADMIN])
+        server = SmartHomeServer(port=0, num_workers=1, layout=SiteConfig(path, state_dir=tmp))
+        ops = SmartHomeServerOps(server=server)
+        _login(ops)
+        assert _ctrl(ops, 1, "on").getValue("status") == "success"
+        store = server.houses.get_house(1).store
+
+        _site_file(tmp, "site.jsonl", SITE_V2)
+        assert server.reload_house()
+        house = server.houses.get_house(1)
+        assert house.store is store and not store.closed
+        assert house.get_room(101).get_device(1).on
+        assert _ctrl(ops, 12, "on").getValue("status") == "success"
+        assert store.device_status(12)["on"]
+
+        # Back to the smaller layout: room 104 leaves the file too
+        _site_file(tmp, "site.jsonl", _demo_records() + [ADMIN])
+        assert server.reload_house()
+        assert server.houses.get_house(1).store is store
+        store.flush()
+        monitor = MappedDeviceStore(os.path.join(tmp, "house-1.state"), readonly=True)
+        assert monitor.export_status() == store.export_status()
+        assert 104 not in monitor.export_status()
+        monitor.close()
+
+        server.shutdown()
+        assert store.closed
+    print("Mapped store reload test passed!")
+
+
+def test_file_grows_and_rejects_other_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "small.state")
+        store = MappedDeviceStore(path, capacity=2)
+        house = SmartHouse(1, "Grows", store=store)
+        room = Room(1, "Hall")
+        house.add_room(room)
+        room.add_devices(lamps=[Lamp(0) for _ in range(10)])
+        room.get_device(10).set_shade(7)
+        assert store.capacity >= 11
+        assert store.device_status(10)["shade"] == 7
+        store.close()
+
+        bogus = os.path.join(tmp, "bogus.state")
+        with open(bogus, "wb") as f:
+            f.write(b"not a state file")
+        try:
+            MappedDeviceStore(bogus)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Opened a file that is not a state file")
+    print("Mapped file growth test passed!")
+
+
+if __name__ == "__main__":
+    test_state_survives_restart()
+    test_smaller_layout_drops_old_records()
+    test_reload_reuses_the_live_store()
+    test_file_grows_and_rejects_other_files()
+    print("All mapped store tests completed successfully.")
@@ -1,4 +1,5 @@
-from home_model import SmartHouse, Room, CeilingLight, Blinds, Lamp, Lock
+from home_model import SmartHouse, Room, CeilingLight, Blinds, Lamp, Lock, VALID_COLORS
+from device_store import ColumnarDeviceStore, LAMP
 
 def create_sample_smart_house():
     # Create the SmartHouse
@@ -93,6 +94,140 @@ def create_sample_smart_house():
 
 #test case
 
+def test_devices_are_slotted():
+    """Devices keep their public attributes but carry no per-instance __dict__."""
+    house = SmartHouse(house_id=1, name="Slots")
+    room = Room(room_id=101, name="Living Room",
+                ceiling_light=CeilingLight(device_id=0, on=True, shade=75),
+                blinds=Blinds(device_id=0))
+    house.add_room(room)
+    room.add_devices(lamps=[Lamp(device_id=0, on=True, shade=60)], locks=[Lock(device_id=0, code=["1234"])])
+
+    for device in room.devices.values():
+        assert not hasattr(device, "__dict__"), f"{type(device).__name__} has a __dict__"
+
+    lamp = room.get_device(3)
+    assert (lamp.on, lamp.shade, lamp.color) == (True, 60, "white")
+    lamp.change_color("BLUE")
+    assert str(lamp) == "Lamp 3: On, Shade: 60, Color: blue"
+    assert str(room.ceiling_light).startswith("CeilingLight 1:")
+
+
+
+def test_status_cached_until_mutation():
+    """check_status() returns the same dict until a mutator marks the device dirty."""
+    house = SmartHouse(house_id=1, name="Cache")
+    room = Room(room_id=101, name="Living Room", blinds=Blinds(device_id=0))
+    house.add_room(room)
+    lamp = Lamp(device_id=0)
+    lock = Lock(device_id=0, code=["1234"])
+    room.add_devices(lamps=[lamp], locks=[lock])
+
+    first = lamp.check_status()
+    assert lamp.check_status() is first
+    assert first == {"device_id": 2, "on": False, "shade": 100, "color": "white", "type": "Lamp"}
+    assert room.check_status()[2] is first  # rooms compose the cached dicts
+
+    lamp.flip_switch()
+    assert lamp.check_status() is not first and lamp.check_status()["on"] is True
+
+    before = lock.check_status()
+    lock.unlock("0000")
+    assert lock.check_status()["failed_attempts"] == 1 and before["failed_attempts"] == 0
+
+    room.blinds.shutter()
+    assert room.check_status()["blinds"]["is_open"] is True
+
+
+def test_batch_add_and_id_recycling():
+    """
+    add_devices reserves IDs in one step and rejects duplicates before adding anything;
+    with recycle_ids the IDs of a removed room are handed out again, lowest first.
+    """
+    house = SmartHouse(house_id=1, name="Recycling", recycle_ids=True)
+    first = Room(room_id=101, name="First")
+    house.add_room(first)
+    lamps = [Lamp(device_id=0) for _ in range(3)]
+    first.add_devices(lamps=lamps, locks=[Lock(device_id=0, code=["1234"])])
+    assert sorted(first.devices) == [1, 2, 3, 4]
+
+    try:
+        first.add_devices(lamps=[Lamp(device_id=0), lamps[0]])
+        assert False, "duplicate lamp was accepted"
+    except ValueError:
+        pass
+    assert len(first.devices) == 4 and house.next_device_id == 5
+
+    second = Room(room_id=102, name="Second")
+    house.add_room(second)
+    second.add_lamp(Lamp(device_id=0))
+    house.remove_room(101)
+
+    third = Room(room_id=103, name="Third")
+    house.add_room(third)
+    third.add_devices(lamps=[Lamp(device_id=0) for _ in range(6)])
+    assert sorted(third.devices) == [1, 2, 3, 4, 6, 7]
+    assert house.get_next_device_id() == 8
+
+
+def test_columnar_store_views_and_bulk_ops():
+    """
+    With a ColumnarDeviceStore, devices become views over the store's arrays:
+    the usual methods write the columns and bulk operations are seen by the views.
+    """
+    store = ColumnarDeviceStore()
+    house = SmartHouse(house_id=1, name="Columnar", store=store)
+    living = Room(room_id=101, name="Living Room", ceiling_light=CeilingLight(device_id=0, on=True))
+    kitchen = Room(room_id=102, name="Kitchen")
+    house.add_room(living)
+    house.add_room(kitchen)
+    living.add_devices(lamps=[Lamp(device_id=0, on=True, shade=60), Lamp(device_id=0)],
+                       locks=[Lock(device_id=0, code=["1234"])])
+    kitchen.add_lamp(Lamp(device_id=0, on=True, color="red"))
+
+    lamp = living.get_device(2)
+    assert isinstance(lamp, Lamp) and lamp.TYPE_NAME == "Lamp"
+    lamp.change_color("green")
+    assert VALID_COLORS[store.color[1]] == "green" and lamp.color == "green"
+
+    assert store.count_on() == 3
+    assert store.count_on(room_ids={102}) == 1
+    version = house.version
+
+    # "dim every lamp in rooms 101 and 102 to 40" leaves the ceiling light alone
+    assert store.set_shade(40, room_ids={101, 102}, kinds=(LAMP,)) == 3
+    assert living.get_device(2).shade == 40 and kitchen.get_device(5).shade == 40
+    assert living.ceiling_light.shade == 100
+    assert house.version != version  # bulk ops invalidate client caches too
+
+    assert living.get_device(4).unlock("1234")
+    version = house.version
+    assert store.lock_all() == 1 and not living.get_device(4).is_unlocked
+    assert house.version != version
+    version = house.version
+    assert store.lock_all(room_ids={102}) == 0 and house.version == version
+
+    exported = store.export_status()
+    assert exported[102][5] == {"device_id": 5, "on": True, "shade": 40, "color": "red", "type": "Lamp"}
+    assert exported[101][1]["type"] == "CeilingLight"
+
+    house.remove_room(102)
+    assert 102 not in store.export_status() and store.count_on() == 2
+
+    # The room holds views, but duplicates are still the objects the caller passed
+    lamp = Lamp(device_id=0)
+    pantry = Room(room_id=103, name="Pantry")
+    house.add_room(pantry)
+    pantry.add_lamp(lamp)
+    for add in (lambda: pantry.add_lamp(lamp), lambda: pantry.add_devices(lamps=[lamp])):
+        try:
+            add()
+            assert False, "the same lamp was added twice"
+        except ValueError:
+            pass
+    assert len(pantry.devices) == 1
+
+
 if __name__ == "__main__":
     my_house = create_sample_smart_house()
     
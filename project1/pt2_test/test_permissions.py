@@ -0,0 +1,94 @@
+import ast
+import tempfile
+
+from csmessage import CSmessage, REQS
+from csserver import SmartHomeServer, SmartHomeServerOps
+from home_model import UserManager
+from house_loader import SiteConfig
+from permissions import PermissionSet, READ, CONTROL, SECURITY, SCHEDULE, ADMIN
+
+from test_server import _ctrl, _demo_records, _site_file, ADMIN as ADMIN_USER
+
+
+def test_bitsets_and_invalidation():
+    """Role bits per house, room grants on top, and rebuilds only after a change."""
+    user = UserManager().add_user("sitter", "woof", role="guest")
+    user.accessible_houses.add(1)
+    user.grant(1, 102, CONTROL)
+    user.grant(2, None, CONTROL)  # another house: no effect on house 1
+    perms = PermissionSet(user, 1)
+    assert perms.allows(READ, 101) and perms.allows(READ | CONTROL, 102)
+    assert not perms.allows(CONTROL, 101) and not perms.allows(SECURITY, 102)
+    assert not PermissionSet(user, 2).allows(READ)  # granted, but no access to the house
+
+    user.grant(1, None, SCHEDULE)
+    assert perms.allows(SCHEDULE) and perms.allows(SCHEDULE | CONTROL, 102)
+
+    version = perms.version
+    assert perms.allows(READ, 101) and perms.version == version  # nothing changed, nothing rebuilt
+    user.set_role("regular")
+    assert perms.allows(CONTROL | SECURITY, 101) and not perms.allows(ADMIN)
+    user.set_role("guest")
+    user.revoke(1, 102)
+    assert not perms.allows(CONTROL, 102)
+    user.accessible_houses.clear()
+    user.permissions_changed()
+    assert not perms.allows(READ, 101)
+    print("Permission bitset test passed!")
+
+
+def _login_as(server, username, password):
+    ops = SmartHomeServerOps(server=server)
+    req = CSmessage(REQS.LGIN)
+    req.addValue("username", username)
+    req.addValue("password", password)
+    assert ops._dispatch(req).getValue("status") == "success"
+    return ops
+
+
+def _query(ops, query_type, query_value=None):
+    req = CSmessage(REQS.QERY)
+    req.addValue("query_type", query_type)
+    if query_value is not None:
+        req.addValue("query_value", query_value)
+    return ops._dispatch(req)
+
+
+def test_guest_access_through_requests():
+    """A guest reads everything but only controls what they were granted; role changes apply to live sessions."""
+    sitter = {"kind": "user", "username": "sitter", "password": "woof", "role": "guest", "houses": [1],
+              "grants": ["1:102:control"]}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _site_file(tmp, "site.jsonl", _demo_records() + [ADMIN_USER, sitter])
+        server = SmartHomeServer(port=0, layout=SiteConfig(path), num_workers=1)
+        try:
+            ops = _login_as(server, "sitter", "woof")
+            rooms = ast.literal_eval(_query(ops, "all").getValue("device_status"))
+            assert sorted(rooms) == [101, 102, 103]
+
+            assert _ctrl(ops, 5, "on").getValue("status") == "success"  # kitchen ceiling light
+            resp = _ctrl(ops, 1, "on")
+            assert resp.getValue("error_message").startswith("Permission denied")
+            assert _ctrl(ops, 10, "unlock", code="1234").getValue("status") == "error"
+            assert not ops.smart_home.get_room(101).get_device(10).is_unlocked
+            assert _ctrl(ops, 5, "off", delay=60).getValue("status") == "error"  # no schedule permission
+            assert _query(ops, "stats").getValue("status") == "error"
+
+            server.users.get_user("sitter").set_role("regular")
+            assert _ctrl(ops, 1, "on").getValue("status") == "success"
+            assert _ctrl(ops, 5, "off", delay=60).getValue("status") == "success"
+            assert _query(ops, "stats").getValue("status") == "error"  # admin only
+
+            admin = _login_as(server, "hannahbanana", "JuniperTheCat")
+            assert _query(admin, "stats").getValue("status") == "success"
+        finally:
+            server.scheduler.shutdown()
+            server.server_socket.close()
+            server.workers.shutdown()
+    print("Guest access test passed!")
+
+
+if __name__ == "__main__":
+    test_bitsets_and_invalidation()
+    test_guest_access_through_requests()
+    print("All permission tests completed successfully.")
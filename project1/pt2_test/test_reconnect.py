@@ -0,0 +1,122 @@
+import time
+import socket
+import threading
+import contextlib
+
+from app_protocol import SmartHomeProtocol
+
+from test_client_pool import _live_server, ADMIN_LOGIN
+
+
+def _drop(client):
+    """Break the client's connection the way a network blip would."""
+    client.sock.shutdown(socket.SHUT_RDWR)
+
+
+def test_queries_retry_controls_do_not():
+    """A dropped connection is reopened and logged in again; only idempotent requests are re-sent."""
+    server, port = _live_server(num_workers=1)
+    client = SmartHomeProtocol(socket.create_connection(("localhost", port)), cache_ttl=0, backoff=0.01)
+    try:
+        with contextlib.redirect_stdout(None):
+            client.send_login(*ADMIN_LOGIN, house_id=1, topology=True)
+            _drop(client)
+            client.request_device_status("device", 1)
+            assert client.last_response.getValue("status") == "success"
+            assert client.reconnects == 1 and client.logged_in and client.room_names
+
+            # A control that may have been sent is reported as failed, not sent twice...
+            _drop(client)
+            client.send_device_control(1, "on")
+            assert client.last_response is None
+            # ...and the next request reconnects first
+            client.send_device_control(1, "on")
+            assert client.last_response.getValue("status") == "success"
+            assert client.reconnects == 2
+    finally:
+        client.sock.close()
+        server.shutdown()
+    print("Reconnect test passed!")
+
+
+def test_deadline_bounds_a_silent_server():
+    """A server that accepts but never answers costs at most `timeout` seconds per request."""
+    silent = socket.socket()
+    silent.bind(("localhost", 0))
+    silent.listen(8)  # connections complete in the backlog; nobody ever reads them
+    client = SmartHomeProtocol(socket.create_connection(silent.getsockname()), timeout=0.3, backoff=0.01)
+    client.logged_in = True
+    try:
+        with contextlib.redirect_stdout(None):
+            start = time.monotonic()
+            client.request_device_status("all")
+            elapsed = time.monotonic() - start
+        assert client.last_response is None
+        assert elapsed < 1.0, elapsed
+    finally:
+        client.sock.close()
+        silent.close()
+    print("Deadline test passed!")
+
+
+def test_deadline_bounds_a_trickling_server():
+    """A response that arrives a byte at a time still fails at the deadline, not `timeout` per byte."""
+    slow = socket.socket()
+    slow.bind(("localhost", 0))
+    slow.listen(1)
+
+    def trickle():
+        conn, _ = slow.accept()
+        with conn:
+            conn.recv(4096)
+            for byte in b"0035type=QERY&status=success&version=1&":
+                time.sleep(0.05)
+                try:
+                    conn.sendall(bytes([byte]))
+                except OSError:
+                    return  # the client gave up
+
+    server = threading.Thread(target=trickle, daemon=True)
+    server.start()
+    client = SmartHomeProtocol(socket.create_connection(slow.getsockname()), timeout=0.3, retries=0)
+    client.logged_in = True
+    try:
+        with contextlib.redirect_stdout(None):
+            start = time.monotonic()
+            client.request_device_status("all")
+            elapsed = time.monotonic() - start
+        assert client.last_response is None
+        assert elapsed < 0.6, elapsed
+    finally:
+        client.sock.close()
+        server.join()
+        slow.close()
+    print("Trickle deadline test passed!")
+
+
+def test_gives_up_when_the_server_is_gone():
+    """With nothing to reconnect to, a request fails after `retries` backoffs instead of hanging."""
+    server, port = _live_server(num_workers=1)
+    client = SmartHomeProtocol(socket.create_connection(("localhost", port)), cache_ttl=0,
+                               retries=3, backoff=0.01, max_backoff=0.05)
+    try:
+        with contextlib.redirect_stdout(None):
+            client.send_login(*ADMIN_LOGIN)
+            server.shutdown()
+            _drop(client)
+            start = time.monotonic()
+            client.request_device_status("all")
+            elapsed = time.monotonic() - start
+        assert client.last_response is None
+        assert elapsed < 1.0, elapsed
+    finally:
+        client.sock.close()
+    print("Server gone test passed!")
+
+
+if __name__ == "__main__":
+    test_queries_retry_controls_do_not()
+    test_deadline_bounds_a_silent_server()
+    test_deadline_bounds_a_trickling_server()
+    test_gives_up_when_the_server_is_gone()
+    print("All reconnect tests completed successfully.")
@@ -0,0 +1,88 @@
+from csserver import SmartHomeServer, SmartHomeServerOps
+from events import EventBus
+from home_model import HouseManager, Alarm, Lamp
+from house_loader import SiteConfig
+from house_workers import HouseWorkerPool
+from rules import RuleEngine
+
+from test_server import _login, _ctrl, _lock_id
+from test_scheduler import _wait_for
+
+
+def test_only_indexed_rules_are_evaluated():
+    """With thousands of rules, an event only evaluates the ones for its device and topic."""
+    bus = EventBus()
+    workers = HouseWorkerPool(1)
+    houses = HouseManager()
+    (house,) = SiteConfig().build_houses()
+    house.events = bus
+    houses.add_house(house)
+    fired = []
+    engine = RuleEngine(bus, workers, houses, lambda rule: fired.append(rule.name))
+    try:
+        for device_id in range(100, 5100):
+            engine.add_rule(1, "light.on", ("device:1", "off"), device_id=device_id)
+        engine.add_rule(1, "light.on", ("room:101", "off"), device_id=1, name="lamp 1")
+        engine.add_rule(1, "light.on", ("room:101", "off"), name="any light",
+                        conditions=[("device", 1, "on", "==", True)])
+        engine.add_rule(1, "light.off", ("room:101", "on"), device_id=1, name="wrong topic")
+        removed = engine.add_rule(1, "light.on", ("room:101", "off"), device_id=1, name="removed")
+        assert engine.remove_rule(removed.rule_id)
+
+        house.get_room(101).get_device(1).flip_switch()
+        bus.drain()
+        workers.call(1, lambda: None)
+        assert sorted(fired) == ["any light", "lamp 1"]
+        assert engine.evaluated == 2
+
+        # A condition that doesn't hold keeps the rule quiet
+        fired.clear()
+        engine.add_rule(1, "light.on", ("room:101", "off"), device_id=2, name="dim only",
+                        conditions=[("device", 2, "shade", "<", 50)])
+        house.get_room(101).get_device(2).flip_switch()
+        bus.drain()
+        workers.call(1, lambda: None)
+        assert fired == ["any light"]
+    finally:
+        engine.shutdown()
+        bus.shutdown()
+        workers.shutdown()
+    print("Rule index test passed!")
+
+
+def test_lockout_and_device_rules():
+    """Failed unlocks trigger the armed alarm; a custom rule turns lamps off when blinds open."""
+    server = SmartHomeServer(port=0, num_workers=1)
+    try:
+        ops = SmartHomeServerOps(server=server)
+        _login(ops)
+        alarm = next(d for d in ops.smart_home.get_room(101).devices.values() if isinstance(d, Alarm))
+        lock_id = _lock_id(ops)
+        assert _ctrl(ops, alarm.device_id, "arm").getValue("status") == "success"
+        for attempt in range(3):
+            assert not alarm.is_alarm
+            assert _ctrl(ops, lock_id, "unlock", code="0000").getValue("status") == "error"
+            server.events.drain()
+            server.workers.call(1, lambda: None)
+        assert alarm.is_alarm
+        last = server.histories[1].changes([alarm.device_id], limit=1)[0]
+        assert (last["action"], last["user"]) == ("trigger_alarm", "rules")
+
+        server.rules.add_rule(1, "blinds.opened", ("room:101", "off"), device_id=4)
+        lamps = [d for d in ops.smart_home.get_room(101).devices.values() if isinstance(d, Lamp)]
+        for lamp in lamps:
+            assert _ctrl(ops, lamp.device_id, "on").getValue("status") == "success"
+        assert _ctrl(ops, 4, "open").getValue("status") == "success"
+        _wait_for(lambda: not any(lamp.on for lamp in lamps))
+        assert server.stats(1)["rules"]["fired"] == 2
+    finally:
+        server.scheduler.shutdown()
+        server.server_socket.close()
+        server.workers.shutdown()
+    print("Lockout rule test passed!")
+
+
+if __name__ == "__main__":
+    test_only_indexed_rules_are_evaluated()
+    test_lockout_and_device_rules()
+    print("All rule tests completed successfully.")
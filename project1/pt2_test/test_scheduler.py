@@ -0,0 +1,148 @@
+import ast
+import time
+import threading
+
+from csmessage import CSmessage, REQS
+from csserver import SmartHomeServer, SmartHomeServerOps
+from house_workers import HouseWorkerPool
+from scheduler import Scheduler, next_daily
+
+from test_server import _login, _ctrl, _lock_id
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_order_cancel_and_repeat():
+    """Timers fire in due order on the house worker; cancelled ones never fire."""
+    workers = HouseWorkerPool(2)
+    fired = []
+    scheduler = Scheduler(workers, lambda timer: fired.append((timer.action, threading.current_thread().name)),
+                          min_every=0.01)
+    try:
+        scheduler.schedule(1, "device:1", "second", delay=0.06)
+        scheduler.schedule(1, "device:1", "first", delay=0.02)
+        doomed = scheduler.schedule(1, "device:1", "never", delay=0.04)
+        assert scheduler.cancel(doomed.timer_id) and not scheduler.cancel(doomed.timer_id)
+        _wait_for(lambda: len(fired) == 2)
+        assert [action for action, _ in fired] == ["first", "second"]
+        assert all(thread.startswith("house-worker") for _, thread in fired)
+
+        repeating = scheduler.schedule(1, "device:1", "tick", delay=0, every=0.01)
+        _wait_for(lambda: sum(action == "tick" for action, _ in fired) >= 3)
+        scheduler.cancel(repeating.timer_id)
+        assert len(scheduler) == 0
+
+        # A repeating timer can be cancelled while it runs, and then does not come back
+        running, release = threading.Event(), threading.Event()
+        scheduler.execute = lambda timer: (running.set(), release.wait(5))
+        slow = scheduler.schedule(2, "device:1", "tick", delay=0, every=0.01)
+        assert running.wait(5)
+        assert scheduler.get(slow.timer_id) is slow and scheduler.cancel(slow.timer_id)
+        release.set()
+        _wait_for(lambda: 2 not in scheduler._in_flight)
+        assert len(scheduler) == 0 and not any(entry[2] is slow for entry in scheduler._heap)
+        scheduler.execute = lambda timer: fired.append((timer.action, threading.current_thread().name))
+
+        # 100k pending timers: quick to add and cancel, and the heap is compacted
+        start = time.perf_counter()
+        timers = [scheduler.schedule(i % 50, "device:1", "on", delay=3600 + i) for i in range(100_000)]
+        for i, timer in enumerate(timers):
+            if i % 3:
+                scheduler.cancel(timer.timer_id)
+        assert len(scheduler) == 33_334 and len(scheduler._heap) < 100_000
+        assert time.perf_counter() - start < 5
+
+        # Delays and repeats that would stall or kill the scheduler thread are refused
+        for bad in ({"delay": float("inf")}, {"delay": float("nan")}, {"delay": 1e300}, {"delay": -1},
+                    {"delay": 0, "every": float("nan")}, {"delay": 0, "every": 1e-300}, {"delay": 0, "every": 1e300}):
+            try:
+                scheduler.schedule(1, "device:1", "on", **bad)
+                raise AssertionError(f"{bad} was accepted")
+            except ValueError:
+                pass
+        assert scheduler._thread.is_alive()
+
+        now = time.mktime((2026, 10, 19, 21, 30, 0, 0, 0, -1))
+        assert next_daily("22:00", now) - now == 30 * 60
+        assert next_daily("21:30", now) - now == 24 * 3600
+    finally:
+        scheduler.shutdown()
+        workers.shutdown()
+    print("Scheduler order/cancel test passed!")
+
+
+def test_timer_burst_does_not_block_requests():
+    """Thousands of due timers run in small batches, so requests to the house still get through."""
+    workers = HouseWorkerPool(1)
+    scheduler = Scheduler(workers, lambda timer: time.sleep(0.0005), batch_size=16)
+    try:
+        for _ in range(2000):
+            scheduler.schedule(1, "device:1", "on", delay=0)
+        _wait_for(lambda: scheduler.fired > 0)
+        start = time.perf_counter()
+        assert workers.call(1, lambda: "served") == "served"
+        latency = time.perf_counter() - start
+        assert scheduler.fired < 2000, "burst finished before the request was made"
+        assert latency < 0.2, latency
+        _wait_for(lambda: scheduler.fired == 2000)
+    finally:
+        scheduler.shutdown()
+        workers.shutdown()
+    print("Timer burst test passed!")
+
+
+def test_server_timers():
+    """Scheduled and group controls through CTRL, the timers query, and auto-relock."""
+    server = SmartHomeServer(port=0, num_workers=1, auto_relock=0.05)
+    try:
+        ops = SmartHomeServerOps(server=server)
+        _login(ops)
+
+        # "Turn all lamps on shortly": a group target, fired as CTRLs by the scheduler session
+        resp = _ctrl(ops, 0, "on", delay=0.02, target="group:lamps")
+        assert resp.getValue("status") == "success"
+        lamps = [d for r in ops.smart_home.rooms.values() for d in r.devices.values() if type(d).__name__ == "Lamp"]
+        _wait_for(lambda: all(lamp.on for lamp in lamps))
+
+        # A daily timer shows up in the timers query and can be cancelled
+        timer_id = _ctrl(ops, 5, "dim", at="22:00", level=20).getValue("timer_id")
+        req = CSmessage(REQS.QERY)
+        req.addValue("query_type", "timers")
+        timers = ast.literal_eval(ops._dispatch(req).getValue("device_status"))["timers"]
+        assert [(t["timer_id"], t["at"]) for t in timers] == [(int(timer_id), "22:00")]
+        assert _ctrl(ops, 0, "cancel_timer", timer_id=timer_id).getValue("status") == "success"
+        assert _ctrl(ops, 0, "cancel_timer", timer_id=timer_id).getValue("status") == "error"
+        assert _ctrl(ops, 0, "on", delay=1, target="garage:1").getValue("status") == "error"
+        assert _ctrl(ops, 5, "on", at="25:00").getValue("status") == "error"
+        # A repeat with nothing to start from is refused, not run once on the spot
+        assert _ctrl(ops, 1, "off", every=60).getValue("status") == "error"
+        for bad in ({"delay": "inf"}, {"delay": "nan"}, {"delay": "1e300"}, {"delay": 1, "every": "0.001"}):
+            resp = _ctrl(ops, 1, "off", **bad)
+            assert resp.getValue("status") == "error" and "Invalid timer" in resp.getValue("error_message")
+        assert server.scheduler._thread.is_alive()
+        assert ops.smart_home.rooms[101].get_device(1).on
+
+        # Auto-relock: the lock locks itself again, recorded as the scheduler's change
+        lock_id = _lock_id(ops)
+        lock = ops.smart_home.rooms[101].get_device(lock_id)
+        assert _ctrl(ops, lock_id, "unlock", code="1234").getValue("status") == "success"
+        _wait_for(lambda: server.histories[1].changes([lock_id], limit=1)[0]["user"] == "scheduler")
+        assert server.histories[1].changes([lock_id], limit=1)[0]["action"] == "lock"
+        assert not lock.is_unlocked
+    finally:
+        server.scheduler.shutdown()
+        server.server_socket.close()
+        server.workers.shutdown()
+    print("Server timer test passed!")
+
+
+if __name__ == "__main__":
+    test_order_cancel_and_repeat()
+    test_timer_burst_does_not_block_requests()
+    test_server_timers()
+    print("All scheduler tests completed successfully.")
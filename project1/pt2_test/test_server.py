@@ -0,0 +1,222 @@
+import os
+import json
+import tempfile
+
+from csmessage import CSmessage, REQS
+from csserver import SmartHomeServer, SmartHomeServerOps
+from home_model import Lock
+from house_loader import SiteConfig, DEMO_CONFIG
+from throttle import AttemptThrottle, TokenBucket
+
+
+class FakeClock:
+    """Manually advanced stand-in for time.monotonic."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _login(ops):
+    req = CSmessage(REQS.LGIN)
+    req.addValue("username", "hannahbanana")
+    req.addValue("password", "JuniperTheCat")
+    assert ops._process(req).getValue("status") == "success"
+
+
+def _ctrl(ops, device_id, action, **values):
+    req = CSmessage(REQS.CTRL)
+    req.addValue("device_id", str(device_id))
+    req.addValue("action", action)
+    for k, v in values.items():
+        req.addValue(k, str(v))
+    return ops._dispatch(req)
+
+
+def _lock_id(ops):
+    for room in ops.smart_home.rooms.values():
+        for device_id, device in room.devices.items():
+            if isinstance(device, Lock):
+                return device_id
+
+
+def test_token_bucket_refill():
+    """A drained bucket reports how long until the next token, then refills."""
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=2, rate=0.5, clock=clock)
+
+    assert bucket.consume() == 0.0
+    assert bucket.consume() == 0.0
+    assert bucket.consume() == 2.0  # one token at 0.5/s
+
+    clock.now = 2.0
+    assert bucket.consume() == 0.0
+    print("Token bucket test passed!")
+
+
+def test_unlock_attempts_throttled():
+    """
+    Wrong codes are rejected with a retry-after hint once the burst is used up,
+    and the rejection does not count as a failed attempt on the lock itself.
+    """
+    clock = FakeClock()
+    throttle = AttemptThrottle(device_burst=3, device_rate=0.5, session_burst=10, clock=clock)
+    ops = SmartHomeServerOps(throttle=throttle)
+    _login(ops)
+    lock_id = _lock_id(ops)
+
+    for _ in range(3):
+        resp = _ctrl(ops, lock_id, "unlock", code="0000")
+        assert resp.getValue("error_message") == "Incorrect unlock code."
+
+    resp = _ctrl(ops, lock_id, "unlock", code="0000")
+    assert resp.getValue("status") == "error"
+    assert float(resp.getValue("retry_after")) == 2.0
+    assert ops.smart_home.rooms[101].get_device(lock_id).failed_attempts == 3
+
+    # Other commands are never throttled
+    assert _ctrl(ops, lock_id, "lock").getValue("status") == "success"
+
+    clock.now = 2.0
+    resp = _ctrl(ops, lock_id, "unlock", code="1234")
+    assert resp.getValue("status") == "success"
+
+    assert throttle.stats()["rejected_device"] == 1
+    assert throttle.stats()["allowed"] == 4
+    print("Unlock throttle test passed!")
+
+
+def test_device_bucket_shared_between_sessions():
+    """A new session (e.g. after reconnecting) does not get a fresh device budget."""
+    clock = FakeClock()
+    throttle = AttemptThrottle(device_burst=2, device_rate=0.5, clock=clock)
+
+    first = SmartHomeServerOps(throttle=throttle)
+    _login(first)
+    lock_id = _lock_id(first)
+    _ctrl(first, lock_id, "unlock", code="0000")
+    _ctrl(first, lock_id, "unlock", code="0000")
+
+    second = SmartHomeServerOps(throttle=throttle)
+    _login(second)
+    resp = _ctrl(second, lock_id, "unlock", code="1234")
+    assert resp.getValue("retry_after") is not None
+
+    query = CSmessage(REQS.QERY)
+    query.addValue("query_type", "stats")
+    resp = second._process(query)
+    assert resp.getValue("status") == "success"
+    assert "'rejected_device': 1" in resp.getValue("device_status")
+    print("Shared device bucket test passed!")
+
+
+def _demo_records(house_id=1):
+    """The demo site's house, rooms and devices, renumbered to another house."""
+    with open(DEMO_CONFIG) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records = [r for r in records if r["kind"] != "user"]
+    records[0]["house_id"] = house_id
+    return records
+
+
+ADMIN = {"kind": "user", "username": "hannahbanana", "password": "JuniperTheCat", "role": "admin", "houses": "*"}
+
+SITE_V2 = _demo_records() + [
+    {"kind": "room", "room_id": 104, "name": "Office"},
+    {"kind": "lamp", "room_id": 104},
+    ADMIN,
+]
+
+MULTI_SITE = _demo_records(1) + _demo_records(2) + _demo_records(3) + [
+    ADMIN,
+    {"kind": "user", "username": "juniper", "password": "meow", "houses": [2]},
+]
+
+
+def _site_file(tmp, name, records):
+    path = os.path.join(tmp, name)
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return path
+
+
+def test_reload_keeps_state_and_sessions():
+    """
+    A reload swaps in the new layout under a live session and keeps the
+    state of devices whose IDs still exist.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _site_file(tmp, "site.jsonl", _demo_records() + [ADMIN])
+        server = SmartHomeServer(port=0, layout=SiteConfig(path), num_workers=2)
+        try:
+            ops = SmartHomeServerOps(server=server)
+            _login(ops)
+            assert _ctrl(ops, 1, "on").getValue("status") == "success"
+            old_home = ops.smart_home
+
+            _site_file(tmp, "site.jsonl", SITE_V2)
+            assert server.reload_house()
+
+            assert ops.smart_home is not old_home
+            assert ops.smart_home.get_room(104) is not None
+            assert ops.smart_home.get_room(101).get_device(1).on
+
+            # The session keeps working against the new house
+            new_lamp = ops.smart_home.get_room(104).get_device(12)
+            assert _ctrl(ops, 12, "on").getValue("status") == "success"
+            assert new_lamp.on
+        finally:
+            server.server_socket.close()
+            server.workers.shutdown()
+    print("Reload test passed!")
+
+
+def test_sessions_bound_to_accessible_houses():
+    """
+    Sessions are bound to one house at login, limited by accessible_houses,
+    and their requests run on that house's worker without touching other houses.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _site_file(tmp, "multi.jsonl", MULTI_SITE)
+        server = SmartHomeServer(port=0, layout=SiteConfig(path), num_workers=2)
+        try:
+            admin = SmartHomeServerOps(server=server)
+            req = CSmessage(REQS.LGIN)
+            req.addValue("username", "hannahbanana")
+            req.addValue("password", "JuniperTheCat")
+            req.addValue("house_id", "3")
+            assert admin._dispatch(req).getValue("house_id") == "3"
+
+            guest = SmartHomeServerOps(server=server)
+            req = CSmessage(REQS.LGIN)
+            req.addValue("username", "juniper")
+            req.addValue("password", "meow")
+            assert guest._dispatch(req).getValue("house_id") == "2"
+
+            req.addValue("house_id", "1")
+            assert SmartHomeServerOps(server=server)._dispatch(req).getValue("status") == "failure"
+
+            ctrl = CSmessage(REQS.CTRL)
+            ctrl.addValue("device_id", "1")
+            ctrl.addValue("action", "on")
+            assert admin._dispatch(ctrl).getValue("status") == "success"
+            assert guest._dispatch(ctrl).getValue("status") == "success"
+            assert server.houses.get_house(1).get_room(101).get_device(1).on is False
+
+            processed = sum(w["processed"] for w in server.workers.stats())
+            assert processed == 2
+        finally:
+            server.server_socket.close()
+            server.workers.shutdown()
+    print("Multi-house test passed!")
+
+
+if __name__ == "__main__":
+    test_token_bucket_refill()
+    test_unlock_attempts_throttled()
+    test_device_bucket_shared_between_sessions()
+    test_reload_keeps_state_and_sessions()
+    test_sessions_bound_to_accessible_houses()
+    print("All server tests completed successfully.")
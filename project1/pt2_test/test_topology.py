@@ -0,0 +1,112 @@
+import socket
+import asyncio
+import contextlib
+
+from app_protocol import SmartHomeProtocol
+from async_protocol import AsyncSmartHomeProtocol
+from home_model import SmartHouse, Room, Lamp, Lock
+
+from test_client_pool import _live_server, ADMIN_LOGIN
+from test_client_cache import _CountingSocket
+
+
+def test_topology_version():
+    """Adding or removing rooms and devices changes the topology version; device state does not."""
+    house = SmartHouse(1, "Topology House")
+    house.add_room(Room(101, "Den"))
+    lamp = Lamp(0)
+    house.rooms[101].add_lamp(lamp)
+    version = house.topology_version
+    assert house.topology() == {101: {"name": "Den", "devices": {1: "Lamp"}}}
+
+    lamp.flip_switch()
+    house.touch()
+    assert house.topology_version == version and house.version != version
+
+    house.rooms[101].add_devices(locks=[Lock(0, code=["1234"])])
+    assert house.topology_version > version
+    version = house.topology_version
+    house.add_room(Room(102, "Study"))
+    assert house.topology_version > version
+    assert house.topology(rooms=[102]) == {102: {"name": "Study", "devices": {}}}
+    version = house.topology_version
+    house.remove_room(102)
+    assert house.topology_version > version
+    print("Topology version test passed!")
+
+
+def test_login_brings_the_topology():
+    """One round trip after connecting: room names and device IDs come with the login response."""
+    server, port = _live_server(num_workers=1)
+    sock = _CountingSocket(socket.create_connection(("localhost", port)))
+    client = SmartHomeProtocol(sock, cache_ttl=0)
+    try:
+        with contextlib.redirect_stdout(None):
+            client.send_login(*ADMIN_LOGIN, topology=True)
+            assert sock.sent == 1
+            assert client.room_names == {101: "Living Room", 102: "Kitchen", 103: "Bedroom"}
+            assert client.room_ids_by_name["kitchen"] == 102
+            lamp = client.get_device_by_type("Lamp")
+            assert client.get_device_type(lamp) == "Lamp"
+            assert client.topology_version == server.houses.get_house(1).topology_version
+
+            client.list_rooms()
+            client.request_device_status("room", "kitchen")
+            assert sock.sent == 2  # no extra fetch for the room name
+            assert client.last_response.getValue("status") == "success"
+
+            # Device control leaves the topology alone; the query brings the same one back
+            client.send_device_control(lamp, "on")
+            client.discover_device_ids()
+            assert client.topology_version == server.houses.get_house(1).topology_version
+
+        async def scenario():
+            other = await AsyncSmartHomeProtocol.connect("localhost", port)
+            assert await other.login(*ADMIN_LOGIN, topology=True)
+            await other.close()
+            return other.topology
+
+        topology = asyncio.run(scenario())
+        assert topology["rooms"][101]["name"] == "Living Room"
+    finally:
+        sock.close()
+        server.shutdown()
+    print("Login topology test passed!")
+
+
+def test_large_house_login():
+    """A topology too big for one frame is left out of the login; the login itself still works."""
+    server, port = _live_server(num_workers=1)
+    house = server.houses.get_house(1)
+    server.workers.call(1, lambda: house.rooms[103].add_devices(lamps=[Lamp(device_id=0) for _ in range(1000)]))
+    client = SmartHomeProtocol(socket.create_connection(("localhost", port)), cache_ttl=0)
+    try:
+        with contextlib.redirect_stdout(None):
+            result = client.send_login(*ADMIN_LOGIN, topology=True)
+            assert result.ok and client.logged_in
+            assert client.last_response.getValue("topology_truncated") == "1"
+            assert result.status is None  # the topology query that followed did not fit either
+            # ...and the connection is still in step: small requests work
+            assert client.request_device_status("device", 1).ok
+            assert not client.request_device_status("all").ok
+
+        async def scenario():
+            other = await AsyncSmartHomeProtocol.connect("localhost", port)
+            assert await other.login(*ADMIN_LOGIN, topology=True)
+            assert other.topology is None
+            status = await other.query("device", 1)
+            await other.close()
+            return status
+
+        assert asyncio.run(scenario())[1]["type"] == "Lamp"
+    finally:
+        client.sock.close()
+        server.shutdown()
+    print("Large house login test passed!")
+
+
+if __name__ == "__main__":
+    test_topology_version()
+    test_login_brings_the_topology()
+    test_large_house_login()
+    print("All topology tests completed successfully.")
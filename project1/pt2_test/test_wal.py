@@ -0,0 +1,125 @@
+import os
+import glob
+import tempfile
+import threading
+
+from csserver import SmartHomeServer, SmartHomeServerOps
+from house_loader import SiteConfig
+from wal import MutationLog
+
+from test_server import _login, _ctrl
+
+
+def _house():
+    return SiteConfig().build_houses()[0]
+
+
+def test_group_commit():
+    """Concurrent appends share fsyncs, and every one of them is durable afterwards."""
+    with tempfile.TemporaryDirectory() as tmp:
+        log = MutationLog(tmp, checkpoint_every=0)
+        house = _house()
+        log.recover([house])
+        lamp = house.get_room(101).get_device(1)
+
+        def writer():
+            for _ in range(50):
+                log.wait_durable(log.append(1, lamp))
+
+        threads = [threading.Thread(target=writer) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        log.close()
+        assert log.records == 400
+        assert log.batches < 400
+    print("Group commit test passed!")
+
+
+def test_replay_after_crash():
+    """
+    The server acknowledges CTRL only once logged; a new server on the same
+    log directory gets the state back, ignoring a torn record at the end.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        server = SmartHomeServer(port=0, num_workers=1, wal=MutationLog(tmp))
+        ops = SmartHomeServerOps(server=server)
+        _login(ops)
+        assert _ctrl(ops, 1, "on").getValue("status") == "success"
+        assert _ctrl(ops, 1, "dim", level="20").getValue("status") == "success"
+        assert server.wal.stats()["durable_seq"] == 2
+        server.server_socket.close()
+        server.workers.shutdown()
+        # "Crash": the log is never closed, and a half-written record is left behind
+        with open(glob.glob(os.path.join(tmp, "wal-*.log"))[-1], "a") as f:
+            f.write('{"seq": 3, "house": 1, "dev')
+
+        house = _house()
+        log = MutationLog(tmp)
+        assert log.recover([house]) == 1
+        lamp = house.get_room(101).get_device(1)
+        assert lamp.on and lamp.shade == 20
+        assert log.append(1, lamp) == 3
+        log.close()
+    print("Crash replay test passed!")
+
+
+class _FullDisk:
+    """Stands in for a log segment on a disk that has run out of space."""
+
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_failed_log_write_is_answered():
+    """When the log can't be written, the client hears so instead of waiting for a reply forever."""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = SmartHomeServer(port=0, num_workers=1, wal=MutationLog(tmp))
+        try:
+            ops = SmartHomeServerOps(server=server)
+            _login(ops)
+            server.wal._segment = _FullDisk()
+            resp = _ctrl(ops, 1, "on")
+            assert resp.getValue("status") == "error"
+            assert resp.getValue("error_message").startswith("Change applied but not durable")
+            assert resp.getValue("version") is not None
+            assert ops.smart_home.get_room(101).get_device(1).on
+            # The log stays failed; later changes are answered the same way
+            assert _ctrl(ops, 1, "off").getValue("status") == "error"
+        finally:
+            server.shutdown()
+    print("Failed log write test passed!")
+
+
+def test_checkpoint_compacts_log():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = MutationLog(tmp, checkpoint_every=10)
+        house = _house()
+        log.recover([house])
+        lamp = house.get_room(101).get_device(2)
+        for level in range(25):
+            lamp.set_shade(level)
+            log.wait_durable(log.append(1, lamp))
+        log.wait_checkpoint()
+        log.close()
+        assert len(glob.glob(os.path.join(tmp, "wal-*.log"))) == 1
+
+        house = _house()
+        MutationLog(tmp).recover([house])
+        assert house.get_room(101).get_device(2).shade == 24
+    print("Checkpoint test passed!")
+
+
+if __name__ == "__main__":
+    test_group_commit()
+    test_replay_after_crash()
+    test_failed_log_write_is_answered()
+    test_checkpoint_compacts_log()
+    print("All write-ahead log tests completed successfully.")
@@ -0,0 +1,191 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Trigger -> condition -> action rules on top of the event bus:
+
+    # "When the living room blinds open, turn the room's lights off"
+    engine.add_rule(1, "blinds.opened", ("room:101", "off"), device_id=4)
+
+    # "3 failed attempts on any lock while alarm 9 is armed: trigger it"
+    engine.add_rule(1, "lock.failed", ("device:9", "trigger_alarm"),
+                    conditions=[("event", "attempts", ">=", 3), ("device", 9, "is_armed", "==", True)])
+
+Rules are indexed by (house_id, device_id, topic), with device_id None for
+rules about any device, so an event only ever looks at the rules that can
+fire on it: two dict lookups, however many rules there are. Events
+without rules cost nothing more than that.
+
+The lookup runs on the event bus thread. Conditions and actions are handed
+to the house's worker, so they see (and change) the house in the same order
+as requests do. Actions run like CTRL requests; a rule whose action causes
+its own trigger again stops as soon as the action no longer changes
+anything (turning off a lamp that is off is refused, and emits no event).
+'''
+
+import logging
+import operator
+import threading
+import itertools
+
+OPERATORS = {
+    "==": operator.eq, "!=": operator.ne,
+    ">=": operator.ge, ">": operator.gt,
+    "<=": operator.le, "<": operator.lt,
+}
+
+
+class Rule:
+    __slots__ = ("rule_id", "house_id", "topic", "device_id", "conditions", "target", "action", "fields", "name", "fired")
+
+    def __init__(self, rule_id, house_id, topic, device_id, conditions, target, action, fields, name):
+        self.rule_id = rule_id
+        self.house_id = house_id
+        self.topic = topic  # event topic, e.g. "lock.failed"
+        self.device_id = device_id  # None: any device of the house
+        self.conditions = conditions  # [(compare, value_getter, expected)], all must hold
+        self.target = target  # "device:<id>", "room:<id>" or "group:<name>"
+        self.action = action  # CTRL action
+        self.fields = fields  # extra CTRL fields (level, color, code)
+        self.name = name
+        self.fired = 0
+
+    def as_dict(self) -> dict:
+        return {"rule_id": self.rule_id, "name": self.name, "topic": self.topic, "device_id": self.device_id,
+                "target": self.target, "action": self.action, "fired": self.fired}
+
+
+class RuleEngine:
+    def __init__(self, events, workers, houses, execute):
+        """
+        Start evaluating rules for every event on the bus.
+        :param events: EventBus the houses publish on
+        :param workers: HouseWorkerPool that conditions and actions run on
+        :param houses: HouseManager, for the device conditions
+        :param execute: execute(rule), called on the house's worker to apply the action
+        """
+        self.workers = workers
+        self.houses = houses
+        self.execute = execute
+        self._index = {}  # { (house_id, device_id, topic): tuple of rules }
+        self._rules = {}  # { rule_id: Rule }
+        self._lock = threading.Lock()  # guards changes to the two dicts above
+        self._ids = itertools.count(1)
+        self._count_lock = threading.Lock()  # every house worker counts evaluations
+        self.evaluated = 0
+        self._token = events.subscribe("*", self._on_event)
+        self._events = events
+
+    # ---- adding and removing ----
+
+    def add_rule(self, house_id: int, topic: str, then: tuple, device_id: int = None,
+                 conditions=(), name: str = None) -> Rule:
+        """
+        Add a rule.
+        :param topic: Event that fires it, e.g. "lock.failed" (exact topics only, so it can be indexed)
+        :param then: (target, action) or (target, action, fields), applied like a CTRL request
+        :param device_id: Only events from this device (None: any device in the house)
+        :param conditions: All must hold, each one of
+                           ("event", field, op, value)                compares event.data[field]
+                           ("device", device_id, field, op, value)    compares that device's status
+        """
+        if topic.endswith("*"):
+            raise ValueError("Rules need an exact topic.")
+        target, action, *fields = then
+        rule = Rule(next(self._ids), house_id, topic, device_id, [_condition(c) for c in conditions],
+                    target, action, dict(fields[0]) if fields else {}, name)
+        with self._lock:
+            key = (house_id, device_id, topic)
+            self._index[key] = self._index.get(key, ()) + (rule,)
+            self._rules[rule.rule_id] = rule
+        return rule
+
+    def remove_rule(self, rule_id: int) -> bool:
+        with self._lock:
+            rule = self._rules.pop(rule_id, None)
+            if rule is None:
+                return False
+            key = (rule.house_id, rule.device_id, rule.topic)
+            remaining = tuple(r for r in self._index[key] if r is not rule)
+            if remaining:
+                self._index[key] = remaining
+            else:
+                del self._index[key]
+            return True
+
+    def remove_where(self, predicate) -> int:
+        """Remove every rule for which predicate(rule) is true."""
+        with self._lock:
+            ids = [rule_id for rule_id, rule in self._rules.items() if predicate(rule)]
+        return sum(self.remove_rule(rule_id) for rule_id in ids)
+
+    def rules(self, house_id: int = None) -> list:
+        with self._lock:
+            return [rule for rule in self._rules.values() if house_id is None or rule.house_id == house_id]
+
+    def __len__(self):
+        return len(self._rules)
+
+    # ---- evaluating ----
+
+    def _on_event(self, event):
+        """Event bus thread: find the rules this event can fire, nothing else."""
+        index = self._index
+        rules = index.get((event.house_id, event.device_id, event.topic), ())
+        if event.device_id is not None:
+            rules += index.get((event.house_id, None, event.topic), ())
+        if rules:
+            self.workers.submit(event.house_id, self._run, rules, event)
+
+    def _run(self, rules, event):
+        """Runs on the house's worker."""
+        house = self.houses.get_house(event.house_id)
+        if house is None:
+            return
+        with self._count_lock:
+            self.evaluated += len(rules)
+        for rule in rules:
+            try:
+                if all(_holds(condition, event, house) for condition in rule.conditions):
+                    rule.fired += 1
+                    self.execute(rule)
+            except Exception as e:
+                logging.error(f"[RULES] Rule {rule.rule_id} ({rule.name or rule.topic}) failed: {e}")
+
+    def stats(self) -> dict:
+        with self._count_lock:
+            evaluated = self.evaluated
+        return {"rules": len(self._rules), "evaluated": evaluated,
+                "fired": sum(rule.fired for rule in self.rules())}
+
+    def shutdown(self):
+        self._events.unsubscribe(self._token)
+
+
+def _condition(spec) -> tuple:
+    """Turn a condition spec into (compare, value_getter, expected)."""
+    if spec[0] == "event":
+        _, field, op, expected = spec
+        get = lambda event, house: event.data.get(field)
+    elif spec[0] == "device":
+        _, device_id, field, op, expected = spec
+        get = lambda event, house: _device_status(house, device_id).get(field)
+    else:
+        raise ValueError(f"Unknown condition {spec!r}, use ('event', ...) or ('device', ...)")
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator {op!r}, use one of {', '.join(OPERATORS)}")
+    return OPERATORS[op], get, expected
+
+
+def _holds(condition, event, house) -> bool:
+    compare, get, expected = condition
+    value = get(event, house)
+    return value is not None and compare(value, expected)
+
+
+def _device_status(house, device_id: int) -> dict:
+    for room in house.rooms.values():
+        device = room.get_device(device_id)
+        if device is not None:
+            return device.check_status()
+    return {}
@@ -0,0 +1,226 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Timer scheduler for timed automations ("dim the living room at 22:00",
+"lock all doors at midnight", "relock 30 s after an unlock").
+
+Pending timers sit in a binary heap keyed by due time: O(log n) to add,
+O(1) to cancel (a cancelled timer is only marked, and skipped when it
+reaches the top; the heap is rebuilt once most of it is cancelled). One
+scheduler thread sleeps until the earliest due time. A timer stays
+pending, and can be cancelled, while it is due and while it runs: a
+cancelled timer that is due is not run, and a repeating one is not
+scheduled again.
+
+Due timers are not run on the scheduler thread. They are handed to the
+house's worker in batches of at most `batch_size`, with at most one batch
+per house queued at a time, so a burst of timers (thousands due at
+midnight) can only put one short batch in front of interactive requests.
+'''
+
+import math
+import time
+import heapq
+import logging
+import datetime
+import itertools
+import threading
+from collections import deque
+
+MAX_DELAY = 365 * 24 * 3600  # seconds; anything later is a mistake, not a plan
+MIN_EVERY = 1.0  # seconds; a faster repeat would keep the house's worker busy with one timer
+
+
+class Timer:
+    __slots__ = ("timer_id", "due", "house_id", "target", "action", "fields", "every", "at", "cancelled", "in_heap")
+
+    def __init__(self, timer_id, due, house_id, target, action, fields, every, at):
+        self.timer_id = timer_id
+        self.due = due
+        self.house_id = house_id
+        self.target = target  # "device:<id>", "room:<id>" or "group:<name>"
+        self.action = action  # CTRL action
+        self.fields = fields  # extra CTRL fields (level, color, code)
+        self.every = every  # repeat interval in seconds, or None
+        self.at = at  # "HH:MM" for daily timers, or None
+        self.cancelled = False
+        self.in_heap = False  # False while the timer is due or running
+
+    def as_dict(self) -> dict:
+        return {"timer_id": self.timer_id, "due": self.due, "target": self.target, "action": self.action,
+                "every": self.every, "at": self.at}
+
+
+def next_daily(at: str, now: float) -> float:
+    """Unix time of the next local HH:MM strictly after now."""
+    hour, minute = (int(part) for part in at.split(":"))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid time of day '{at}'")
+    current = datetime.datetime.fromtimestamp(now)
+    candidate = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate.timestamp() <= now:
+        candidate += datetime.timedelta(days=1)
+    return candidate.timestamp()
+
+
+class Scheduler:
+    def __init__(self, workers, execute, batch_size: int = 64, clock=time.time,
+                 max_delay: float = MAX_DELAY, min_every: float = MIN_EVERY):
+        """
+        Start the scheduler thread.
+        :param workers: HouseWorkerPool that due timers are run on
+        :param execute: execute(timer), called on the timer's house worker
+        :param batch_size: Timers run per worker job
+        :param clock: Time source (wall clock, since "at" timers are times of day)
+        :param max_delay: Longest delay schedule() accepts, in seconds
+        :param min_every: Shortest repeat interval schedule() accepts, in seconds
+        """
+        self.workers = workers
+        self.execute = execute
+        self.batch_size = batch_size
+        self.clock = clock
+        self.max_delay = max_delay
+        self.min_every = min_every
+
+        self._cond = threading.Condition()  # guards everything below
+        self._heap = []  # (due, seq, timer)
+        self._timers = {}  # { timer_id: Timer } of pending (incl. due and running), not cancelled timers
+        self._cancelled_in_heap = 0
+        self._ready = {}  # { house_id: deque of due timers }
+        self._in_flight = set()  # house_ids with a batch queued on their worker
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._closed = False
+        self.fired = 0
+
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    # ---- adding and cancelling ----
+
+    def schedule(self, house_id: int, target: str, action: str, fields: dict = None,
+                 delay: float = None, at: str = None, every: float = None) -> Timer:
+        """
+        Add a timer. Give exactly one of delay (seconds from now) or at ("HH:MM",
+        repeats daily); every (seconds) makes a delay timer repeat.
+        """
+        if (delay is None) == (at is None):
+            raise ValueError("Give either a delay or a time of day.")
+        if delay is not None and not (math.isfinite(delay) and 0 <= delay <= self.max_delay):
+            raise ValueError(f"Delay must be between 0 and {self.max_delay:g} seconds.")
+        if every is not None and not (math.isfinite(every) and self.min_every <= every <= self.max_delay):
+            raise ValueError(f"Repeat interval must be between {self.min_every:g} and {self.max_delay:g} seconds.")
+        now = self.clock()
+        due = now + delay if delay is not None else next_daily(at, now)
+        with self._cond:
+            timer = Timer(next(self._ids), due, house_id, target, action, dict(fields or {}), every, at)
+            self._push(timer)
+            return timer
+
+    def _push(self, timer):
+        """Caller holds the lock."""
+        self._timers[timer.timer_id] = timer
+        timer.in_heap = True
+        heapq.heappush(self._heap, (timer.due, next(self._seq), timer))
+        if self._heap[0][2] is timer:
+            self._cond.notify()  # new earliest timer: the thread may be sleeping too long
+
+    def get(self, timer_id: int) -> Timer:
+        """The pending timer with this ID, or None."""
+        with self._cond:
+            return self._timers.get(timer_id)
+
+    def cancel(self, timer_id: int) -> bool:
+        """Cancel a pending timer. :return: False if there is no such pending timer"""
+        with self._cond:
+            timer = self._timers.pop(timer_id, None)
+            if timer is None:
+                return False
+            timer.cancelled = True
+            if not timer.in_heap:
+                return True  # due or running: _run_batch skips it and does not repeat it
+            self._cancelled_in_heap += 1
+            if self._cancelled_in_heap > 1024 and self._cancelled_in_heap * 2 > len(self._heap):
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled_in_heap = 0
+            return True
+
+    def cancel_where(self, predicate) -> int:
+        """Cancel every pending timer for which predicate(timer) is true."""
+        with self._cond:
+            ids = [timer_id for timer_id, timer in self._timers.items() if predicate(timer)]
+        return sum(self.cancel(timer_id) for timer_id in ids)
+
+    def pending(self, house_id: int = None) -> list:
+        with self._cond:
+            return sorted((t for t in self._timers.values() if house_id is None or t.house_id == house_id),
+                          key=lambda t: t.due)
+
+    def __len__(self):
+        return len(self._timers)
+
+    # ---- firing ----
+
+    def _loop(self):
+        with self._cond:
+            while not self._closed:
+                now = self.clock()
+                heap = self._heap
+                while heap and heap[0][0] <= now:
+                    _, _, timer = heapq.heappop(heap)
+                    timer.in_heap = False
+                    if timer.cancelled:
+                        self._cancelled_in_heap -= 1
+                        continue
+                    self._ready.setdefault(timer.house_id, deque()).append(timer)
+                for house_id, ready in self._ready.items():
+                    if ready and house_id not in self._in_flight:
+                        self._in_flight.add(house_id)
+                        self.workers.submit(house_id, self._run_batch, house_id)
+                timeout = min(heap[0][0] - now, threading.TIMEOUT_MAX) if heap else None
+                self._cond.wait(timeout)
+
+    def _run_batch(self, house_id: int):
+        """Runs on the house's worker."""
+        with self._cond:
+            ready = self._ready[house_id]
+            batch = [ready.popleft() for _ in range(min(self.batch_size, len(ready)))]
+        fired = 0
+        try:
+            for timer in batch:
+                if timer.cancelled:  # cancelled after it fell due
+                    continue
+                fired += 1
+                try:
+                    self.execute(timer)
+                except Exception as e:
+                    logging.error(f"[SCHEDULER] Timer {timer.timer_id} ({timer.action} {timer.target}) failed: {e}")
+        finally:
+            with self._cond:
+                self.fired += fired
+                for timer in batch:
+                    if timer.cancelled:
+                        continue
+                    if timer.every is not None:
+                        timer.due += timer.every
+                        self._push(timer)
+                    elif timer.at is not None:
+                        timer.due = next_daily(timer.at, timer.due)
+                        self._push(timer)
+                    else:
+                        del self._timers[timer.timer_id]
+                self._in_flight.discard(house_id)
+                self._cond.notify()  # next batch for this house, if any
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"pending": len(self._timers), "ready": sum(len(r) for r in self._ready.values()),
+                    "fired": self.fired}
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
@@ -35,7 +35,7 @@ def main():
                 username = input("Username: ")
                 password = input("Password: ")
                 
-                protocol.send_login(username, password)
+                show_login(protocol.send_login(username, password))
                 logged_in = protocol.logged_in
                 
             elif command == 'logout':
@@ -43,19 +43,20 @@ def main():
                     print("You're not logged in yet.")
                 else:
                     protocol.send_logout()
+                    print("Logged out successfully.")
                     logged_in = False
                 
             elif command == 'query all':
                 if not logged_in:
                     print("Please login first.")
                 else:
-                    protocol.request_device_status("all")
+                    show_query(protocol, protocol.request_device_status("all"), "all")
                     
             elif command == 'list rooms':
                 if not logged_in:
                     print("Please login first.")
                 else:
-                    protocol.list_rooms()
+                    show_rooms(protocol.list_rooms())
                 
             elif command.startswith('query room'):
                 if not logged_in:
@@ -68,9 +69,9 @@ def main():
                         # If it's a number, treat as ID; otherwise as a name
                         if room_identifier.isdigit():
                             room_id = int(room_identifier)
-                            protocol.request_device_status("room", room_id)
+                            show_query(protocol, protocol.request_device_status("room", room_id), "room", room_id)
                         else:
-                            protocol.request_device_status("room", room_identifier)
+                            show_query(protocol, protocol.request_device_status("room", room_identifier), "room", room_identifier)
                     except IndexError:
                         print("Usage: query room <room_id or room_name>")
                 
@@ -80,7 +81,7 @@ def main():
                 else:
                     try:
                         group_name = command.split()[2]
-                        protocol.request_device_status("group", group_name)
+                        show_query(protocol, protocol.request_device_status("group", group_name), "group", group_name)
                     except IndexError:
                         print("Usage: query group <group_name>")
                 
@@ -90,7 +91,7 @@ def main():
                 else:
                     try:
                         device_id = int(command.split()[2])
-                        protocol.request_device_status("device", device_id)
+                        show_query(protocol, protocol.request_device_status("device", device_id), "device", device_id)
                     except (IndexError, ValueError):
                         print("Usage: query device <device_id>")
                         
@@ -98,7 +99,7 @@ def main():
                 if not logged_in:
                     print("Please login first.")
                 else:
-                    if hasattr(protocol, 'device_ids_by_type'):
+                    if protocol.device_ids_by_type:
                         print("\nAvailable devices by type:")
                         for device_type, device_ids in protocol.device_ids_by_type.items():
                             print(f"  {device_type}: {device_ids}")
@@ -128,6 +129,45 @@ def main():
     
     print("\n===== DEMO ENDED =====")
 
+def show_login(result):
+    """Print the outcome of SmartHomeProtocol.send_login."""
+    if result:
+        print("Login successful!")
+    else:
+        print(f"Login failed! ({result.error})" if result.error else "Login failed!")
+
+
+def show_query(protocol, result, query_type, query_value=None):
+    """Print the outcome of SmartHomeProtocol.request_device_status."""
+    if not result:
+        print(f"Query failed: {result.error}")
+        return
+    display_value = query_value
+    if query_type == "room" and query_value in protocol.room_names:
+        display_value = f"{query_value} ({protocol.room_names[query_value]})"
+    label = query_type + (f" - {display_value}" if query_value else "") + (", cached" if result.cached else "")
+    print(f"Query result ({label}): {result.status}")
+
+
+def show_control(result, device_id, action):
+    """Print the outcome of SmartHomeProtocol.send_device_control."""
+    if result:
+        print(f"📡 Device {device_id} action '{action}': success")
+        return
+    print(f"📡 Device {device_id} action '{action}' failed: {result.error}")
+    if result.response is not None and result.response.getValue("retry_after") is not None:
+        print(f"Retry after {result.response.getValue('retry_after')}s")
+
+
+def show_rooms(room_names):
+    if room_names:
+        print("\nAvailable rooms:")
+        for room_id, room_name in sorted(room_names.items()):
+            print(f"  Room {room_id}: {room_name}")
+    else:
+        print("No room information available.")
+
+
 def display_help(logged_in):
     print("\nAvailable commands:")
     print("  help             - Display this help message")
@@ -171,34 +211,34 @@ def handle_control_command(command, protocol):
         # Handle device-specific actions
         if device_type == "Lamp":
             if action in ["on", "off"]:
-                protocol.send_device_control(device_id, action)
+                show_control(protocol.send_device_control(device_id, action), device_id, action)
             elif action == "dim" and len(parts) >= 5:
                 level = int(parts[4])
-                protocol.send_device_control(device_id, action, level=level)
+                show_control(protocol.send_device_control(device_id, action, level=level), device_id, action)
             elif action == "color" and len(parts) >= 5:
                 color = parts[4]
-                protocol.send_device_control(device_id, action, color=color)
+                show_control(protocol.send_device_control(device_id, action, color=color), device_id, action)
             else:
                 print("Usage: control lamp <id> on|off|dim <level>|color <color>")
                 
         elif device_type == "Lock":
             if action == "lock":
-                protocol.send_device_control(device_id, action)
+                show_control(protocol.send_device_control(device_id, action), device_id, action)
             elif action == "unlock" and len(parts) >= 5:
                 code = parts[4]
-                protocol.send_device_control(device_id, action, code=code)
+                show_control(protocol.send_device_control(device_id, action, code=code), device_id, action)
             else:
                 print("Usage: control lock <id> lock|unlock <code>")
                 
         elif device_type == "Blinds":
             if action in ["open", "close", "up", "down"]:
-                protocol.send_device_control(device_id, action)
+                show_control(protocol.send_device_control(device_id, action), device_id, action)
             else:
                 print("Usage: control blinds <id> open|close|up|down")
                 
         elif device_type == "Alarm":
             if action in ["arm", "disarm", "trigger_alarm", "stop_alarm"]:
-                protocol.send_device_control(device_id, action)
+                show_control(protocol.send_device_control(device_id, action), device_id, action)
             else:
                 print("Usage: control alarm <id> arm|disarm|trigger_alarm|stop_alarm")
                 
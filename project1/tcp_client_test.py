@@ -1,5 +1,6 @@
 import socket
 from app_protocol import SmartHomeProtocol
+from tcp_client_demo import show_login, show_query, show_control
 
 def main():
     host = "localhost"
@@ -14,35 +15,33 @@ def main():
 
     # STEP 1: LOGIN FAILURE
     print("\n[STEP 1] Attempt login with incorrect credentials...")
-    protocol.send_login("admin", "wrongpass")
-    # The protocol prints "Login failed!" on failure.
+    show_login(protocol.send_login("admin", "wrongpass"))
 
     # STEP 1B: LOGIN SUCCESS
     print("\n[STEP 1B] Attempt login with correct credentials...")
-    protocol.send_login("admin", "password123")
-    # The protocol prints "Login successful!" on success.
-    # Device discovery happens automatically upon successful login
+    show_login(protocol.send_login("admin", "password123"))
+    # The login response also brings the rooms and device IDs
 
     # STEP 2: QUERY DEVICES TO DEMONSTRATE STRUCTURE
     print("\n[STEP 2] Querying devices...")
     
     print("\n--- Query All Devices ---")
-    protocol.request_device_status("all")
+    show_query(protocol, protocol.request_device_status("all"), "all")
     
     print("\n--- Query by Room: Living Room (101) ---")
-    protocol.request_device_status("room", 101)
+    show_query(protocol, protocol.request_device_status("room", 101), "room", 101)
     
     print("\n--- Query by Room: Kitchen (102) ---")
-    protocol.request_device_status("room", 102)
+    show_query(protocol, protocol.request_device_status("room", 102), "room", 102)
     
     print("\n--- Query by Room: Bedroom (103) ---")
-    protocol.request_device_status("room", 103)
+    show_query(protocol, protocol.request_device_status("room", 103), "room", 103)
     
     print("\n--- Query by Group: All Lamps ---")
-    protocol.request_device_status("group", "lamps")
+    show_query(protocol, protocol.request_device_status("group", "lamps"), "group", "lamps")
     
     print("\n--- Query by Group: All Locks ---")
-    protocol.request_device_status("group", "locks")
+    show_query(protocol, protocol.request_device_status("group", "locks"), "group", "locks")
     
     # STEP 3: DEMONSTRATE DEVICE CONTROL WITH CORRECT DEVICE TYPES
     print("\n[STEP 3] Changing some device states...")
@@ -55,39 +54,40 @@ def main():
     
     if alarm_id:
         print(f"--- Arming the Alarm (Device {alarm_id}) ---")
-        protocol.send_device_control(alarm_id, "arm")
-        protocol.request_device_status("device", alarm_id)
+        show_control(protocol.send_device_control(alarm_id, "arm"), alarm_id, "arm")
+        show_query(protocol, protocol.request_device_status("device", alarm_id), "device", alarm_id)
     
     if lock_id:
         print(f"--- Unlocking Lock (Device {lock_id}) ---")
-        protocol.send_device_control(lock_id, "unlock", code="1234")
-        protocol.request_device_status("device", lock_id)
+        show_control(protocol.send_device_control(lock_id, "unlock", code="1234"), lock_id, "unlock")
+        show_query(protocol, protocol.request_device_status("device", lock_id), "device", lock_id)
     
     if lamp_id:
         print(f"--- Turning ON Lamp (Device {lamp_id}) ---")
-        protocol.send_device_control(lamp_id, "on")
-        protocol.request_device_status("device", lamp_id)
+        show_control(protocol.send_device_control(lamp_id, "on"), lamp_id, "on")
+        show_query(protocol, protocol.request_device_status("device", lamp_id), "device", lamp_id)
         
         print(f"--- Dimming Lamp to 50% ---")
-        protocol.send_device_control(lamp_id, "dim", level=50)
-        protocol.request_device_status("device", lamp_id)
+        show_control(protocol.send_device_control(lamp_id, "dim", level=50), lamp_id, "dim")
+        show_query(protocol, protocol.request_device_status("device", lamp_id), "device", lamp_id)
         
         print(f"--- Changing Lamp Color to Blue ---")
-        protocol.send_device_control(lamp_id, "color", color="blue")
-        protocol.request_device_status("device", lamp_id)
+        show_control(protocol.send_device_control(lamp_id, "color", color="blue"), lamp_id, "color")
+        show_query(protocol, protocol.request_device_status("device", lamp_id), "device", lamp_id)
     
     if blinds_id:
         print(f"--- Opening Blinds (Device {blinds_id}) ---")
-        protocol.send_device_control(blinds_id, "open")
-        protocol.request_device_status("device", blinds_id)
+        show_control(protocol.send_device_control(blinds_id, "open"), blinds_id, "open")
+        show_query(protocol, protocol.request_device_status("device", blinds_id), "device", blinds_id)
 
     # STEP 4: RE-QUERY ALL DEVICES TO SEE UPDATED STATUS
     print("\n[STEP 4] Re-querying devices to see updated status...")
-    protocol.request_device_status("all")
+    show_query(protocol, protocol.request_device_status("all"), "all")
 
     # STEP 5: LOGOUT
     print("\n[STEP 5] Logging out...")
     protocol.send_logout()
+    print("Logged out successfully.")
 
     # STEP 6: ATTEMPT DEVICE CONTROL AFTER LOGOUT
     print("\n[STEP 6] Attempting control after logout (should fail)...")
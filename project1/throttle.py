@@ -0,0 +1,123 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Token-bucket throttling for code-guessing actions (lock "unlock" and
+alarm "enter_code"). The server checks these buckets before it touches
+the device, so a rejected attempt costs a dict lookup and some arithmetic.
+'''
+
+import time
+
+# Actions that check a secret code and are therefore worth brute-forcing
+THROTTLED_ACTIONS = ("unlock", "enter_code")
+
+# Per-session limits: a short burst, then one attempt per second
+SESSION_BURST = 5
+SESSION_RATE = 1.0
+
+# Per-device limits: shared by every session, so reconnecting doesn't help
+DEVICE_BURST = 5
+DEVICE_RATE = 0.5
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, rate: float, clock=time.monotonic):
+        """
+        Initialize a full token bucket.
+        :param capacity: Maximum number of tokens (burst size)
+        :param rate: Tokens added back per second
+        :param clock: Monotonic time source (injectable for tests)
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self._clock = clock
+        self._stamp = clock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._stamp
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._stamp = now
+
+    def retry_after(self) -> float:
+        """
+        Seconds until one token is available (0.0 if one is available now).
+        Does not consume anything.
+        """
+        self._refill(self._clock())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> float:
+        """
+        Take one token.
+        :return: 0.0 if the token was taken, otherwise seconds until one is available
+        """
+        wait = self.retry_after()
+        if wait == 0.0:
+            self.tokens -= 1
+        return wait
+
+
+class AttemptThrottle:
+    """Per-device buckets (shared across sessions) plus the counters for server stats."""
+
+    def __init__(self, device_burst=DEVICE_BURST, device_rate=DEVICE_RATE,
+                 session_burst=SESSION_BURST, session_rate=SESSION_RATE, clock=time.monotonic):
+        self.device_burst = device_burst
+        self.device_rate = device_rate
+        self.session_burst = session_burst
+        self.session_rate = session_rate
+        self._clock = clock
+        self._device_buckets = {}  # { device_id: TokenBucket }
+
+        self.allowed = 0
+        self.rejected_session = 0
+        self.rejected_device = 0
+
+    def new_session_bucket(self) -> TokenBucket:
+        """Create the bucket a single client session draws from."""
+        return TokenBucket(self.session_burst, self.session_rate, self._clock)
+
+    def check_session(self, session_bucket: TokenBucket) -> float:
+        """
+        First, cheapest check: does this session have an attempt left?
+        Only peeks; the token is taken in check_device once the whole attempt is allowed.
+        :return: 0.0 if allowed, otherwise the retry-after hint in seconds
+        """
+        wait = session_bucket.retry_after()
+        if wait:
+            self.rejected_session += 1
+        return wait
+
+    def check_device(self, session_bucket: TokenBucket, device_id: int) -> float:
+        """
+        Second check, done once the device is known to exist (so bogus IDs
+        never allocate a bucket). Consumes from both buckets on success.
+        :return: 0.0 if allowed, otherwise the retry-after hint in seconds
+        """
+        bucket = self._device_buckets.get(device_id)
+        if bucket is None:
+            bucket = TokenBucket(self.device_burst, self.device_rate, self._clock)
+            self._device_buckets[device_id] = bucket
+
+        wait = bucket.consume()
+        if wait:
+            self.rejected_device += 1
+            return wait
+
+        session_bucket.consume()
+        self.allowed += 1
+        return 0.0
+
+    def stats(self) -> dict:
+        """Returns the throttle counters."""
+        return {
+            "allowed": self.allowed,
+            "rejected_session": self.rejected_session,
+            "rejected_device": self.rejected_device,
+            "tracked_devices": len(self._device_buckets)
+        }
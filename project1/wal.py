@@ -0,0 +1,242 @@
+'''
+Created on Oct 19, 2026
+@author: hannahbeatty
+
+Write-ahead log of device mutations. Every successful CTRL appends the
+device's new state with a sequence number; the reply is only sent once
+that record is on disk.
+
+Group commit: a single log thread writes whatever records have queued up
+since its last write and fsyncs once for the whole batch, so concurrent
+sessions share one fsync instead of paying for one each.
+
+On disk (in the log directory):
+    checkpoint.json     state of every logged device up to a sequence number
+    wal-<seq>.log       JSON Lines segments, named after their first sequence number
+
+A checkpoint starts a new segment and is written by a background thread;
+once it is safely renamed into place the older segments are deleted.
+Startup loads the checkpoint and replays the segments after it.
+'''
+
+import os
+import glob
+import json
+import logging
+import threading
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def _device_index(house) -> dict:
+    """{ device_id: device } over all rooms of a house."""
+    return {device_id: device for room in house.rooms.values() for device_id, device in room.devices.items()}
+
+
+class MutationLog:
+    def __init__(self, directory: str, checkpoint_every: int = 10_000, fsync: bool = True):
+        """
+        :param directory: Where the log segments and checkpoint are kept (created if missing)
+        :param checkpoint_every: Records between automatic checkpoints (0 = only on request)
+        :param fsync: fsync each batch; only turn off for benchmarks
+        """
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition()  # guards everything below
+        self._queue = []  # encoded records waiting for the log thread
+        self._seq = 0  # last sequence number handed out
+        self._durable_seq = 0  # last sequence number known to be on disk
+        self._latest = {}  # { (house_id, device_id): (type, state) } as of _seq, for checkpoints
+        self._since_checkpoint = 0
+        self._checkpoint_wanted = False
+        self._checkpointing = False
+        self._closed = False
+        self._error = None
+
+        self._segment = None
+        self._thread = None
+        self.batches = 0  # fsyncs done
+        self.records = 0
+
+    # ---- startup ----
+
+    def recover(self, houses) -> int:
+        """
+        Load the checkpoint, replay the log after it onto the given houses and
+        start logging. Must be called once before append().
+        :return: Number of devices whose state was restored
+        """
+        latest = {}
+        last = 0
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            last = checkpoint["seq"]
+            for house_id, device_id, type_name, state in checkpoint["devices"]:
+                latest[(house_id, device_id)] = (type_name, state)
+        checkpoint_seq = last
+
+        for segment in self._segments():
+            with open(segment, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write from a crash: nothing after it in this segment was acknowledged
+                        logging.warning(f"[WAL] Ignoring incomplete record at the end of {segment}")
+                        break
+                    if record["seq"] <= checkpoint_seq:
+                        continue
+                    latest[(record["house"], record["device"])] = (record["type"], record["state"])
+                    last = max(last, record["seq"])
+
+        restored = 0
+        by_house = {house.house_id: _device_index(house) for house in houses}
+        for (house_id, device_id), (type_name, state) in latest.items():
+            device = by_house.get(house_id, {}).get(device_id)
+            if device is not None and device.TYPE_NAME == type_name:
+                for field, value in state.items():
+                    setattr(device, field, value)
+                device.mark_dirty()
+                restored += 1
+
+        self._latest = latest
+        self._seq = self._durable_seq = last
+        self._open_segment(last + 1)
+        self._thread = threading.Thread(target=self._log_loop, name="wal-writer", daemon=True)
+        self._thread.start()
+        logging.info(f"[WAL] Recovered up to seq {last} ({restored} devices)")
+        return restored
+
+    def _segments(self) -> list:
+        return sorted(glob.glob(os.path.join(self.directory, "wal-*.log")))
+
+    def _open_segment(self, first_seq: int):
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = open(os.path.join(self.directory, f"wal-{first_seq:012d}.log"), "a", encoding="utf-8")
+
+    # ---- logging ----
+
+    def append(self, house_id: int, device) -> int:
+        """
+        Queue a record of the device's current state. Returns at once; pass the
+        sequence number to wait_durable() before acknowledging the change.
+        """
+        state = {field: getattr(device, field) for field in device.STATE_FIELDS}
+        with self._cond:
+            self._seq += 1
+            self._queue.append(json.dumps({"seq": self._seq, "house": house_id, "device": device.device_id,
+                                           "type": device.TYPE_NAME, "state": state}) + "\n")
+            self._latest[(house_id, device.device_id)] = (device.TYPE_NAME, state)
+            self._since_checkpoint += 1
+            if self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every:
+                self._checkpoint_wanted = True
+            self._cond.notify_all()
+            return self._seq
+
+    def wait_durable(self, seq: int):
+        """Block until record seq (and everything before it) is on disk."""
+        with self._cond:
+            while self._durable_seq < seq and self._error is None:
+                self._cond.wait()
+            if self._durable_seq < seq:
+                raise OSError(f"Write-ahead log failed: {self._error}")
+
+    def _log_loop(self):
+        while True:
+            with self._cond:
+                while not (self._queue or self._closed or (self._checkpoint_wanted and not self._checkpointing)):
+                    self._cond.wait()
+                if self._closed and not self._queue:
+                    return
+                batch, self._queue = self._queue, []
+                last = self._seq
+                snapshot = None
+                if self._checkpoint_wanted and not self._checkpointing:
+                    # Everything up to `last` goes in this batch, so the snapshot matches it
+                    snapshot = dict(self._latest)
+                    self._checkpoint_wanted = False
+                    self._checkpointing = True
+                    self._since_checkpoint = 0
+
+            try:
+                if batch:
+                    self._segment.write("".join(batch))
+                    self._segment.flush()
+                    if self.fsync:
+                        os.fsync(self._segment.fileno())
+                    self.batches += 1
+                    self.records += len(batch)
+                if snapshot is not None:
+                    self._open_segment(last + 1)
+            except OSError as e:
+                logging.error(f"[WAL] Write failed: {e}")
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._durable_seq = last
+                self._cond.notify_all()
+            if snapshot is not None:
+                threading.Thread(target=self._write_checkpoint, args=(snapshot, last),
+                                 name="wal-checkpoint", daemon=True).start()
+
+    # ---- checkpoints ----
+
+    def checkpoint(self):
+        """Ask for a checkpoint (written in the background)."""
+        with self._cond:
+            self._checkpoint_wanted = True
+            self._cond.notify_all()
+
+    def _write_checkpoint(self, snapshot: dict, seq: int):
+        """Write the snapshot next to the old checkpoint, swap it in, then drop the segments it covers."""
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"seq": seq, "devices": [[house_id, device_id, type_name, state]
+                                                   for (house_id, device_id), (type_name, state) in snapshot.items()]}, f)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            current = os.path.join(self.directory, f"wal-{seq + 1:012d}.log")
+            for segment in self._segments():
+                if segment < current:
+                    os.remove(segment)
+            logging.info(f"[WAL] Checkpoint at seq {seq}")
+        except OSError as e:
+            logging.error(f"[WAL] Checkpoint failed, keeping the log: {e}")
+        finally:
+            with self._cond:
+                self._checkpointing = False
+                self._cond.notify_all()
+
+    def wait_checkpoint(self):
+        """Block until no checkpoint is pending or being written."""
+        with self._cond:
+            while self._checkpoint_wanted or self._checkpointing:
+                self._cond.wait()
+
+    def stats(self) -> dict:
+        return {"seq": self._seq, "durable_seq": self._durable_seq, "records": self.records, "fsyncs": self.batches}
+
+    def close(self):
+        """Write out the queue and stop the log thread."""
+        if self._thread is not None:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            self._thread.join()
+        with self._cond:
+            while self._checkpointing:
+                self._cond.wait()
+        if self._segment is not None:
+            self._segment.close()
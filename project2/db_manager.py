@@ -0,0 +1,163 @@
+'''
+Created on Oct 19, 2026
+
+@author: hannahbeatty
+
+SQLite persistence for houses, rooms, devices, device state and users.
+
+The layout (houses/rooms/devices/users) is written in one transaction by
+save_site(). Device state changes go through record_state(): with
+write-behind on, they are only queued, and a background writer thread
+flushes them in batched transactions, so the caller never waits on disk.
+Repeated changes to the same device before a flush are coalesced into one
+row update.
+'''
+
+import sqlite3
+import logging
+import threading
+
+from models import SCHEMA, apply_state, device_state, house_row, room_rows, device_rows, user_row
+
+
+class DatabaseManager:
+    def __init__(self, path: str, write_behind: bool = True, flush_interval: float = 0.05):
+        """
+        Open (or create) the database.
+        :param path: SQLite file (":memory:" works for tests)
+        :param write_behind: Queue state changes for the background writer instead of writing them inline
+        :param flush_interval: How long the writer lets changes pile up before each batch, in seconds
+                               (flush() and close() cut the wait short)
+        """
+        self.path = path
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn_lock = threading.Lock()  # one writer on the connection at a time
+
+        self._pending = {}  # { (house_id, device_id): state JSON }, latest change wins
+        self._cond = threading.Condition()
+        self._writing = False
+        self._flush_now = False  # set by flush(): write the pending batch without waiting
+        self._closed = False
+        self.written = 0  # rows written by the background writer
+        self.batches = 0
+
+        self._writer = None
+        if write_behind:
+            self._writer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+            self._writer.start()
+
+    # ---- layout ----
+
+    def save_site(self, houses, users=()):
+        """
+        Replace the stored layout of these houses (and these accounts) with
+        their current contents, state included, in a single transaction.
+        """
+        self.flush()
+        with self._conn_lock, self._conn:
+            for house in houses:
+                self._conn.execute("INSERT OR REPLACE INTO houses VALUES (?, ?)", house_row(house))
+                self._conn.execute("DELETE FROM rooms WHERE house_id = ?", (house.house_id,))
+                self._conn.execute("DELETE FROM devices WHERE house_id = ?", (house.house_id,))
+                self._conn.executemany("INSERT INTO rooms VALUES (?, ?, ?)", room_rows(house))
+                self._conn.executemany("INSERT INTO devices VALUES (?, ?, ?, ?, ?, ?)", device_rows(house))
+            for user in users:
+                self._conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?)", user_row(user))
+                self._conn.execute("DELETE FROM user_houses WHERE username = ?", (user.username,))
+                self._conn.executemany("INSERT INTO user_houses VALUES (?, ?)",
+                                       ((user.username, house_id) for house_id in user.accessible_houses))
+
+    def restore_state(self, houses) -> int:
+        """
+        Put the stored device state back onto freshly built houses, wherever
+        a device with the same house, ID and type exists.
+        :return: Number of devices restored
+        """
+        restored = 0
+        with self._conn_lock:
+            for house in houses:
+                rows = self._conn.execute(
+                    "SELECT room_id, device_id, type, state FROM devices WHERE house_id = ?", (house.house_id,))
+                for room_id, device_id, type_name, state in rows:
+                    room = house.get_room(room_id)
+                    device = room.get_device(device_id) if room is not None else None
+                    if device is not None and device.TYPE_NAME == type_name:
+                        apply_state(device, state)
+                        restored += 1
+        return restored
+
+    # ---- device state ----
+
+    def record_state(self, house_id: int, device):
+        """
+        Persist a device's current state. The state is captured now, on the
+        caller's thread; with write-behind the write itself happens later.
+        """
+        key = (house_id, device.device_id)
+        state = device_state(device)
+        if not self.write_behind:
+            with self._conn_lock, self._conn:
+                self._conn.execute("UPDATE devices SET state = ? WHERE house_id = ? AND device_id = ?",
+                                   (state, *key))
+            return
+        with self._cond:
+            self._pending[key] = state
+            self._cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+                # Let more changes arrive so they share the transaction
+                self._cond.wait_for(lambda: self._flush_now or self._closed, self.flush_interval)
+                batch, self._pending = self._pending, {}
+                self._flush_now = False
+                self._writing = True
+            try:
+                with self._conn_lock, self._conn:
+                    self._conn.executemany(
+                        "UPDATE devices SET state = ? WHERE house_id = ? AND device_id = ?",
+                        ((state, house_id, device_id) for (house_id, device_id), state in batch.items()))
+                self.written += len(batch)
+                self.batches += 1
+            except sqlite3.Error as e:
+                logging.error(f"[DB] Write-behind batch of {len(batch)} failed: {e}")
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def flush(self):
+        """Wait until every queued change has been written."""
+        if self._writer is None:
+            return
+        with self._cond:
+            if self._pending:
+                self._flush_now = True
+                self._cond.notify_all()
+            while self._pending or self._writing:
+                self._cond.wait()
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._pending)
+        return {"queued": queued, "written": self.written, "batches": self.batches}
+
+    def close(self):
+        """Write out everything still queued, then close the database."""
+        if self._writer is not None:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            self._writer.join()
+        with self._conn_lock:
+            self._conn.close()